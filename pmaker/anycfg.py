@@ -26,12 +26,6 @@ import os.path
 import sys
 
 
-try:
-    import yaml
-except ImportError:
-    logging.warn("YAML module is not available. Disabled its support.")
-    yaml = None
-
 try:
     import json
 except ImportError:
@@ -42,21 +36,32 @@ except ImportError:
         json = None
 
 
-try:
-    # First, try lxml compatible with elementtree and looks faster a lot.
-    # see also: http://diveintopython3-ja.rdy.jp/xml.html:
-    from lxml import etree
-except ImportError:
-    try:
-        import xml.etree.ElementTree as etree
-    except ImportError:
-        try:
-            import elementtree.ElementTree as etree
-        except ImportError:
-            logging.warn(
-                "ElementTree module is not available. Disabled XML support."
-            )
-            etree = None
+@U.memoize
+def _yaml():
+    """
+    Import yaml module on demand as it takes some time to load.
+    """
+    yaml = U.try_import("yaml")
+    if yaml is None:
+        logging.warn("YAML module is not available. Disabled its support.")
+
+    return yaml
+
+
+@U.memoize
+def _etree():
+    """
+    Import ElementTree module on demand. lxml compatible with elementtree and
+    looks faster a lot is tried first, see also:
+    http://diveintopython3-ja.rdy.jp/xml.html
+    """
+    etree = U.try_import("lxml.etree", "xml.etree.ElementTree",
+                         "elementtree.ElementTree")
+    if etree is None:
+        logging.warn("ElementTree module is not available. Disabled XML "
+                     "support.")
+
+    return etree
 
 
 CONFIG_EXTS = [INI_EXTS, JSON_EXTS, YAML_EXTS, XML_EXTS, ] = [
@@ -151,6 +156,20 @@ def dict_to_bunch(json_obj_dict):
     return B.Bunch(**json_obj_dict)
 
 
+def to_dict(obj):
+    """
+    Convert objects not serializable in JSON as is, e.g. FileObject and
+    FileSet, to dicts or lists.
+    """
+    if callable(getattr(obj, "to_dict", None)):
+        return obj.to_dict()
+
+    if callable(getattr(obj, "to_list", None)):
+        return obj.to_list()
+
+    raise TypeError(repr(obj) + " is not JSON serializable")
+
+
 class JsonConfigPaser(IniConfigParser):
 
     _type = CTYPE_JSON
@@ -167,14 +186,19 @@ class JsonConfigPaser(IniConfigParser):
         if json is None:
             logging.warn("JSON is not a supported configuration format.")
         else:
-            json.dump(data, open(path_, "w"), indent=2)
+            json.dump(data, open(path_, "w"), indent=2, default=to_dict)
 
 
 EXT2CLASS_MAP[JSON_EXTS] = JsonConfigPaser
 CTYPE2CLASS_MAP[CTYPE_JSON] = JsonConfigPaser
 
 
-if yaml is not None:
+@U.memoize
+def _yaml_bunch_loader():
+    """
+    :return: Loader class of yaml loads mappings as Bunch objects
+    """
+    yaml = _yaml()
 
     # @see http://bit.ly/pxKVqS
     class YamlBunchLoader(yaml.Loader):
@@ -220,20 +244,26 @@ if yaml is not None:
 
             return mapping
 
+    return YamlBunchLoader
+
 
 class YamlConfigPaser(IniConfigParser):
 
     _type = CTYPE_YAML
 
     def load(self, path_, *args, **kwargs):
+        yaml = _yaml()
+
         if yaml is None:
             logging.warn("YAML is not a supported configuration format.")
             return B.Bunch()
         else:
-            return yaml.load(open(path_), Loader=YamlBunchLoader)
+            return yaml.load(open(path_), Loader=_yaml_bunch_loader())
 
     @classmethod
     def dump(cls, data, path_, *args, **kwargs):
+        yaml = _yaml()
+
         if yaml is None:
             logging.warn("YAML is not a supported configuration format.")
         else:
@@ -265,6 +295,8 @@ class XmlConfigParser(IniConfigParser):
     _type = CTYPE_XML
 
     def load(self, path_, *args, **kwargs):
+        etree = _etree()
+
         if etree is None:
             logging.warn("XML is not a supported configuration format.")
             return B.Bunch()
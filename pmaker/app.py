@@ -18,6 +18,7 @@ import pmaker.options as O
 import pmaker.pkgdata as P
 import pmaker.collectors.FilelistCollectors as Collectors
 import pmaker.backend.registry as Backends
+import pmaker.multiformat as M
 
 import logging
 import sys
@@ -43,6 +44,12 @@ def main(argv=sys.argv):
 
     pkgdata = P.PkgData(opts, fs)
 
+    if opts.drivers:
+        results = M.run(pkgdata, opts.drivers)
+        print M.summary(results)
+
+        return 0 if all(r.rc == 0 for r in results) else 1
+
     bcls = Backends.map().get(opts.driver)
     backend = bcls(pkgdata)
     rc = backend.run()
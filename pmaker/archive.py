@@ -0,0 +1,242 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import logging
+import os
+import os.path
+import shutil
+import subprocess
+import tarfile
+import time
+
+
+# Compressors supported by tarfile itself: {extension: mode}
+TARFILE_MODES = {"gz": "gz", "bz2": "bz2"}
+
+COMPRESSLEVEL = 9
+
+# Permission bits 'make dist' ensures for dirs and the others in archives.
+DIST_DIR_MODE = 0755
+DIST_FILE_MODE = 0444
+
+
+class DigestReader(object):
+    """
+    File object wrapper updating the digest with the content read.
+    """
+
+    def __init__(self, fileobj, digest):
+        self.fileobj = fileobj
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.digest.update(data)
+        return data
+
+
+class TarWriter(object):
+    """
+    Write tar archives in process. Archives are compressed with gzip or bzip2
+    by tarfile module, or with compressor command (e.g. xz) reading the
+    archive streamed into its stdin.
+
+    Archives are written in POSIX.1-2001 (pax) format as automake does with
+    the option 'tar-pax'.
+    """
+
+    def __init__(self, path, ext="gz", cmd=None, dist_modes=False,
+                 format=tarfile.PAX_FORMAT):
+        """
+        :param path: Output path of the archive
+        :param ext: Extension of the compressed file, e.g. "gz", "xz"
+        :param cmd: Compressor command, e.g. "xz", for ext not in
+            TARFILE_MODES
+        :param dist_modes: Make dirs accessible and files readable by all in
+            the archive as 'make dist' does
+        :param format: Archive format, tarfile.PAX_FORMAT or GNU_FORMAT
+        """
+        self.path = path
+        self.dist_modes = dist_modes
+        self.proc = None
+        self.out = None
+        self._dirs = set()
+
+        mode = TARFILE_MODES.get(ext)
+
+        if mode is not None:
+            self.tar = tarfile.open(path, "w:" + mode,
+                                    compresslevel=COMPRESSLEVEL,
+                                    format=format)
+        else:
+            self.out = open(path, "wb")
+            self.proc = subprocess.Popen([cmd or ext, "-c", "-%d" %
+                                          COMPRESSLEVEL],
+                                         stdin=subprocess.PIPE,
+                                         stdout=self.out)
+            self.tar = tarfile.open(fileobj=self.proc.stdin, mode="w|",
+                                    format=format)
+
+    def add_dir(self, path, arcname, **attrs):
+        """
+        Add dir entry of arcname made from path only once.
+        """
+        if arcname not in self._dirs:
+            self.add(path, arcname, **attrs)
+
+    def add_parents(self, topdir, relpath, arcdir):
+        """
+        Add dir entries of parent dirs of relpath under topdir.
+        """
+        parts = relpath.split(os.path.sep)[:-1]
+
+        for i in range(1, len(parts) + 1):
+            rel = os.path.join(*parts[:i])
+            self.add_dir(os.path.join(topdir, rel), os.path.join(arcdir, rel))
+
+    def add(self, path, arcname, digest=None, **attrs):
+        """
+        Add a file, symlink or dir (not recursively) to the archive.
+
+        :param path: Path of the object to add
+        :param arcname: Path in the archive
+        :param digest: hashlib object updated with the content of the file
+        :param attrs: Attributes recorded in the archive instead of the ones
+            of the object, e.g. mode, uid, gid, uname and gname
+        :return: tarfile.TarInfo object of the entry added
+        """
+        tinfo = self.tar.gettarinfo(path, arcname)
+
+        for k, v in attrs.iteritems():
+            setattr(tinfo, k, v)
+
+        if self.dist_modes:
+            if tinfo.isdir():
+                tinfo.mode |= DIST_DIR_MODE
+            elif not tinfo.issym():
+                tinfo.mode |= DIST_FILE_MODE
+
+        if tinfo.isreg():
+            f = open(path, "rb")
+            try:
+                self.tar.addfile(tinfo, f if digest is None else
+                                 DigestReader(f, digest))
+            finally:
+                f.close()
+        else:
+            self.tar.addfile(tinfo)
+
+        if tinfo.isdir():
+            self._dirs.add(arcname)
+
+        return tinfo
+
+    def close(self):
+        self.tar.close()
+
+        if self.proc is not None:
+            self.proc.stdin.close()
+            rc = self.proc.wait()
+            self.out.close()
+
+            if rc != 0:
+                raise RuntimeError("Compressor failed (rc=%d): %s" %
+                                   (rc, self.path))
+
+        logging.info("Created archive: " + self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+            return
+
+        try:
+            self.tar.close()
+            if self.proc is not None:
+                self.proc.stdin.close()
+                self.proc.wait()
+                self.out.close()
+        finally:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def ar_header(name, size, mtime, mode=0100644):
+    """
+    Make the header of a member in ar archives. Owner of members is root.
+
+    >>> h = ar_header("debian-binary", 4, 0)
+    >>> len(h)
+    60
+    >>> h[:16], h[58:]
+    ('debian-binary   ', '`\\n')
+    """
+    assert len(name) <= 16, "Too long member name: " + name
+
+    return "%-16s%-12d%-6d%-6d%-8o%-10d`\n" % \
+        (name, int(mtime), 0, 0, mode, size)
+
+
+class ArWriter(object):
+    """
+    Write ar archives in the common format used by deb packages.
+    """
+
+    magic = "!<arch>\n"
+
+    def __init__(self, path):
+        self.path = path
+        self.out = open(path, "wb")
+        self.out.write(self.magic)
+
+    def add_data(self, name, data, mtime=None):
+        """
+        Add a member of which content is data.
+        """
+        if mtime is None:
+            mtime = time.time()
+
+        self.out.write(ar_header(name, len(data), mtime))
+        self.out.write(data)
+
+        if len(data) % 2:
+            self.out.write("\n")
+
+    def add_file(self, name, path):
+        """
+        Add the file as a member in chunks.
+        """
+        st = os.stat(path)
+        self.out.write(ar_header(name, st.st_size, st.st_mtime))
+
+        f = open(path, "rb")
+        try:
+            shutil.copyfileobj(f, self.out)
+        finally:
+            f.close()
+
+        if st.st_size % 2:
+            self.out.write("\n")
+
+    def close(self):
+        self.out.close()
+        logging.info("Created archive: " + self.path)
+
+
+# vim:sw=4:ts=4:et:
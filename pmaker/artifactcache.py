@@ -0,0 +1,305 @@
+#
+# Cache of packages built keyed on the digest of inputs of builds.
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Layout of the cache dir:
+#
+#   <topdir>/lock                          lock file of writers
+#   <topdir>/tmp/                          entries being stored or removed
+#   <topdir>/entries/<key[:2]>/<key>/      an entry, files and MANIFEST
+#
+# Entries are made in tmp/ and renamed into entries/, and removed after
+# renamed into tmp/, so that readers never see incomplete entries. Renaming
+# dirs and making hard links are atomic on NFS also, so that the cache can be
+# shared among hosts over NFS. Readers do not take the lock, and the mtime of
+# MANIFEST of an entry is updated when it's read to evict least recently used
+# entries first.
+#
+import errno
+import json
+import logging
+import os
+import os.path
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+
+MANIFEST = "MANIFEST"
+
+# Default max total size of entries in the cache in bytes:
+MAXSIZE = 4096 * 1024 * 1024
+
+
+class LockTimeoutError(Exception):
+    pass
+
+
+class LinkLock(object):
+    """
+    Lock with a lock file made by link(2), which is atomic on NFS unlike
+    open(2) with O_EXCL on old NFS versions.
+    """
+
+    def __init__(self, path, timeout=60, stale=600, interval=0.1):
+        """
+        :param path: Lock file path
+        :param timeout: Seconds to wait for the lock
+        :param stale: Seconds after that the lock is regarded as left by
+            dead processes and broken
+        :param interval: Seconds to wait before trying again
+        """
+        self.path = path
+        self.timeout = timeout
+        self.stale = stale
+        self.interval = interval
+
+    def _is_stale(self, path):
+        return time.time() - os.stat(path).st_mtime > self.stale
+
+    def _break_if_stale(self, tmp):
+        """
+        Break the lock if it's stale. The lock file is renamed to a name of
+        this process and checked again before removed, as others may break
+        it and acquire the lock again between checking and renaming it.
+
+        :param tmp: Unique path of this process and thread
+        """
+        stale = tmp + ".stale"
+        try:
+            if not self._is_stale(self.path):
+                return
+
+            os.rename(self.path, stale)
+        except OSError:
+            return  # Released or broken by others.
+
+        if self._is_stale(stale):
+            logging.warn("Break the stale lock: " + self.path)
+        else:
+            try:
+                os.link(stale, self.path)  # Give it back.
+            except OSError:
+                logging.warn("Could not give back the lock: " + self.path)
+
+        os.remove(stale)
+
+    def acquire(self):
+        tmp = "%s.%s.%d.%d" % (self.path, socket.gethostname(), os.getpid(),
+                               threading.current_thread().ident)
+        open(tmp, "w").close()
+
+        deadline = time.time() + self.timeout
+        try:
+            while True:
+                try:
+                    os.link(tmp, self.path)
+                except OSError:
+                    pass
+
+                # link(2) over NFS may fail even if it succeeded actually.
+                if os.stat(tmp).st_nlink == 2:
+                    return
+
+                if time.time() > deadline:
+                    raise LockTimeoutError("Could not get the lock: " +
+                                           self.path)
+
+                self._break_if_stale(tmp)
+                time.sleep(self.interval)
+        finally:
+            os.remove(tmp)
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except OSError:  # Broken as it was regarded as stale.
+            logging.warn("The lock was broken by others: " + self.path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ArtifactCache(object):
+
+    def __init__(self, topdir, maxsize=MAXSIZE):
+        """
+        :param topdir: Top dir of the cache
+        :param maxsize: Max total size of entries in bytes
+        """
+        self.topdir = topdir
+        self.maxsize = maxsize
+        self.tmpdir = os.path.join(topdir, "tmp")
+        self.entriesdir = os.path.join(topdir, "entries")
+        self.lock = LinkLock(os.path.join(topdir, "lock"))
+
+        for d in (self.tmpdir, self.entriesdir):
+            if not os.path.exists(d):
+                try:
+                    os.makedirs(d)
+                except OSError:  # Made by others.
+                    pass
+
+    def entry_dir(self, key):
+        return os.path.join(self.entriesdir, key[:2], key)
+
+    def get(self, key, workdir):
+        """
+        Copy files of the entry of key into workdir.
+
+        :param key: Digest of inputs of the build
+        :param workdir: Dir to copy files into
+        :return: List of paths of files copied or None if not found
+        """
+        entry = self.entry_dir(key)
+        manifest = os.path.join(entry, MANIFEST)
+
+        try:
+            files = json.load(open(manifest))["files"]
+
+            try:
+                os.utime(manifest, None)  # Mark as used recently.
+            except OSError:  # e.g. The cache is shared on read-only mounts.
+                pass
+
+            paths = []
+            for relpath, name in files:
+                dest = os.path.normpath(os.path.join(workdir, relpath))
+                destdir = os.path.dirname(dest)
+
+                if not os.path.exists(destdir):
+                    os.makedirs(destdir)
+
+                shutil.copy2(os.path.join(entry, name), dest + ".tmp")
+                os.rename(dest + ".tmp", dest)
+                paths.append(dest)
+
+            return paths
+
+        except (IOError, OSError, ValueError, KeyError), e:
+            if os.path.exists(entry):
+                logging.warn("Could not get files from the cache: %s: %s" %
+                             (entry, e))
+            return None
+
+    def put(self, key, workdir, paths):
+        """
+        Store files as the entry of key.
+
+        :param key: Digest of inputs of the build
+        :param workdir: Dir paths are relative to in the entry
+        :param paths: List of paths of files to store
+        :return: True if stored or False if the entry already exists or
+            failed to store it. Errors are logged and ignored not to fail
+            builds because of the cache
+        """
+        if os.path.exists(os.path.join(self.entry_dir(key), MANIFEST)):
+            return False
+
+        try:
+            return self._put(key, workdir, paths)
+        except (IOError, OSError, LockTimeoutError), e:
+            logging.warn("Could not store files in the cache: %s: %s" %
+                         (key, e))
+            return False
+
+    def _put(self, key, workdir, paths):
+        tmp = tempfile.mkdtemp(dir=self.tmpdir, prefix=key + ".")
+        try:
+            files = []
+            size = 0
+
+            for i, path in enumerate(paths):
+                name = "%d-%s" % (i, os.path.basename(path))
+                shutil.copy2(path, os.path.join(tmp, name))
+
+                files.append([os.path.relpath(path, workdir), name])
+                size += os.path.getsize(path)
+
+            with open(os.path.join(tmp, MANIFEST), "w") as out:
+                json.dump(dict(files=files, size=size), out)
+
+            with self.lock:
+                entry = self.entry_dir(key)
+                if not os.path.exists(os.path.dirname(entry)):
+                    os.makedirs(os.path.dirname(entry))
+
+                try:
+                    os.rename(tmp, entry)
+                except OSError:  # Stored by others in the meanwhile.
+                    return False
+
+                self.evict()
+
+            return True
+
+        finally:
+            if os.path.exists(tmp):
+                shutil.rmtree(tmp, True)
+
+    def entries(self):
+        """
+        :return: List of (last used time, size, path) of entries
+        """
+        ret = []
+
+        for subdir in os.listdir(self.entriesdir):
+            subdir = os.path.join(self.entriesdir, subdir)
+
+            for key in os.listdir(subdir):
+                entry = os.path.join(subdir, key)
+                manifest = os.path.join(entry, MANIFEST)
+                try:
+                    size = json.load(open(manifest))["size"]
+                    ret.append((os.stat(manifest).st_mtime, size, entry))
+                except (IOError, OSError, ValueError, KeyError):
+                    pass
+
+        return ret
+
+    def evict(self):
+        """
+        Remove least recently used entries while the total size of entries
+        exceeds self.maxsize. It must be called with the lock held.
+        """
+        entries = self.entries()
+        total = sum(size for _mtime, size, _entry in entries)
+
+        for _mtime, size, entry in sorted(entries):
+            if total <= self.maxsize:
+                break
+
+            trash = tempfile.mkdtemp(dir=self.tmpdir, prefix="evicted.")
+            try:
+                os.rename(entry, os.path.join(trash, "entry"))
+                logging.info("Evicted from the cache: " + entry)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+                # Evicted by others holding the lock broken as stale.
+
+            shutil.rmtree(trash, True)
+            total -= size
+
+
+# vim:sw=4:ts=4:et:
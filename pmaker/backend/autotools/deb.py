@@ -30,7 +30,7 @@ class Backend(T.Backend, D.Backend):
     def __init__(self, pkgdata, **kwargs):
         super(Backend, self).__init__(pkgdata, **kwargs)
 
-        self._templates += [
+        self._templates = self._templates + [
             (TVER + "/common/debian/rules", "debian/rules"),
             (TVER + "/autotools/debian/control", "debian/control"),
             (TVER + "/common/debian/copyright", "debian/copyright"),
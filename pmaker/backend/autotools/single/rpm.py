@@ -27,7 +27,7 @@ class Backend(T.Backend, R.Backend):
     def __init__(self, pkgdata, **kwargs):
         super(Backend, self).__init__(pkgdata, **kwargs)
 
-        self._templates += [
+        self._templates = self._templates + [
             (TVER + "/autotools/rpm.mk", "rpm.mk"),
             (TVER + "/autotools/package.spec", self.pkgdata.name + ".spec"),
         ]
@@ -14,19 +14,62 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
-from pmaker.globals import PACKAGING_STEPS, STEP_BUILD
+from pmaker.globals import PACKAGING_STEPS, STEP_BUILD, STEP_SBUILD, \
+    STEP_SETUP, STEP_PRECONFIGURE, TYPE_DIR, PKG_FORMAT_TGZ, PKG_FORMAT_RPM, \
+    PKG_FORMAT_DEB
 
 import pmaker.anycfg as A
+import pmaker.artifactcache as AC
 import pmaker.models.Bunch as B
 import pmaker.backend.utils as PU
+import pmaker.copier as C
+import pmaker.globals as G
+import pmaker.journal as J
 import pmaker.shell as S
-import pmaker.tenjinwrapper as T
+import pmaker.stats as ST
 import pmaker.utils as U
 
 import cPickle as pickle
+import glob
+import hashlib
+import json
 import logging
 import os.path
+import stat
 import sys
+import time
+
+
+def _digest(xs):
+    """
+    :param xs: Strings
+    :return: SHA1 digest of them
+    """
+    h = hashlib.sha1()
+
+    for x in xs:
+        if isinstance(x, unicode):
+            x = x.encode("utf-8")
+        h.update(x + "\0")
+
+    return h.hexdigest()
+
+
+# Glob patterns of packages built relative to workdir by package formats,
+# stored in the artifact cache:
+ARTIFACTS = {
+    PKG_FORMAT_TGZ: ["*.tar.*"],
+    PKG_FORMAT_RPM: ["*.rpm", "*.tar.*"],
+    PKG_FORMAT_DEB: ["*.deb", "../%(name)s_%(pversion)s*"],
+}
+
+# Steps after those packages are built:
+ARTIFACT_STEPS = (STEP_SBUILD, STEP_BUILD)
+
+
+# The template engine is loaded when backends are instantiated, not when
+# backend modules are imported, e.g. to list them in --help.
+T = U.LazyModule("pmaker.tenjinwrapper")
 
 
 class Base(object):
@@ -53,6 +96,14 @@ class Base(object):
         # e.g. ("1/autotools.single/configure.ac": "configure.ac"),
     ]
 
+    # Keys of pkgdata not affecting the outputs, ignored to compute digests of
+    # inputs of steps. workdir and srcdir are ignored to share the artifact
+    # cache among builds in different dirs.
+    _volatile_keys = ("force", "verbosity", "stepto", "trace", "jobs", "stats",
+                      "date", "cachedir", "template_cache", "link_files",
+                      "artifact_cache", "artifact_cache_size", "workdir",
+                      "srcdir", "shared_srcdir")
+
     @classmethod
     def format(cls):
         return cls._format
@@ -83,6 +134,19 @@ class Base(object):
         self.stepto = pkgdata.stepto
         self.template_paths = pkgdata.template_paths
         self.force = pkgdata.force
+        self.jobs = int(U.get_attr(pkgdata, "jobs") or 1)
+        self.link_files = bool(U.get_attr(pkgdata, "link_files"))
+        self.print_stats = bool(U.get_attr(pkgdata, "stats"))
+        self.shared_srcdir = U.get_attr(pkgdata, "shared_srcdir")
+
+        cachedir = U.get_attr(pkgdata, "artifact_cache")
+        if cachedir:
+            size = U.get_attr(pkgdata, "artifact_cache_size")
+            self.artifact_cache = AC.ArtifactCache(
+                cachedir, AC.MAXSIZE if size is None else size * 1024 * 1024
+            )
+        else:
+            self.artifact_cache = None
 
     def logfile(self, name):
         return os.path.join(self.workdir, "pmaker.%s.log" % name)
@@ -93,9 +157,17 @@ class Base(object):
         """
         self.pkgdata = pkgdata
         self.pkgdata.format = self.format()  # override it.
+        self._pkgdata_digest = None
+        self._template_digests = dict()
 
         self.__setup_aliases(pkgdata)
 
+        if U.get_attr(pkgdata, "template_cache"):
+            cachedir = U.get_attr(pkgdata, "cachedir") or G.PMAKER_CACHEDIR
+            T.enable_cache(os.path.join(cachedir, T.CACHE_SUBDIR))
+        else:
+            T.disable_cache()
+
         try:
             self.pkgdata.relations = self.relations_map(pkgdata.relations)
         except Exception, e:
@@ -115,22 +187,174 @@ class Base(object):
 
         return S.run(cmd_s, workdir=workdir, **kwargs)
 
-    def genfile(self, template, output):
+    def genfile(self, template, output, journal=None):
         """
         Generate file in workdir from given template.
 
         :param template:  Template file path relative to search dirs
         :param output:  Output file path relative to workdir
+        :param journal:  Journal to record the file generated, and to skip
+            generating it again if it was generated from the same template
+            and pkgdata, and not modified since, unless self.force is True
         """
         out = os.path.join(self.workdir, output)
-        content = T.compile(template, self.pkgdata, self.template_paths,
-                            ask=True)
-        open(out, "w").write(content)  # may throw IOError, OSError.
+
+        if journal is not None:
+            key = _digest([self.pkgdata_digest(),
+                           self.template_digest(template)])
+
+            if not self.force and os.path.exists(out) and \
+                    journal.done(output, [key, U.checksum(out)]):
+                logging.info("Not changed: " + output)
+                return
+
+        # may throw IOError, OSError.
+        T.render_to(template, out, self.pkgdata, self.template_paths, ask=True)
+
+        if journal is not None:
+            journal.record(output, [key, U.checksum(out)], out)
+
+    def copyfile(self, o, journal=None):
+        """
+        Copy a file into srcdir.
+
+        :param o: FileObject to copy
+        :param journal: Journal to record the file copied, and to skip
+            copying it again if it was copied and not changed since, unless
+            self.force is True
+        """
+        dest = PU.to_srcdir(self.srcdir, o.install_path)
+
+        if journal is None:
+            return o.copy(dest, self.force, self.link_files)
+
+        sig = J.signature(o)
+
+        if os.path.lexists(dest):
+            # The size is checked also as the file may be lost or truncated
+            # if the host stopped before the file was synced.
+            if not self.force and \
+                    journal.done(o.install_path, [sig, J.file_size(dest)]):
+                return False
+
+            # It may be partially copied before interrupted or the file was
+            # changed since copied. Dirs are kept as these contain others.
+            force = not os.path.isdir(dest) or self.force
+        else:
+            force = self.force
+
+        ret = o.copy(dest, force, self.link_files)
+
+        size = J.file_size(dest)
+        journal.record(o.install_path, [sig, size],
+                       None if size is None else dest)
+
+        return ret
+
+    def linkfile(self, o):
+        """
+        Hardlink a file copied into self.shared_srcdir into srcdir.
+
+        :param o: FileObject to link
+        """
+        src = PU.to_srcdir(self.shared_srcdir, o.install_path)
+        dest = PU.to_srcdir(self.srcdir, o.install_path)
+
+        if not os.path.lexists(src):  # e.g. it was not copyable.
+            return False
+
+        st = os.lstat(src)
+
+        if os.path.lexists(dest):
+            dst = os.lstat(dest)
+
+            if stat.S_ISDIR(st.st_mode) or \
+                    (dst.st_dev, dst.st_ino) == (st.st_dev, st.st_ino):
+                return False
+
+            os.remove(dest)
+
+        destdir = os.path.dirname(dest)
+        if not os.path.exists(destdir):
+            try:
+                os.makedirs(destdir)
+                C.copy_metadata(destdir, os.lstat(os.path.dirname(src)))
+            except OSError:  # Created by another thread.
+                pass
+
+        if stat.S_ISDIR(st.st_mode):
+            os.mkdir(dest)
+            C.copy_metadata(dest, st)
+        elif stat.S_ISLNK(st.st_mode):
+            os.symlink(os.readlink(src), dest)
+            C.copy_metadata(dest, st, True)
+        else:
+            os.link(src, dest)
+            C.STATS.incr("hardlink")
+
+        C.STATS.incr("files")
+        return True
 
     def copyfiles(self):
-        for o in self.files:
-            dest = PU.to_srcdir(self.srcdir, o.install_path)
-            o.copy(dest, self.force)
+        """
+        Copy files into srcdir. Dirs are created in advance in order of paths
+        and then other files are copied in parallel with self.jobs threads.
+
+        Files are hardlinked instead if self.link_files is True and it's
+        possible. Files in srcdir are never modified in place later, so that
+        it's safe.
+
+        Files copied are recorded in the journal of setup step so that files
+        already copied are not copied again when the step is resumed after
+        interrupted or done again as its inputs changed. All files are copied
+        again with --force.
+
+        Files are hardlinked from self.shared_srcdir if it's set, where files
+        were copied once to build packages in multiple formats.
+        """
+        start = ST.snapshot()
+
+        (dirs, others) = self.files.partition(lambda o: o.type() == TYPE_DIR)
+
+        if self.shared_srcdir:
+            for o in dirs:
+                self.linkfile(o)
+
+            for _r in U.pmap(self.linkfile, others, self.jobs, 16):
+                pass
+
+        else:
+            self._copyfiles(dirs, others)
+
+        st = ST.measure("copyfiles", start)
+        elapsed = max(st.wall, 0.001)
+
+        logging.info("Copied %d files (%.1f MB, %d hardlinked) in %.2f sec: "
+                     "%.1f files/sec, %.1f MB/sec" %
+                     (st.files, st.bytes / 1048576.0, st.linked, elapsed,
+                      st.files / elapsed, st.bytes / 1048576.0 / elapsed))
+
+    def _copyfiles(self, dirs, others):
+        with J.Journal(self.journal_path("setup")) as journal:
+            if journal:
+                logging.info("Resume copying files: %d files were copied "
+                             "before" % len(journal))
+
+            for o in dirs:
+                self.copyfile(o, journal)
+
+            # Dirs of files must be ready before copying files in parallel.
+            destdirs = set()
+            for o in others:
+                destdir = os.path.dirname(PU.to_srcdir(self.srcdir,
+                                                       o.install_path))
+                if destdir not in destdirs:
+                    o.prepare_destdir(destdir)
+                    destdirs.add(destdir)
+
+            copy = lambda o: self.copyfile(o, journal)
+            for _r in U.pmap(copy, others, self.jobs, 16):
+                pass
 
     def dumpfile(self):
         return os.path.join(self.workdir, "pmaker-filelist.pkl")
@@ -150,6 +374,9 @@ class Base(object):
 
         A.AnyConfigParser.dump(self.pkgdata, self.conffile())
 
+        for path in (self.dumpfile(), self.conffile()):
+            J.fsync(path)
+
     def load(self):
         """
         Load the file list previously saved.
@@ -159,30 +386,118 @@ class Base(object):
         files = pickle.load(open(self.dumpfile(), "rb"))
 
         if files:
-            self.pkgdata.files = self.files = files
+            self.pkgdata.setup_files(files)
+            self.files = self.pkgdata.files
+
+    def templates(self):
+        """
+        :return: List of (template, output) of all files generated from
+            templates by this backend
+        """
+        return self._templates
+
+    def pkgdata_digest(self):
+        """
+        :return: Digest of pkgdata except for volatile keys, computed once in
+            each step
+        """
+        if self._pkgdata_digest is None:
+            data = dict((k, v) for k, v in self.pkgdata.iteritems() if k not
+                        in self._volatile_keys)
+            self._pkgdata_digest = _digest([json.dumps(data, sort_keys=True,
+                                                       default=A.to_dict)])
+
+        return self._pkgdata_digest
+
+    def template_digest(self, template):
+        """
+        :return: Digest of the content of the template or "" if not found
+        """
+        if template not in self._template_digests:
+            try:
+                tmpl = T.find_template(template, self.template_paths,
+                                       ask=False)
+                self._template_digests[template] = U.checksum(tmpl)
+            except T.TemplateNotFoundError:
+                self._template_digests[template] = ""
+
+        return self._template_digests[template]
+
+    def inputs_digest(self, step, prev=""):
+        """
+        Compute the digest of inputs of the step. Steps are done again if the
+        digests of them changed since they were done.
+
+        Inputs of setup are files to copy, and ones of preconfigure are pkgdata
+        and templates. The digest of the inputs of a step is chained with the
+        one of the previous step, so that all steps after the step of which
+        inputs changed are done again.
+
+        :param step: Step object, see pmaker.globals.PACKAGING_STEPS
+        :param prev: Digest of inputs of the previous step
+        :return: Digest string
+        """
+        xs = [prev, step.name]
+
+        if step.name == STEP_SETUP:
+            xs += ("%s %s" % (f.install_path, J.signature(f)) for f in
+                   self.files)
+
+        elif step.name == STEP_PRECONFIGURE:
+            xs.append(self.pkgdata_digest())
+            xs += ("%s %s" % (out, self.template_digest(tmpl)) for tmpl, out
+                   in self.templates())
+
+        return _digest(xs)
 
     def marker_path(self, step):
         return os.path.join(self.workdir, "pmaker-%(name)s.stamp" % step)
 
-    def try_the_step(self, step):
+    def journal_path(self, name):
+        return os.path.join(self.workdir, "pmaker-%s.journal" % name)
+
+    def stats_path(self):
+        return os.path.join(self.workdir, "pmaker-stats.json")
+
+    def try_the_step(self, step, digest=""):
         """
         Try to run given step.
 
+        The digest of the inputs of the step is saved in the marker file of
+        the step and the step is skipped if it's the same as the saved one.
+
         see also: pmaker.globals.PACKAGING_STEPS
+
+        :param step: Step object
+        :param digest: Digest of the inputs of the step
         """
         marker = self.marker_path(step)
 
         if os.path.exists(marker):
             msg = "...The step looks already done"
 
-            if self.force:
+            if open(marker).read().strip() != digest:
+                logging.info("%s but its inputs changed since: %s" %
+                             (msg, step.name))
+            elif self.force:
                 logging.info("%s: %s" % (msg, step.name))
             else:
                 logging.info("%s: Skip the step: %s" % (msg, step.name))
                 return
 
+        start = ST.snapshot()
+
+        self._pkgdata_digest = None  # pkgdata may be updated in steps.
         getattr(self, step.name, U.do_nothing)()
-        self.shell("touch " + marker, timeout=10)
+
+        # Files made in setup and preconfigure were synced before it.
+        with open(marker, "w") as out:
+            out.write(digest + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+        self.stats = ST.update(self.stats, ST.measure(step.name, start))
+        ST.save(self.stats, self.stats_path())
 
         if step.name == self.stepto:
             if step.name == STEP_BUILD:
@@ -204,8 +519,9 @@ class Base(object):
         if not self.files:
             self.load()
 
-        for template, output in self._templates:
-            self.genfile(template, output)
+        with J.Journal(self.journal_path("preconfigure")) as journal:
+            for template, output in self._templates:
+                self.genfile(template, output, journal)
 
     def configure(self):
         pass
@@ -216,20 +532,90 @@ class Base(object):
     def build(self):
         pass
 
+    def inputs_digests(self):
+        """
+        :return: List of (step, digest of inputs of the step) of steps to run
+            up to self.stepto
+        """
+        (ret, digest) = ([], "")
+
+        for step in self._steps:
+            digest = self.inputs_digest(step, digest)
+            ret.append((step, digest))
+
+            if step.name == self.stepto:
+                break
+
+        return ret
+
+    def artifacts(self, since=0):
+        """
+        :param since: Find packages built since this time only
+        :return: List of paths of packages built
+        """
+        patterns = [os.path.join(self.workdir, p % self.pkgdata) for p in
+                    ARTIFACTS.get(self.format(), [])]
+        paths = U.concat(glob.glob(p) for p in patterns)
+
+        return sorted(p for p in paths if os.path.isfile(p) and
+                      os.path.getmtime(p) >= since)
+
+    def restore_artifacts(self, digest):
+        """
+        Get packages built from the same inputs from the artifact cache.
+
+        :param digest: Digest of the inputs of the step self.stepto
+        :return: List of paths of packages restored or None
+        """
+        if self.artifact_cache is None or self.force or \
+                self.stepto not in ARTIFACT_STEPS:
+            return None
+
+        paths = self.artifact_cache.get(digest, self.workdir)
+        if paths:
+            logging.info("Got packages from the artifact cache: " +
+                         ", ".join(paths))
+
+        return paths
+
+    def store_artifacts(self, digest, since):
+        if self.artifact_cache is None or self.stepto not in ARTIFACT_STEPS:
+            return
+
+        paths = self.artifacts(since)
+        if paths and self.artifact_cache.put(digest, self.workdir, paths):
+            logging.info("Stored packages in the artifact cache: " +
+                         ", ".join(paths))
+
     def run(self):
         """
         Run all of the processes to make a package: setup, configure, ...
 
         see also: pmaker.globals.PACKAGING_STEPS
         """
-        for step in self._steps:
+        start = int(time.time()) - 1  # mtime may be truncated.
+        digests = self.inputs_digests()
+
+        if self.restore_artifacts(digests[-1][1]):
+            return 0
+
+        # Resource usage of steps including ones done in previous runs.
+        self.stats = ST.load(self.stats_path())
+
+        for step, digest in digests:
             logging.info(step.message % self.pkgdata)
-            rc = self.try_the_step(step)
+
+            rc = self.try_the_step(step, digest)
 
             if rc == 1:
                 break
 
-        return 0
+        self.store_artifacts(digests[-1][1], start)
+
+        if self.print_stats and self.stats:
+            print ST.summary(self.stats)
+            print ST.caches_summary(U.memo_stats())
 
+        return 0
 
 # vim:sw=4:ts=4:et:
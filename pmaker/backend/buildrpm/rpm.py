@@ -30,7 +30,7 @@ class Backend(T.Backend, R.Backend):
     def __init__(self, pkgdata, **kwargs):
         super(Backend, self).__init__(pkgdata, **kwargs)
 
-        self._templates += [
+        self._templates = self._templates + [
             (TVER + "/buildrpm/rpm.mk", "rpm.mk"),
             (TVER + "/buildrpm/package.spec", self.pkgdata.name + ".spec"),
         ]
@@ -0,0 +1,214 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.globals import PMAKER_TEMPLATE_VERSION as TVER, TYPE_DIR
+
+import pmaker.archive as A
+import pmaker.backend.deb as D
+import pmaker.backend.native.tgz as T
+import pmaker.backend.utils as PU
+import pmaker.environ as E
+import pmaker.utils as U
+
+import grp
+import hashlib
+import os
+import os.path
+import pwd
+import tarfile
+
+
+# Map of architecture names: {uname -m (normalized): dpkg}
+DEB_ARCHS = {"x86_64": "amd64", "aarch64": "arm64", "ppc64le": "ppc64el",
+             "armv7l": "armhf", "s390x": "s390x", "i386": "i386"}
+
+# Owner of dirs and files not in the file list, e.g. /usr/share/doc/<name>.
+ROOT = dict(uid=0, gid=0, uname="root", gname="root")
+
+
+@U.memoize
+def owner(uid, gid):
+    """
+    :return: A dict of uid, gid and these names on this host to record in
+        archives. Names are empty if not found and dpkg uses ids then.
+
+    >>> owner(0, 0) == ROOT
+    True
+    """
+    try:
+        uname = pwd.getpwuid(uid).pw_name
+    except KeyError:
+        uname = ""
+
+    try:
+        gname = grp.getgrgid(gid).gr_name
+    except KeyError:
+        gname = ""
+
+    return dict(uid=uid, gid=gid, uname=uname, gname=gname)
+
+
+class Backend(T.Backend, D.Backend):
+    """
+    Make the binary deb package in process w/o debhelper, dpkg-buildpackage
+    and fakeroot.
+
+    Files in the src dir are written into data.tar with the modes and owners
+    in the file list recorded in tar headers, and the control files are
+    written into control.tar.gz. And then they are wrapped in the ar archive.
+    """
+
+    _format = "deb"
+    _strategy = "native"
+
+    _templates = T.Backend._templates + [
+        (TVER + "/common/debian/copyright", "debian/copyright"),
+    ]
+
+    # Templates of files in control.tar.gz made in the build step:
+    _control_templates = [
+        (TVER + "/native/debian/control", "DEBIAN/control"),
+        (TVER + "/native/debian/conffiles", "DEBIAN/conffiles"),
+    ]
+
+    # Files in workdir installed as docs: [(path, path in the doc dir)]
+    _docs = [("README", "README"),
+             ("pmaker-config.json", "pmaker-config.json"),
+             ("debian/copyright", "copyright")]
+
+    def __init__(self, pkgdata, **kwargs):
+        super(Backend, self).__init__(pkgdata, **kwargs)
+
+        arch = E.get_arch()
+        self.pkgdata.deb_arch = DEB_ARCHS.get(arch, arch) if pkgdata.arch \
+            else "all"
+
+    def debfile(self):
+        return os.path.join(self.workdir,
+                            "%(name)s_%(pversion)s_%(deb_arch)s.deb" %
+                            self.pkgdata)
+
+    def templates(self):
+        return self._templates + self._control_templates
+
+    def preconfigure(self):
+        U.createdir(os.path.join(self.workdir, "debian"))
+        super(Backend, self).preconfigure()
+
+    def _add_parents(self, tar, relpath):
+        """
+        Add dir entries of parent dirs of relpath not in the file list, owned
+        by root.
+        """
+        parts = relpath.split(os.path.sep)[:-1]
+
+        for i in range(1, len(parts) + 1):
+            tar.add_dir(self.srcdir, os.path.join(".", *parts[:i]),
+                        mode=0755, **ROOT)
+
+    def make_data_tar(self, path):
+        """
+        Make data.tar of files and docs.
+
+        :param path: Output path
+        :return: A tuple of ([(md5sum, path) of files], installed size in KB)
+        """
+        compressor = self.pkgdata.compressor
+        docdir = "usr/share/doc/%(name)s" % self.pkgdata
+        (md5sums, size) = ([], 0)
+
+        with A.TarWriter(path, compressor.ext, compressor.cmd,
+                         format=tarfile.GNU_FORMAT) as tar:
+            tar.add(self.srcdir, ".", mode=0755, **ROOT)
+
+            for o in sorted(self.files, key=lambda o: o.install_path):
+                rel = o.install_path.strip(os.path.sep)
+                src = PU.to_srcdir(self.srcdir, o.install_path)
+                arcname = os.path.join(".", rel)
+                attrs = owner(int(o.uid), int(o.gid))
+                attrs = dict(attrs, mode=o.perm)
+                digest = hashlib.md5() if o.isfile() else None
+
+                self._add_parents(tar, rel)
+
+                if o.type() == TYPE_DIR:
+                    tar.add_dir(src, arcname, **attrs)
+                    continue
+
+                tinfo = tar.add(src, arcname, digest, **attrs)
+                size += tinfo.size
+
+                if digest is not None and not rel.startswith("etc/"):
+                    md5sums.append((digest.hexdigest(), rel))
+
+            for f, doc in self._docs:
+                src = os.path.join(self.workdir, f)
+                rel = os.path.join(docdir, doc)
+                digest = hashlib.md5()
+
+                self._add_parents(tar, rel)
+                tinfo = tar.add(src, os.path.join(".", rel), digest,
+                                mode=0644, **ROOT)
+
+                size += tinfo.size
+                md5sums.append((digest.hexdigest(), rel))
+
+        return (md5sums, (size + 1023) / 1024)
+
+    def make_control_tar(self, path, md5sums):
+        """
+        Make control.tar.gz of control files.
+        """
+        debiandir = os.path.join(self.workdir, "DEBIAN")
+
+        open(os.path.join(debiandir, "md5sums"), "w").writelines(
+            "%s  %s\n" % md5sum for md5sum in md5sums
+        )
+
+        with A.TarWriter(path, "gz", format=tarfile.GNU_FORMAT) as tar:
+            tar.add(debiandir, ".", mode=0755, **ROOT)
+
+            for f in ("control", "conffiles", "md5sums"):
+                p = os.path.join(debiandir, f)
+
+                if os.path.getsize(p) > 0:
+                    tar.add(p, os.path.join(".", f), mode=0644, **ROOT)
+
+    def build(self):
+        debiandir = os.path.join(self.workdir, "DEBIAN")
+        U.createdir(debiandir)
+
+        data = os.path.join(debiandir,
+                            "data.tar." + self.pkgdata.compressor.ext)
+        control = os.path.join(debiandir, "control.tar.gz")
+
+        (md5sums, self.pkgdata.installed_size) = self.make_data_tar(data)
+
+        for template, output in self._control_templates:
+            self.genfile(template, output)
+
+        self.make_control_tar(control, md5sums)
+
+        ar = A.ArWriter(self.debfile())
+        try:
+            ar.add_data("debian-binary", "2.0\n")
+            ar.add_file("control.tar.gz", control)
+            ar.add_file(os.path.basename(data), data)
+        finally:
+            ar.close()
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,85 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.globals import STEP_BUILD
+from pmaker.tests.common import cleanup_workdir
+
+import pmaker.backend.tests.common as TC
+
+import distutils.spawn
+import os.path
+import subprocess
+import unittest
+
+
+def read_ar(path):
+    """
+    :return: [(name, data)] of members in the ar archive
+    """
+    data = open(path, "rb").read()
+    assert data.startswith("!<arch>\n")
+
+    (members, pos) = ([], 8)
+    while pos < len(data):
+        header = data[pos:pos + 60]
+        (name, size) = (header[:16].strip(), int(header[48:58]))
+
+        pos += 60
+        members.append((name, data[pos:pos + size]))
+        pos += size + size % 2
+
+    return members
+
+
+class Test_00_Backend(unittest.TestCase):
+
+    def setUp(self):
+        (self.workdir, self.listfile) = TC.setup_workdir_and_listfile()
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_build(self):
+        tester = TC.BackendTester(self.workdir, self.listfile, STEP_BUILD,
+                                  "native.deb")
+        self.assertTrue(tester.try_run())
+
+        backend = tester.backend
+        deb = backend.debfile()
+        self.assertTrue(os.path.exists(deb))
+
+        members = read_ar(deb)
+        self.assertEquals([n for n, _d in members][:2],
+                          ["debian-binary", "control.tar.gz"])
+        self.assertEquals(members[0][1], "2.0\n")
+        self.assertTrue(members[2][0].startswith("data.tar."))
+
+        if not distutils.spawn.find_executable("dpkg-deb"):
+            return
+
+        info = subprocess.Popen(["dpkg-deb", "-f", deb],
+                                stdout=subprocess.PIPE).communicate()[0]
+        self.assertTrue("Package: foo\n" in info)
+
+        contents = subprocess.Popen(["dpkg-deb", "-c", deb],
+                                    stdout=subprocess.PIPE).communicate()[0]
+        for o in backend.files:
+            self.assertTrue(" ." + o.install_path in contents)
+
+        self.assertTrue(" root/root " in contents)
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,154 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.globals import STEP_PRECONFIGURE, STEP_SBUILD
+from pmaker.tests.common import cleanup_workdir
+
+import pmaker.backend.tests.common as TC
+
+import os.path
+import StringIO
+import subprocess
+import tarfile
+import unittest
+
+
+def list_archive(path, ext):
+    if ext in ("gz", "bz2"):
+        return tarfile.open(path).getnames()
+
+    data = subprocess.Popen([ext, "-dc", path],
+                            stdout=subprocess.PIPE).communicate()[0]
+    return tarfile.open(fileobj=StringIO.StringIO(data)).getnames()
+
+
+class Test_00_Backend(unittest.TestCase):
+
+    def setUp(self):
+        (self.workdir, self.listfile) = TC.setup_workdir_and_listfile()
+
+        # List of files not changed during tests.
+        self.listfile2 = os.path.join(self.workdir, "files2.list")
+        open(self.listfile2, "w").write("/etc/resolv.conf\n/etc/passwd\n")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_sbuild(self):
+        tester = TC.BackendTester(self.workdir, self.listfile, STEP_SBUILD,
+                                  "native.tgz")
+        self.assertTrue(tester.try_run())
+
+        backend = tester.backend
+        tgz = backend.tarball()
+        self.assertTrue(os.path.exists(tgz))
+
+        distdir = backend.distname()
+        names = list_archive(tgz, backend.pkgdata.compressor.ext)
+
+        for f in ("configure.ac", "Makefile.am", "README",
+                  "pmaker-config.json"):
+            self.assertTrue(os.path.join(distdir, f) in names)
+
+        for o in backend.files:
+            path = os.path.join(distdir, "src", o.install_path.lstrip("/"))
+            self.assertEquals(path in names, o.isfile())
+
+        # Dirs are archived before files in them.
+        self.assertEquals(names[0], distdir)
+        self.assertTrue(names.index(os.path.join(distdir, "src")) <
+                        min(names.index(n) for n in names if "/src/" in n))
+
+        self.assertFalse(os.path.exists(os.path.join(backend.workdir,
+                                                     "configure")))
+
+    def test_10_sbuild__incremental(self):
+        tester = TC.BackendTester(self.workdir, self.listfile2, STEP_SBUILD,
+                                  "native.tgz")
+        self.assertTrue(tester.try_run())
+
+        tgz = tester.backend.tarball()
+        os.utime(tgz, (0, 0))
+
+        # Nothing changed and all steps should be skipped.
+        tester = TC.BackendTester(self.workdir, self.listfile2, STEP_SBUILD,
+                                  "native.tgz")
+        self.assertTrue(tester.try_run())
+        self.assertEquals(os.stat(tgz).st_mtime, 0)
+
+        # The list of files changed and steps should be done again.
+        open(self.listfile2, "a").write("\n/etc/hosts\n")
+
+        tester = TC.BackendTester(self.workdir, self.listfile2, STEP_SBUILD,
+                                  "native.tgz")
+        self.assertTrue(tester.try_run())
+        self.assertNotEquals(os.stat(tgz).st_mtime, 0)
+
+    def test_20_sbuild__artifact_cache(self):
+        options = "--artifact-cache " + os.path.join(self.workdir, "cache")
+
+        tester = TC.BackendTester(os.path.join(self.workdir, "0"),
+                                  self.listfile2, STEP_SBUILD, "native.tgz",
+                                  options)
+        self.assertTrue(tester.try_run())
+        tgz = tester.backend.tarball()
+
+        # Same inputs in another dir and the tarball should be got from the
+        # cache w/o running any steps.
+        tester = TC.BackendTester(os.path.join(self.workdir, "1"),
+                                  self.listfile2, STEP_SBUILD, "native.tgz",
+                                  options)
+        self.assertFalse(tester.try_run())
+
+        tgz2 = tester.backend.tarball()
+        self.assertNotEquals(tgz, tgz2)
+        self.assertEquals(open(tgz).read(), open(tgz2).read())
+        self.assertFalse(os.path.exists(tester.backend.srcdir))
+
+    def test_30_templates__not_shared(self):
+        tester = TC.BackendTester(self.workdir, self.listfile2, STEP_SBUILD,
+                                  "autotools.single.rpm", "--no-rpmdb")
+        self.assertTrue("rpm.mk" in
+                        [out for _tmpl, out in tester.backend.templates()])
+
+        tester = TC.BackendTester(self.workdir, self.listfile2, STEP_SBUILD,
+                                  "native.tgz")
+        self.assertFalse("rpm.mk" in
+                         [out for _tmpl, out in tester.backend.templates()])
+        self.assertFalse("foo.spec" in
+                         [out for _tmpl, out in tester.backend.templates()])
+
+    def test_40_preconfigure__force(self):
+        def nrecords(backend, name):
+            return len(open(backend.journal_path(name)).readlines())
+
+        tester = TC.BackendTester(self.workdir, self.listfile2,
+                                  STEP_PRECONFIGURE, "native.tgz")
+        self.assertTrue(tester.try_run())
+
+        counts = [nrecords(tester.backend, s) for s in ("setup",
+                                                        "preconfigure")]
+
+        # Nothing changed but all files should be copied and generated again.
+        tester = TC.BackendTester(self.workdir, self.listfile2,
+                                  STEP_PRECONFIGURE, "native.tgz", "--force")
+        self.assertTrue(tester.try_run())
+
+        self.assertEquals([nrecords(tester.backend, s) for s in
+                           ("setup", "preconfigure")], [n * 2 for n in counts])
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,83 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.archive as A
+import pmaker.backend.autotools.single.tgz as T
+
+import os.path
+
+
+class Backend(T.Backend):
+    """
+    Make the source tarball in process w/o running autoreconf, configure,
+    make and make dist.
+
+    The layout of the tarball is same as the one made by 'make dist' of
+    autotools.single.tgz except that files generated by autotools (configure,
+    Makefile.in, etc.) are not included: run 'autoreconf -fi' in the
+    extracted dir to build it with autotools.
+    """
+
+    _format = "tgz"
+    _strategy = "native"
+
+    _templates = list(T.Backend._templates)
+
+    # Files generated from templates and so on in workdir to archive:
+    _distfiles = ["configure.ac", "Makefile.am", "README",
+                  "pmaker-config.json"]
+    _distfiles_conflicts = ["apply-overrides", "revert-overrides",
+                            "trigger-overrides"]
+
+    def distname(self):
+        return "%(name)s-%(pversion)s" % self.pkgdata
+
+    def tarball(self):
+        return os.path.join(self.workdir, "%s.tar.%s" %
+                            (self.distname(), self.pkgdata.compressor.ext))
+
+    def distfiles(self):
+        """
+        :return: List of paths of files to archive relative to workdir
+        """
+        files = list(self._distfiles)
+
+        if self.pkgdata.conflicts.files:
+            files += self._distfiles_conflicts
+
+        srcdir = os.path.relpath(self.srcdir, self.workdir)
+
+        return files + [os.path.join(srcdir, f.lstrip(os.path.sep)) for dd in
+                        self.pkgdata.distdata for f in dd.files]
+
+    def configure(self):
+        pass
+
+    def sbuild(self):
+        distdir = self.distname()
+        compressor = self.pkgdata.compressor
+
+        with A.TarWriter(self.tarball(), compressor.ext, compressor.cmd,
+                         dist_modes=True) as tar:
+            tar.add_dir(self.workdir, distdir)
+
+            for f in self.distfiles():
+                tar.add_parents(self.workdir, f, distdir)
+                tar.add(os.path.join(self.workdir, f),
+                        os.path.join(distdir, f))
+
+
+# vim:sw=4:ts=4:et:
@@ -19,6 +19,8 @@ import pmaker.backend.autotools.single.rpm
 import pmaker.backend.autotools.single.deb
 import pmaker.backend.buildrpm.tgz
 import pmaker.backend.buildrpm.rpm
+import pmaker.backend.native.tgz
+import pmaker.backend.native.deb
 
 
 def map():
@@ -28,6 +30,8 @@ def map():
         pmaker.backend.autotools.single.deb.Backend,
         pmaker.backend.buildrpm.tgz.Backend,
         pmaker.backend.buildrpm.rpm.Backend,
+        pmaker.backend.native.tgz.Backend,
+        pmaker.backend.native.deb.Backend,
     ]
 
     return dict((b.type(), b) for b in backends)
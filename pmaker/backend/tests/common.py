@@ -75,9 +75,11 @@ def setup_workdir_and_listfile():
 class BackendTester(object):
 
     def __init__(self, workdir, listfile, step=STEP_BUILD,
-                 btype="autotools.single.tgz"):
+                 btype="autotools.single.tgz", options=""):
         """
         Initialize backend object.
+
+        :param options: Extra options of pmaker
         """
         self.workdir = workdir
         self.listfile = listfile
@@ -86,7 +88,8 @@ class BackendTester(object):
         tmplpath = os.path.join(TOPDIR, "templates")
 
         args = "-n foo -w %s --template-path %s -v" % (workdir, tmplpath)
-        args += " --driver %s --stepto %s %s" % (btype, step, listfile)
+        args += " --driver %s --stepto %s %s %s" % (btype, step, options,
+                                                    listfile)
 
         pkgdata = init_pkgdata(args)
 
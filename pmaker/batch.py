@@ -0,0 +1,300 @@
+#
+# Build many packages in a batch with a pool of worker processes.
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Manifest is a JSON (or YAML) file lists package definitions. Each package
+# definition is a dict of long option names of pmaker (w/o leading '--' and
+# '-' replaced with '_') and their values, and "files", the path of the list
+# of files relative to the manifest:
+#
+#   {"defaults": {"pversion": "0.1", "driver": "autotools.single.rpm"},
+#    "packages": [{"name": "foo", "files": "foo.files"},
+#                 {"name": "bar", "files": "bar.files", "no_mock": true}]}
+#
+import pmaker.anycfg as Anycfg
+import pmaker.backend.registry as Backends
+import pmaker.collectors.FilelistCollectors as Collectors
+import pmaker.environ as E
+import pmaker.globals as G
+import pmaker.models.Bunch as B
+import pmaker.models.FileSet as FS
+import pmaker.multiformat as M
+import pmaker.options as O
+import pmaker.pkgdata as P
+import pmaker.rpmutils as R
+import pmaker.tenjinwrapper as T
+import pmaker.utils as U
+
+import json
+import logging
+import multiprocessing
+import optparse
+import os.path
+import sys
+import time
+import traceback
+
+
+# Env object probed only once in the parent process and inherited by workers.
+_ENV = None
+
+
+def to_argv(pkg, basedir=os.curdir):
+    """
+    Make the arguments of pmaker from the package definition.
+
+    :param pkg: Package definition, a dict of options and "files"
+    :param basedir: Dir of relative path of "files" from
+
+    >>> to_argv(dict(name="foo", files="foo.list", no_mock=True, trace=False,
+    ...              relations=["requires:a", "requires:b"]), "/tmp")
+    ... # doctest: +NORMALIZE_WHITESPACE
+    ['--name', 'foo', '--no-mock', '--relations', 'requires:a',
+     '--relations', 'requires:b', '/tmp/foo.list']
+    """
+    if not pkg.get("files"):
+        raise ValueError("Package definition lacks files: " + str(pkg))
+
+    argv = []
+
+    for key, val in sorted(pkg.iteritems()):
+        if key == "files" or val is None or val is False:
+            continue
+
+        opt = "--" + key.replace("_", "-")
+
+        if val is True:
+            argv.append(opt)
+        elif isinstance(val, (list, tuple)):
+            for v in val:
+                argv += [opt, str(v)]
+        else:
+            argv += [opt, str(val)]
+
+    return argv + [os.path.join(basedir, pkg["files"])]
+
+
+def load_manifest(manifest):
+    """
+    :param manifest: Path to the manifest file
+    :return: List of (name, argv) of each package definition
+    """
+    data = Anycfg.AnyConfigParser().load(manifest)
+    basedir = os.path.dirname(os.path.abspath(manifest))
+    defaults = data.get("defaults", {})
+
+    jobs = []
+    for i, p in enumerate(data.get("packages", [])):
+        pkg = dict(defaults)
+        pkg.update(p)
+
+        jobs.append((pkg.get("name", "#%d" % i), to_argv(pkg, basedir)))
+
+    return jobs
+
+
+def parse_args(argv, env=None):
+    (opts, args) = O.Options(env=env or _ENV).parse_args(argv)
+    return (opts, args)
+
+
+def driver_templates(opts, driver):
+    """
+    :param opts: Option object of the package to build
+    :param driver: Packaging driver
+    :return: List of paths of templates the backend of driver renders
+    """
+    backend = Backends.map().get(driver)(P.PkgData(opts, FS.FileSet()))
+    return [tmpl for tmpl, _out in backend.templates()]
+
+
+def warm_caches(optss):
+    """
+    Load the rpmdb index and compile templates of drivers used in the parent
+    process before forking workers to share them among workers.
+
+    :param optss: List of option objects of packages to build
+    """
+    for opts in optss:
+        cachedir = U.get_attr(opts, "cachedir") or G.PMAKER_CACHEDIR
+
+        if U.get_attr(opts, "template_cache"):
+            tmpls = []
+
+            for tmpl in U.concat(driver_templates(opts, d) for d in
+                                 opts.drivers or [opts.driver]):
+                try:
+                    tmpls.append(T.find_template(tmpl, opts.template_paths,
+                                                 ask=False))
+                except T.TemplateNotFoundError:
+                    pass
+
+            T.precompile(tmpls, os.path.join(cachedir, T.CACHE_SUBDIR),
+                         T._ENGINE)
+
+    if optss and R.is_rpmdb_available():
+        opts = optss[0]
+        cachedir = U.get_attr(opts, "cachedir") or G.PMAKER_CACHEDIR
+
+        if U.get_attr(opts, "rpmdb_cache"):
+            R.set_index_cache(os.path.join(cachedir, "rpmdb.db"))
+        else:
+            R.set_index_cache(None)
+
+        R.index()
+
+
+def _init_worker():
+    R.reset_connections()
+
+
+def build(job):
+    """
+    Build a package in worker processes.
+
+    :param job: A tuple of (name, argv)
+    :return: Bunch object holds name, rc, error (traceback), elapsed time and
+        workdir of the package
+    """
+    (name, argv) = job
+    ret = B.Bunch(name=name, rc=1, error=None, workdir=None)
+    start = time.time()
+
+    try:
+        (opts, args) = parse_args(argv)
+        ret.workdir = opts.workdir
+
+        listfile = args[0] if args else opts.config
+        ccls = Collectors.map().get(opts.input_type)
+        fs = ccls(listfile, opts).collect()
+
+        if not fs:
+            raise RuntimeError("Failed to collect files from " + listfile)
+
+        pkgdata = P.PkgData(opts, fs)
+
+        if opts.drivers:
+            # Workers of the pool cannot have child processes.
+            results = M.run(pkgdata, opts.drivers, 1)
+            ret.rc = max(r.rc for r in results)
+        else:
+            backend = Backends.map().get(opts.driver)(pkgdata)
+
+            rc = backend.run()
+            ret.rc = 0 if rc is None else rc
+
+    except Exception:
+        ret.error = traceback.format_exc()
+        logging.error("Failed to build %s:\n%s" % (name, ret.error))
+
+    ret.elapsed = time.time() - start
+    return ret
+
+
+def run(jobs, procs=1):
+    """
+    Build packages in parallel.
+
+    :param jobs: List of (name, argv) of packages to build
+    :param procs: Number of worker processes
+    :return: List of results of build() in the order of jobs
+    """
+    global _ENV
+
+    if _ENV is None:
+        _ENV = E.Env()
+
+    warm_caches([parse_args(argv)[0] for _name, argv in jobs])
+
+    if procs < 2 or len(jobs) < 2:
+        return [build(job) for job in jobs]
+
+    pool = multiprocessing.Pool(min(procs, len(jobs)), _init_worker)
+    try:
+        results = pool.map(build, jobs, chunksize=1)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return results
+
+
+def summary(results):
+    """
+    :param results: List of results of build()
+    :return: Summary of results in table format
+    """
+    lines = ["%-32s %-6s %10s  %s" % ("name", "status", "elapsed", "workdir")]
+
+    for r in results:
+        lines.append("%-32s %-6s %9.2fs  %s" %
+                     (r.name, "ok" if r.rc == 0 else "FAIL", r.elapsed,
+                      r.workdir or ""))
+
+    failed = [r for r in results if r.rc != 0]
+
+    lines.append("\n%d packages: %d succeeded, %d failed" %
+                 (len(results), len(results) - len(failed), len(failed)))
+
+    for r in failed:
+        errors = (r.error or "rc=%d" % r.rc).strip().splitlines()
+        lines.append("  %s: %s" % (r.name, errors[-1]))
+
+    return "\n".join(lines)
+
+
+def option_parser():
+    p = optparse.OptionParser("%prog [OPTION ...] MANIFEST")
+    p.set_defaults(procs=multiprocessing.cpu_count(), output=None)
+
+    p.add_option("-p", "--procs", type="int",
+                 help="Number of worker processes [%default]")
+    p.add_option("-o", "--output", help="Output results in JSON to this file")
+
+    return p
+
+
+def main(argv=sys.argv):
+    logging.basicConfig(format="%(asctime)s %(levelname)-7s %(message)s",
+                        datefmt="%H:%M:%S",
+                        )
+
+    p = option_parser()
+    (options, args) = p.parse_args(argv[1:])
+
+    if not args:
+        p.print_usage()
+        return 1
+
+    results = run(load_manifest(args[0]), options.procs)
+
+    if options.output:
+        json.dump(results, open(options.output, "w"), indent=2)
+
+    print summary(results)
+
+    return 0 if all(r.rc == 0 for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,324 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.globals as G
+import pmaker.utils as U
+
+import logging
+import os
+import os.path
+import threading
+import time
+
+try:
+    import sqlite3
+except ImportError:
+    logging.warn("sqlite3 module is not available. Disabled checksum cache.")
+    sqlite3 = None
+
+
+CACHE_FILE = os.path.join(G.PMAKER_CACHEDIR, "checksums.db")
+
+# Max number of entries kept in the cache. Least recently used entries are
+# removed if the number of entries exceeded it.
+MAX_ENTRIES = 1000000
+
+# Files modified within this period (in seconds) are not cached because they
+# may be modified again w/o changing mtime on filesystems of which time
+# resolution is coarse.
+RACY_PERIOD = 2
+
+# The 'used' timestamp of entries are only refreshed after this period (in
+# seconds) to avoid writes on every cache hit.
+USED_RESOLUTION = 24 * 60 * 60
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS checksums (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (dev, ino, size, mtime_ns)
+)"""
+
+
+def stat_key(st):
+    """
+    Make a key of the cache from stat result.
+
+    :param st: os.stat_result object
+    :return: A tuple of (st_dev, st_ino, st_size, mtime in nsec)
+    """
+    mtime_ns = getattr(st, "st_mtime_ns", None)
+    if mtime_ns is None:
+        mtime_ns = int(st.st_mtime * 1000000000)
+
+    return (st.st_dev, st.st_ino, st.st_size, mtime_ns)
+
+
+def is_valid_checksum(csum, clen=len(U.checksum())):
+    """
+    >>> is_valid_checksum(U.checksum())
+    True
+    >>> is_valid_checksum("0123")
+    False
+    >>> is_valid_checksum("x" * len(U.checksum()))
+    False
+    """
+    if not csum or len(csum) != clen:
+        return False
+
+    try:
+        int(csum, 16)
+        return True
+    except ValueError:
+        return False
+
+
+class ChecksumCache(object):
+    """
+    Persistent checksum cache shared among pmaker processes.
+
+    Checksums of files are saved in a sqlite database keyed by (device, inode,
+    size, mtime in nsec) of the files so that files not changed since the last
+    run are not needed to be read and hashed again.
+
+    Connections are opened per thread as sqlite3 connection objects cannot be
+    shared among threads. Concurrent accesses from several processes are
+    serialized by the database lock of sqlite itself.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, max_entries=MAX_ENTRIES,
+                 timeout=30, batch=1000):
+        """
+        :param cache_file: Path to the cache database file
+        :param max_entries: Max number of entries kept in the cache
+        :param timeout: Seconds to wait for the lock held by other processes
+        :param batch: Number of new entries to save at once
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.batch = batch
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = []
+        self.hits = self.misses = 0
+
+        cachedir = os.path.dirname(cache_file)
+        if not os.path.exists(cachedir):
+            os.makedirs(cachedir, 0700)
+
+        conn = self._conn()
+        conn.execute(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.cache_file, timeout=self.timeout)
+            conn.text_factory = str
+            self._local.conn = conn
+
+        return conn
+
+    def get(self, key):
+        """
+        :param key: A tuple made by stat_key()
+        :return: Checksum string or None if not found or invalid
+        """
+        try:
+            r = self._conn().execute(
+                "SELECT checksum, used FROM checksums WHERE dev = ? AND "
+                "ino = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+        except sqlite3.Error, e:
+            logging.warn("Could not lookup checksum cache: " + str(e))
+            return None
+
+        if r is None:
+            return None
+
+        (csum, used) = r
+
+        if not is_valid_checksum(csum):
+            logging.warn("Broken entry in checksum cache: " + str(key))
+            return None
+
+        now = int(time.time())
+        if now - used > USED_RESOLUTION:
+            self._save([(now, ) + key], "UPDATE checksums SET used = ? "
+                       "WHERE dev = ? AND ino = ? AND size = ? AND "
+                       "mtime_ns = ?")
+        return csum
+
+    def put(self, key, csum):
+        """
+        Queue the entry and save entries queued in batch.
+        """
+        self._lock.acquire()
+        try:
+            self._pending.append(key + (csum, int(time.time())))
+            if len(self._pending) < self.batch:
+                return
+
+            (rows, self._pending) = (self._pending, [])
+        finally:
+            self._lock.release()
+
+        self._save(rows)
+
+    def _save(self, rows, sql="INSERT OR REPLACE INTO checksums VALUES "
+                              "(?, ?, ?, ?, ?, ?)"):
+        conn = self._conn()
+        try:
+            conn.executemany(sql, rows)
+            conn.commit()
+        except sqlite3.Error, e:
+            conn.rollback()
+            logging.warn("Could not save checksum cache: " + str(e))
+
+    def checksum(self, path, st=None):
+        """
+        Get the checksum of given file from the cache or compute it if not
+        found in the cache.
+
+        :param path: File path
+        :param st: os.stat_result object of the path if available
+        """
+        try:
+            if st is None:
+                st = os.stat(path)
+        except OSError:
+            return U.checksum(path)
+
+        key = stat_key(st)
+        csum = self.get(key)
+
+        if csum is not None:
+            self.hits += 1
+            return csum
+
+        self.misses += 1
+        csum = U.checksum(path)
+
+        # Save it only if the file was not modified during hashing and it's
+        # not too new to trust its mtime.
+        try:
+            st2 = os.stat(path)
+        except OSError:
+            return csum
+
+        if stat_key(st2) == key and is_valid_checksum(csum) and \
+                time.time() - st2.st_mtime > RACY_PERIOD and \
+                csum != U.checksum():
+            self.put(key, csum)
+
+        return csum
+
+    def evict(self):
+        """
+        Remove least recently used entries if the number of entries exceeds
+        self.max_entries.
+        """
+        conn = self._conn()
+        (n, ) = conn.execute("SELECT COUNT(*) FROM checksums").fetchone()
+
+        if n > self.max_entries:
+            logging.debug("Evicting %d entries from checksum cache" %
+                          (n - self.max_entries))
+            self._save([(n - self.max_entries, )],
+                       "DELETE FROM checksums WHERE rowid IN (SELECT rowid "
+                       "FROM checksums ORDER BY used LIMIT ?)")
+
+    def flush(self):
+        """
+        Save entries queued and evict old entries.
+        """
+        self._lock.acquire()
+        try:
+            (rows, self._pending) = (self._pending, [])
+        finally:
+            self._lock.release()
+
+        if rows:
+            self._save(rows)
+
+        self.evict()
+        logging.debug("checksum cache: hits=%d, misses=%d" %
+                      (self.hits, self.misses))
+
+
+_CACHE = None
+
+
+def enable(cache_file=CACHE_FILE, **kwargs):
+    """
+    Enable the default checksum cache used by checksum() below.
+    """
+    global _CACHE
+
+    if sqlite3 is None:
+        return None
+
+    try:
+        _CACHE = ChecksumCache(cache_file, **kwargs)
+    except (OSError, sqlite3.Error), e:
+        logging.warn("Could not open checksum cache: " + str(e))
+        _CACHE = None
+
+    return _CACHE
+
+
+def disable():
+    global _CACHE
+    _CACHE = None
+
+
+def flush():
+    if _CACHE is not None:
+        _CACHE.flush()
+
+
+def stats():
+    """
+    :return: A dict of hits and misses of the default cache or None if it's
+        not enabled
+    """
+    if _CACHE is None:
+        return None
+
+    return dict(hits=_CACHE.hits, misses=_CACHE.misses)
+
+
+def checksum(path, st=None):
+    """
+    Compute or get from the default cache the checksum of given file.
+
+    :param path: File path
+    :param st: os.stat_result object of the path if available
+    """
+    if _CACHE is None:
+        return U.checksum(path)
+
+    return _CACHE.checksum(path, st)
+
+
+# vim:sw=4:ts=4:et:
@@ -19,15 +19,20 @@ import pmaker.collectors.Modifiers as M
 import pmaker.collectors.RpmModifiers as RM
 import pmaker.globals as G
 import pmaker.models.FileObjectFactory as Factory
+import pmaker.models.FileSet as FS
 
 import pmaker.anycfg as A
+import pmaker.checksumcache as CC
 import pmaker.configurations as C
 import pmaker.environ as E
 import pmaker.parser as P
+import pmaker.rpmutils as R
 import pmaker.utils as U
+import pmaker.walker as W
 
 import glob
 import logging
+import operator
 import os
 import os.path
 import sys
@@ -67,6 +72,10 @@ def driver_is_rpm(driver):
     return driver_to_format(driver) == G.PKG_FORMAT_RPM
 
 
+# Max number of FileObjects sorted in memory at once.
+SORT_BUFFER_SIZE = 100000
+
+
 def lopen(path):
     return path == "-" and sys.stdin or open(path)
 
@@ -91,6 +100,21 @@ class FilelistCollector(Collector):
         self.listfile = listfile
         self.config = config
         self.trace = config.trace
+        self.jobs = int(U.get_attr(config, "jobs") or 1)
+        self.bufsize = int(U.get_attr(config, "sort_buffer_size") or
+                           SORT_BUFFER_SIZE)
+
+        cachedir = U.get_attr(config, "cachedir") or G.PMAKER_CACHEDIR
+
+        if U.get_attr(config, "checksum_cache"):
+            CC.enable(os.path.join(cachedir, "checksums.db"))
+        else:
+            CC.disable()
+
+        if U.get_attr(config, "rpmdb_cache"):
+            R.set_index_cache(os.path.join(cachedir, "rpmdb.db"))
+        else:
+            R.set_index_cache(None)
 
         self.filters = [
             F.UnsupportedTypesFilter(),
@@ -108,7 +132,10 @@ class FilelistCollector(Collector):
         if config.ignore_owner:
             self.modifiers.append(M.OwnerModifier())  # uid = gid = 0
 
-        if driver_is_rpm(config.driver):
+        # Files are collected once for all drivers with --drivers.
+        drivers = U.get_attr(config, "drivers") or [config.driver]
+
+        if any(driver_is_rpm(d) for d in drivers):
             logging.debug("Adding RpmAttributeModifier")
             self.modifiers.append(RM.RpmAttributeModifier())
 
@@ -118,8 +145,8 @@ class FilelistCollector(Collector):
                 logging.debug("Adding RpmConflictsModifier")
                 self.modifiers.append(RM.RpmConflictsModifier(config.name))
 
-    def _parse(self, line):
-        """Parse the line and returns FileObjects list generator.
+    def _specs(self, line):
+        """Parse the line and returns a list of (path, attrs).
         """
         # remove extra white spaces at the top and the end.
         line = line.rstrip().strip()
@@ -133,47 +160,95 @@ class FilelistCollector(Collector):
                 print "line=" + line
                 raise
 
-            return [Factory.create(p, self.use_rpmdb, **attrs) for p in paths]
+            return [(p, attrs) for p in paths]
 
-    def list(self, listfile):
+    def _create(self, spec):
         """
-        Read paths from given file line by line and returns path list sorted by
-        dir names. There some speical parsing rules for the file list:
+        :param spec: A tuple of (path, attrs)
+        """
+        (path, attrs) = spec
+        return Factory.create(path, self.use_rpmdb, **attrs)
+
+    def _parse(self, line):
+        """Parse the line and returns FileObjects list.
+        """
+        return [self._create(spec) for spec in self._specs(line)]
+
+    def _inputs(self, listfile):
+        return (l for l in lopen(listfile) if l)
+
+    def ilist(self, listfile):
+        """
+        Read paths from given file line by line and yield FileObjects sorted by
+        paths. There some speical parsing rules for the file list:
 
         * Empty lines or lines start with "#" are ignored.
         * The lines contain "*" (glob match) will be expanded to real dir or
           file names: ex. "/etc/httpd/conf/*" will be
           ["/etc/httpd/conf/httpd.conf", "/etc/httpd/conf/magic", ...] .
 
+        Lines are parsed lazily and FileObjects are created (stat-ed and
+        checksum-ed) in parallel if self.jobs > 1. At most self.bufsize
+        FileObjects are kept in memory to sort and deduplicate them.
+
         :param listfile: Path list file name or "-" (read list from stdin)
         """
-        return U.unique(
-            U.concat(self._parse(l) for l in lopen(listfile).readlines() if l)
-        )
+        specs = U.iconcat(self._specs(x) for x in self._inputs(listfile))
+        fos = U.pmap(self._create, specs, self.jobs)
 
-    def _collect(self, listfile):
-        """Collect FileObject instances from given path list.
+        return U.iunique(fos, operator.attrgetter("path"), self.bufsize)
 
-        :param listfile: See the above description.
+    def list(self, listfile):
         """
-        for fo in self.list(listfile):
-            # filter out if any filter(fi) -> True
-            filtered = any(filter(fo) for filter in self.filters)
+        Same as the above but returns a list.
+        """
+        return [fo for fo in self.ilist(listfile)]
 
-            if filtered:
-                logging.debug("Filtered out: path=" + fo.path)
-            else:
-                for modifier in self.get_modifiers():
-                    fo = modifier.update(fo)
+    def _process(self, fo):
+        """Filter out or modify given FileObject.
+
+        :param fo: FileObject instance
+        :return: Modified FileObject or None if it's filtered out
+        """
+        # filter out if any filter(fi) -> True
+        filtered = any(filter(fo) for filter in self.filters)
+
+        if filtered:
+            logging.debug("Filtered out: path=" + fo.path)
+            return None
+
+        for modifier in self.get_modifiers():
+            fo = modifier.update(fo)
+
+        # Too verbose but useful in some cases:
+        if self.trace:
+            logging.debug("(result) fo: " + str(fo)[:60] + "...")
 
-                # Too verbose but useful in some cases:
-                if self.trace:
-                    logging.debug("(result) fo: " + str(fo)[:60] + "...")
+        return fo
 
+    def _collect(self, listfile):
+        """Collect FileObject instances from given path list.
+
+        :param listfile: See the above description.
+        """
+        for fo in U.pmap(self._process, self.ilist(listfile), self.jobs):
+            if fo is not None:
                 yield fo
 
     def collect(self):
-        return [f for f in self._collect(self.listfile) if f]
+        Factory.SYSCALLS.reset()
+        try:
+            fos = [f for f in self._collect(self.listfile) if f]
+        finally:
+            CC.flush()
+
+        nsyscalls = Factory.SYSCALLS.total()
+        logging.info("%d syscalls to get metadata of %d files (%.2f/file): "
+                     "%s" % (nsyscalls, len(fos),
+                             float(nsyscalls) / max(len(fos), 1),
+                             ", ".join("%s=%d" % x for x in
+                                       Factory.SYSCALLS.items())))
+        return FS.FileSet(fos)
 
 
 class AnyFilelistCollector(FilelistCollector):
@@ -198,7 +273,7 @@ class AnyFilelistCollector(FilelistCollector):
             else:
                 logging.warn("Invalid type passed: " + itype)
 
-    def _parse(self, bobj):
+    def _specs(self, bobj):
         """
         :param bobj: A Bunch object holds path and attrs (metadata) of files.
         """
@@ -210,9 +285,9 @@ class AnyFilelistCollector(FilelistCollector):
             paths = "*" in path and glob.glob(path) or [path]
             attrs = bobj.get("attrs", dict())
 
-            return [Factory.create(p, self.use_rpmdb, **attrs) for p in paths]
+            return [(p, attrs) for p in paths]
 
-    def list(self, listfile):
+    def _inputs(self, listfile):
         cparser = A.AnyConfigParser(self.itype)
         data = cparser.load(listfile)
 
@@ -221,11 +296,64 @@ class AnyFilelistCollector(FilelistCollector):
                 "'files' not defined in given filelist: " + listfile
             )
 
-        return U.unique(U.concat(self._parse(o) for o in data.files))
+        return data.files
+
+
+class DirTreeCollector(FilelistCollector):
+    """
+    Collect files and dirs under the dirs walking their trees.
+
+    The input is a dir or a file lists dirs in the same format as
+    FilelistCollector's, and attributes specified for a dir are applied to all
+    files and dirs under it. Files and dirs to collect are selected with glob
+    patterns given as config.includes and config.excludes.
+    """
+
+    _types = ["filelist.tree", "dir"]
+
+    def __init__(self, listfile, config, **kwargs):
+        super(DirTreeCollector, self).__init__(listfile, config, **kwargs)
+
+        self.includes = self._patterns(U.get_attr(config, "includes"))
+        self.excludes = self._patterns(U.get_attr(config, "excludes"))
+
+        # Files found while walking exist of course.
+        self.filters = [f for f in self.filters if
+                        not isinstance(f, F.NotExistFilter)]
+
+    def _patterns(self, patterns):
+        if not patterns:
+            return []
+
+        if isinstance(patterns, basestring):  # e.g. loaded from config files
+            return [p for p in patterns.split(",") if p]
+
+        return patterns
+
+    def _specs(self, line):
+        """
+        :return: A list of (path, attrs, lstat result) of files and dirs under
+            the dirs in the line
+        """
+        walker = W.Walker(self.includes, self.excludes, self.jobs)
+        roots = super(DirTreeCollector, self)._specs(line)
+
+        return U.iconcat(((p, attrs, st) for p, st in walker.walk(root)) for
+                         root, attrs in roots)
+
+    def _create(self, spec):
+        (path, attrs, st) = spec
+        return Factory.create(path, self.use_rpmdb, st, **attrs)
+
+    def _inputs(self, listfile):
+        if os.path.isdir(listfile):
+            return [listfile]
+
+        return super(DirTreeCollector, self)._inputs(listfile)
 
 
 def map():
-    collectors = (FilelistCollector, AnyFilelistCollector)
+    collectors = (FilelistCollector, AnyFilelistCollector, DirTreeCollector)
     return dict(U.concat([(t, c) for t in c.types()] for c in collectors))
 
 
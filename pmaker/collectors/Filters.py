@@ -16,10 +16,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from pmaker.globals import TYPES_SUPPORTED
-from pmaker.models.FileObjects import FileObject
+from pmaker.models.FileObjects import FileObject, SYSCALLS
 
 import logging
 import os
+import stat
 
 
 class BaseFilter(object):
@@ -82,8 +83,11 @@ class NotExistFilter(BaseFilter):
     _reason = "not exist"
 
     def _pred(self, f):
-        return not (f.create or os.path.exists(f.path) or \
-            os.path.islink(f.path))
+        if f.create or f.lstat() is not None:  # It was lstat-ed, exists.
+            return False
+
+        SYSCALLS.incr("exists")
+        return not (os.path.exists(f.path) or os.path.islink(f.path))
 
 
 class ReadAccessFilter(BaseFilter):
@@ -94,8 +98,25 @@ class ReadAccessFilter(BaseFilter):
     _reason = "not permitted to read"
 
     def _pred(self, f):
-        return not (f.create or os.access(f.path, os.R_OK) or \
-            os.path.islink(f.path))
+        if f.create:
+            return False
+
+        st = f.lstat()
+        if st is None:
+            SYSCALLS.incr("access")
+            return not (os.access(f.path, os.R_OK) or os.path.islink(f.path))
+
+        if stat.S_ISLNK(st.st_mode):
+            return False
+
+        # Permission bits for the owner decide it w/o access(2) call unless
+        # the owner is root (root can read any files).
+        uid = os.getuid()
+        if uid != 0 and st.st_uid == uid:
+            return not st.st_mode & stat.S_IRUSR
+
+        SYSCALLS.incr("access")
+        return not os.access(f.path, os.R_OK)
 
 
 class WhitespacesInPathFilter(BaseFilter):
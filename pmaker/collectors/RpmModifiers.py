@@ -22,6 +22,11 @@ import logging
 import os.path
 
 
+# Shared among files not conflict with others not to make an empty dict for
+# each file. It must not be modified.
+NO_CONFLICTS = dict()
+
+
 class RpmAttributeModifier(M.FileObjectModifier):
     _priority = 9
 
@@ -50,13 +55,13 @@ class RpmConflictsModifier(M.FileObjectModifier):
 
         :param path: Path of target file/dir/symlink.
         """
-        owner_nvrae = R.rpm_search_provides_by_path(path)
+        owner_nvrae = R.index().owner(path)
 
         if owner_nvrae and owner_nvrae["name"] != self.name:
             logging.warn("%s is owned by %s" % (path, owner_nvrae["name"]))
             return owner_nvrae
         else:
-            return dict()
+            return NO_CONFLICTS
 
     def update(self, fo, *args, **kwargs):
         fo.conflicts = self.find_owner(fo.install_path)
@@ -22,6 +22,7 @@ def map():
     collectors = (
         FC.FilelistCollector,
         FC.AnyFilelistCollector,
+        FC.DirTreeCollector,
     )
     return dict(U.concat([(t, c) for t in c.types()] for c in collectors))
 
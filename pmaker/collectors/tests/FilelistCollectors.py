@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 from pmaker.collectors.FilelistCollectors import FilelistCollector, \
-    AnyFilelistCollector
+    AnyFilelistCollector, DirTreeCollector
 from pmaker.tests.common import setup_workdir, cleanup_workdir
 
 import pmaker.anycfg as Anycfg
@@ -157,6 +157,37 @@ class Test_01_FilelistCollector(unittest.TestCase):
 
         self.assertEquals(sorted(fos), fos_ref)
 
+    def test_03_list__multi_real_files__parallel(self):
+        listfile = os.path.join(self.workdir, "file.list")
+        config = init_config(listfile)
+
+        open(listfile, "w").write("\n".join(PATHS))
+
+        collector = FilelistCollector(listfile, config)
+        fos_ref = collector.list(listfile)
+
+        config.jobs = 4
+        collector = FilelistCollector(listfile, config)
+        fos = collector.list(listfile)
+
+        self.assertEquals(fos, fos_ref)
+        self.assertEquals([f.path for f in fos], [f.path for f in fos_ref])
+
+    def test_03_list__multi_real_files__merge_sorted_runs(self):
+        listfile = os.path.join(self.workdir, "file.list")
+        config = init_config(listfile)
+
+        open(listfile, "w").write("\n".join(PATHS + PATHS))
+
+        collector = FilelistCollector(listfile, config)
+        fos_ref = collector.list(listfile)
+
+        config.sort_buffer_size = 3
+        collector = FilelistCollector(listfile, config)
+        fos = collector.list(listfile)
+
+        self.assertEquals(fos, fos_ref)
+
     def test_04_collect__single_real_file__no_rpms_own(self):
         path = random.choice(SYSTEM_FILES_EXIST_AND_NO_RPMS_OWN)
 
@@ -404,4 +435,65 @@ class Test_03_AnyFilelistCollector__w_side_effects(unittest.TestCase):
                           sorted(f.path for f in fos_ref_filtered))
 
 
+class Test_04_DirTreeCollector(unittest.TestCase):
+
+    _multiprocess_can_split_ = True
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.topdir = os.path.join(self.workdir, "app")
+
+        for d in ("a/b", "a/c", "d"):
+            os.makedirs(os.path.join(self.topdir, d))
+
+        for f in ("a/x.conf", "a/b/y.conf", "a/b/y.pyc", "d/z.txt"):
+            open(os.path.join(self.topdir, f), "w").write(f + "\n")
+
+        os.symlink("x.conf", os.path.join(self.topdir, "a/x.link"))
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_01_list__dir(self):
+        config = init_config(self.topdir)
+        paths_ref = sorted(os.path.join(d, f) for d, ds, fs in
+                           os.walk(self.topdir) for f in ds + fs)
+        paths_ref = sorted([self.topdir] + paths_ref)
+
+        collector = DirTreeCollector(self.topdir, config)
+        fos = collector.list(self.topdir)
+
+        self.assertEquals([f.path for f in fos], paths_ref)
+
+        fos_ref = [Factory.create(p, False) for p in paths_ref]
+        self.assertEquals(fos, fos_ref)
+
+        config.jobs = 4
+        collector = DirTreeCollector(self.topdir, config)
+        self.assertEquals(collector.list(self.topdir), fos_ref)
+
+    def test_02_list__listfile_w_attrs(self):
+        listfile = os.path.join(self.workdir, "dirs.list")
+        open(listfile, "w").write(os.path.join(self.topdir, "a") + ",uid=0\n")
+
+        config = init_config(listfile)
+        collector = DirTreeCollector(listfile, config)
+        fos = collector.list(listfile)
+
+        self.assertEquals(len(fos), 7)
+        self.assertTrue(all(f.uid == 0 for f in fos))
+
+    def test_03_collect__includes_and_excludes(self):
+        config = init_config(self.topdir)
+        config.includes = ["*.conf", "*.pyc"]
+        config.excludes = ["*/a/b/*.pyc", os.path.join(self.topdir, "d")]
+
+        collector = DirTreeCollector(self.topdir, config)
+        fos = collector.collect()
+
+        self.assertEquals([f.path for f in fos],
+                          [os.path.join(self.topdir, p) for p in
+                           ("a/b/y.conf", "a/x.conf")])
+
+
 # vim:sw=4:ts=4:et:
@@ -84,6 +84,13 @@ class TestNotExistFilter(unittest.TestCase):
         fo = Factory.create(path)
         self.assertFalse(filter.pred(fo))
 
+    def test_pred__exist__no_syscalls(self):
+        fo = Factory.create("/bin/sh")
+
+        Factory.SYSCALLS.reset()
+        self.assertFalse(NotExistFilter().pred(fo))
+        self.assertEquals(Factory.SYSCALLS.total(), 0)
+
 
 class TestReadAccessFilter(unittest.TestCase):
 
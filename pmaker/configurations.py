@@ -48,9 +48,22 @@ def _defaults(env):
     defaults.input_type = "filelist.plain"
 
     defaults.driver = Backends.default()  # e.g. "autotools.single.rpm"
+    defaults.drivers = None  # build with these drivers in parallel.
     defaults.format = env.format
     defaults.destdir = ""
     defaults.template_paths = env.template_paths
+    defaults.jobs = 1  # number of threads to collect files.
+    defaults.sort_buffer_size = 100000  # max number of files sorted in mem.
+    defaults.cachedir = G.PMAKER_CACHEDIR
+    defaults.checksum_cache = True
+    defaults.rpmdb_cache = True
+    defaults.template_cache = True
+    defaults.link_files = False  # hardlink files into srcdir if possible.
+    defaults.artifact_cache = None  # dir to cache packages built.
+    defaults.artifact_cache_size = 4096  # in MB.
+    defaults.stats = False  # print resource usage of each step.
+    defaults.includes = None  # glob patterns of files to collect from dirs.
+    defaults.excludes = None  # likewise but not to collect.
 
     # package metadata options:
     defaults.name = None
@@ -82,12 +95,13 @@ def _defaults(env):
 
 class Config(B.Bunch):
 
-    def __init__(self, norc=False, forced_type=None):
+    def __init__(self, norc=False, forced_type=None, env=None):
         """
         :param norc: No rc, i.e. do not load any RC (config) files.
         :param forced_type: Force set configuration file type.
+        :param env: Env object shared with others or None to make it
         """
-        self._env = E.Env()
+        self._env = E.Env() if env is None else env
         self._cparser = Anycfg.AnyConfigParser(forced_type)
         self.files = []
 
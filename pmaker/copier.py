@@ -0,0 +1,285 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.shell import run
+
+import pmaker.utils as U
+
+import errno
+import logging
+import os
+import os.path
+import stat
+import sys
+
+try:
+    import ctypes
+    import ctypes.util
+    import fcntl
+
+    # find_library() runs ldconfig and so on to find it, which takes time. On
+    # linux, libc symbols are available from the python process itself.
+    _LIBC = ctypes.CDLL(None if sys.platform.startswith("linux") else
+                        ctypes.util.find_library("c"), use_errno=True)
+except (ImportError, OSError, TypeError):
+    logging.info("ctypes or libc is not available. Copy files by read/write")
+    _LIBC = None
+
+
+# ioctl to clone (reflink) the file: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Max bytes copied by copy_file_range(2) and sendfile(2) at once.
+CHUNK_SIZE = 1 << 30
+
+# Buffer size to copy files by read/write.
+BUFSIZE = 1 << 20
+
+# Errors mean that the method to copy is not supported for these files:
+_UNSUPPORTED_ERRORS = (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.ENOTTY,
+                       errno.EOPNOTSUPP, errno.EBADF, errno.ETXTBSY)
+
+# Extended attributes not needed to be preserved:
+XATTRS_IGNORED = ("security.selinux", )
+
+# Counts of files and bytes copied.
+STATS = U.Counter()
+
+
+def _libc_fn(name, *argtypes):
+    fn = getattr(_LIBC, name, None)
+
+    if fn is not None:
+        fn.restype = ctypes.c_ssize_t
+        fn.argtypes = argtypes
+
+    return fn
+
+
+if _LIBC is not None and sys.platform.startswith("linux"):
+    (_c_int, _c_ptr, _c_size) = (ctypes.c_int, ctypes.c_void_p,
+                                 ctypes.c_size_t)
+    _copy_file_range = _libc_fn("copy_file_range", _c_int, _c_ptr, _c_int,
+                                _c_ptr, _c_size, ctypes.c_uint)
+    _sendfile = _libc_fn("sendfile", _c_int, _c_int, _c_ptr, _c_size)
+    _llistxattr = _libc_fn("llistxattr", ctypes.c_char_p, ctypes.c_char_p,
+                           _c_size)
+else:
+    _LIBC = _copy_file_range = _sendfile = _llistxattr = None
+
+
+def _reflink(sfd, dfd):
+    if _LIBC is None:
+        return False
+
+    try:
+        fcntl.ioctl(dfd, FICLONE, sfd)
+        return True
+    except IOError, e:
+        if e.errno in _UNSUPPORTED_ERRORS:
+            return False
+        raise
+
+
+def _copy_by(fn, sfd, dfd, size):
+    """
+    Copy the content with copy_file_range(2) or sendfile(2).
+
+    :return: True if copied or False if fn is not supported
+    """
+    if fn is None:
+        return False
+
+    copied = 0
+    while True:
+        if fn is _copy_file_range:
+            n = fn(sfd, None, dfd, None, CHUNK_SIZE, 0)
+        else:
+            n = fn(dfd, sfd, None, CHUNK_SIZE)
+
+        if n < 0:
+            err = ctypes.get_errno()
+
+            if copied == 0 and err in _UNSUPPORTED_ERRORS:
+                return False
+
+            raise OSError(err, os.strerror(err))
+
+        if n == 0:
+            break
+
+        copied += n
+
+    return copied >= size or _copy_by_rw(sfd, dfd)
+
+
+def _copy_by_rw(sfd, dfd):
+    while True:
+        buf = os.read(sfd, BUFSIZE)
+        if not buf:
+            break
+
+        while buf:
+            n = os.write(dfd, buf)
+            buf = buf[n:]
+
+    return True
+
+
+def copy_content(src, dst, size=None):
+    """
+    Copy the content of file src to dst.
+
+    :param src: Source file path
+    :param dst: Destination file path, must not exist
+    :param size: Size of src if known
+    :return: The method used to copy: "reflink", "copy_file_range",
+        "sendfile" or "rw"
+    """
+    sfd = os.open(src, os.O_RDONLY)
+    try:
+        if size is None:
+            size = os.fstat(sfd).st_size
+
+        dfd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0600)
+        try:
+            if _reflink(sfd, dfd):
+                return "reflink"
+
+            if _copy_by(_copy_file_range, sfd, dfd, size):
+                return "copy_file_range"
+
+            if _copy_by(_sendfile, sfd, dfd, size):
+                return "sendfile"
+
+            _copy_by_rw(sfd, dfd)
+            return "rw"
+        finally:
+            os.close(dfd)
+    finally:
+        os.close(sfd)
+
+
+def has_xattrs(path):
+    """
+    :return: True if path has extended attributes to preserve
+    """
+    if _llistxattr is None:
+        return False
+
+    size = _llistxattr(path, None, 0)
+    if size <= 0:
+        return False
+
+    buf = ctypes.create_string_buffer(size)
+    size = _llistxattr(path, buf, size)
+    if size <= 0:
+        return False
+
+    names = [n for n in buf.raw[:size].split("\0") if n]
+    return any(n not in XATTRS_IGNORED for n in names)
+
+
+def copy_metadata(dst, st, symlink=False):
+    """
+    Copy owner, mode and timestamps in st to dst.
+
+    :param dst: Destination path
+    :param st: lstat result of the source
+    :param symlink: dst is a symlink or not
+    """
+    if U.is_superuser():
+        try:
+            os.lchown(dst, st.st_uid, st.st_gid)
+        except OSError, e:
+            logging.warn("Could not chown %s: %s" % (dst, e))
+
+    if symlink:
+        return  # Mode and timestamps of symlinks cannot be set by os.*.
+
+    # chown clears setuid/setgid bits so that chmod must be done after it.
+    os.chmod(dst, stat.S_IMODE(st.st_mode))
+    os.utime(dst, (st.st_atime, st.st_mtime))
+
+
+def copy(src, dst, st=None):
+    """
+    Copy src to dst with its metadata (mode, owner and timestamps) in process
+    as "cp -a src dst" does.
+
+    The content of files are copied in kernel w/o passing it through user
+    space with trying reflink (FICLONE ioctl), copy_file_range(2) and
+    sendfile(2) in this order, and by read/write if none of them are
+    available. Files other than regular files and files have extended
+    attributes (except for SELinux labels) are copied with "cp -a".
+
+    :param src: Source path of a file or symlink
+    :param dst: Destination path, must not exist
+    :param st: lstat result of src if available
+    :return: Bytes copied
+    """
+    if st is None:
+        st = os.lstat(src)
+
+    if stat.S_ISLNK(st.st_mode):
+        os.symlink(os.readlink(src), dst)
+        copy_metadata(dst, st, True)
+        STATS.incr("files")
+        return 0
+
+    if not stat.S_ISREG(st.st_mode) or has_xattrs(src):
+        run("cp -a %s %s" % (src, dst))
+        STATS.incr("files")
+        return 0
+
+    method = copy_content(src, dst, st.st_size)
+    copy_metadata(dst, st)
+
+    STATS.incr("files")
+    STATS.incr("bytes", st.st_size)
+    STATS.incr(method)
+
+    return st.st_size
+
+
+def link(src, dst, st=None):
+    """
+    Hardlink file src to dst, or copy it with copy() above if it's not a
+    regular file or could not be linked, e.g. src and dst are on different
+    filesystems or it's not permitted (fs.protected_hardlinks).
+
+    :param src: Source path of a file or symlink
+    :param dst: Destination path, must not exist
+    :param st: lstat result of src if available
+    :return: Bytes copied (0 if linked)
+    """
+    if st is None:
+        st = os.lstat(src)
+
+    if stat.S_ISREG(st.st_mode):
+        try:
+            os.link(src, dst)
+
+            STATS.incr("files")
+            STATS.incr("hardlink")
+            return 0
+        except OSError, e:
+            logging.debug("Could not link %s: %s" % (src, e))
+
+    return copy(src, dst, st)
+
+
+# vim:sw=4:ts=4:et:
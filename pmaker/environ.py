@@ -14,9 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
-from pmaker.globals import PKG_FORMAT_TGZ, PKG_FORMAT_RPM, PKG_FORMAT_RPM, \
+from pmaker.globals import PKG_FORMAT_TGZ, PKG_FORMAT_RPM, PKG_FORMAT_DEB, \
     PACKAGING_STEPS, STEP_PRECONFIGURE, STEP_SETUP, STEP_BUILD, COLLECTORS, \
-    TEMPLATE_SEARCH_PATHS, COMPRESSING_TOOLS, UPTO
+    TEMPLATE_SEARCH_PATHS, COMPRESSING_TOOLS, UPTO, PMAKER_CACHEDIR, \
+    PMAKER_VERSION
 
 import pmaker.models.Bunch as B
 import pmaker.utils as U
@@ -26,9 +27,11 @@ import logging
 import os
 import os.path
 import platform
+import pwd
 import re
 import socket
 import subprocess
+import threading
 
 
 try:
@@ -40,16 +43,17 @@ except ImportError:
         logging.warn("JSON module is not available. Disabled its support.")
         json = None
 
-try:
-    import yaml
-except ImportError:
-    logging.warn("YAML module is not available. Disabled its support.")
-    yaml = None
-
 
 DIST_NAMES = (DIST_RHEL, DIST_FEDORA, DIST_DEBIAN) = \
     ("rhel", "fedora", "debian")
 
+# Results of probes running commands are saved in this file and reused until
+# the files probed are modified.
+PROBE_CACHE_FILE = os.path.join(PMAKER_CACHEDIR, "probes.json")
+
+# Environment variables which results of probes depend on:
+PROBE_ENV_VARS = ("PATH", "HOME", "USER", "MAIL_ADDRESS", "FULLNAME")
+
 
 @U.memoize
 def hostname():
@@ -142,7 +146,7 @@ def is_git_available():
 
 @U.memoize
 def get_username():
-    return os.environ.get("USER", os.getlogin())
+    return os.environ.get("USER") or pwd.getpwuid(os.getuid()).pw_name
 
 
 @U.memoize
@@ -211,6 +215,182 @@ def get_compressor(ctools=COMPRESSING_TOOLS):
     raise RuntimeError("No compressor found! Aborting...")
 
 
+def which(command):
+    """
+    :return: Path of the command found in PATH or None
+
+    >>> which("sh") is not None
+    True
+    >>> which("not_existing_command_xyz")
+    """
+    for d in os.environ.get("PATH", os.defpath).split(os.pathsep):
+        path = os.path.join(d, command)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+
+    return None
+
+
+def git_config_files():
+    """
+    :return: Paths of git config files 'git config' may read in the current
+        dir, exist or not
+    """
+    files = ["/etc/gitconfig", os.path.expanduser("~/.gitconfig"),
+             os.path.expanduser("~/.config/git/config")]
+
+    d = os.getcwd()
+    while True:
+        if os.path.exists(os.path.join(d, ".git")):
+            return files + [os.path.join(d, ".git", "config")]
+
+        parent = os.path.dirname(d)
+        if parent == d:
+            return files
+
+        d = parent
+
+
+def _git_deps():
+    return [which("git")] + git_config_files()
+
+
+def _compressor_deps(ctools=COMPRESSING_TOOLS):
+    return glob.glob("/usr/share/automake-*/am") + \
+        [which(ct.command) for ct in ctools]
+
+
+def stamp(paths):
+    """
+    :param paths: Paths of files and dirs (or None)
+    :return: List of [path, mtime or None if it does not exist]
+    """
+    ret = []
+
+    for path in paths:
+        try:
+            ret.append([path, os.stat(path).st_mtime])
+        except (OSError, TypeError):
+            ret.append([path, None])
+
+    return ret
+
+
+class ProbeCache(object):
+    """
+    Persistent cache of results of probes. A result is invalidated when any
+    of files or dirs it depends on, environment variables in PROBE_ENV_VARS
+    or the version of pmaker is changed.
+    """
+
+    def __init__(self, cache_file=PROBE_CACHE_FILE):
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.envs = [[k, os.environ.get(k)] for k in PROBE_ENV_VARS]
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            data = json.load(open(self.cache_file))
+
+            if data.get("version") == PMAKER_VERSION and \
+                    data.get("envs") == self.envs:
+                return data
+        except (IOError, OSError, ValueError, AttributeError):
+            pass
+
+        return dict(version=PMAKER_VERSION, envs=self.envs, probes={})
+
+    def save(self):
+        tmp = "%s.%d.tmp" % (self.cache_file, os.getpid())
+        try:
+            d = os.path.dirname(self.cache_file)
+            if d and not os.path.exists(d):
+                os.makedirs(d)
+
+            json.dump(self.data, open(tmp, "w"))
+            os.rename(tmp, self.cache_file)
+
+        except (IOError, OSError), e:
+            logging.debug("Could not save probe cache: " + str(e))
+
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get(self, key, probe, deps=()):
+        """
+        :param key: Key of the result
+        :param probe: Function to get the result, must be JSON serializable
+        :param deps: Paths of files and dirs the result depends on
+        """
+        st = stamp(deps)
+
+        with self.lock:
+            entry = self.data["probes"].get(key)
+
+            if entry is not None and entry["stamp"] == st:
+                value = entry["value"]
+
+                # json module loads strings as unicode objects.
+                if isinstance(value, unicode):
+                    value = value.encode("utf-8")
+
+                return value
+
+            value = probe()
+            self.data["probes"][key] = dict(value=value, stamp=st)
+            self.save()
+
+            return value
+
+
+_PROBE_CACHE_FILE = PROBE_CACHE_FILE if json is not None else None
+_PROBE_CACHE = None
+
+
+def set_probe_cache(cache_file):
+    """
+    Set the path to the probe cache file, or None not to cache results.
+    """
+    global _PROBE_CACHE_FILE, _PROBE_CACHE
+
+    _PROBE_CACHE_FILE = cache_file if json is not None else None
+    _PROBE_CACHE = None
+
+
+def probed(key, probe, deps=lambda: ()):
+    """
+    Call probe or get its result from the probe cache.
+
+    :param deps: Function returns paths the result depends on
+    """
+    global _PROBE_CACHE
+
+    if _PROBE_CACHE_FILE is None:
+        return probe()
+
+    if _PROBE_CACHE is None:
+        _PROBE_CACHE = ProbeCache(_PROBE_CACHE_FILE)
+
+    return _PROBE_CACHE.get(key, probe, deps())
+
+
+def _dist(env):
+    (name, version, arch) = get_distribution()
+
+    return B.Bunch(name=name, version=version, arch=arch,
+                   label="-".join((name, version, arch)))
+
+
+def _compressor(env):
+    ext = probed("compressor", lambda: get_compressor().extension,
+                 _compressor_deps)
+    ct = [c for c in env.compressors if c.extension == ext][0]
+    ct.triple = (ct.command, ct.extension, ct.am_option)
+
+    return ct
+
+
 @U.singleton
 class Env(B.Bunch):
     """
@@ -220,48 +400,52 @@ class Env(B.Bunch):
     >>> env1 == env2
     """
 
+    # Attributes computed on the first access: {name: function(env)}
+    _lazy_attrs = dict(
+        hostname=lambda env: hostname(),
+        arch=lambda env: get_arch(),
+        format=lambda env: get_package_format(),
+        formats=lambda env: get_package_formats(),
+        is_git_available=lambda env: probed("is_git_available",
+                                            is_git_available,
+                                            lambda: [which("git")]),
+        username=lambda env: get_username(),
+        email=lambda env: probed("email", get_email, _git_deps),
+        fullname=lambda env: probed("fullname", get_fullname, _git_deps),
+        dist=_dist,
+        compressor=_compressor,
+        yaml=lambda env: U.try_import("yaml"),
+    )
+
     def __init__(self, **kwargs):
-        global UPTO, PACKAGING_STEPS, COMPRESSING_TOOLS, json, yaml
+        global UPTO, PACKAGING_STEPS, COMPRESSING_TOOLS, json
 
         # from globals
         self.steps = PACKAGING_STEPS
         self.upto = self.stepto = UPTO
 
         self.template_paths = TEMPLATE_SEARCH_PATHS
-
-        self.hostname = hostname()
-        self.arch = get_arch()
-        self.format = get_package_format()
-        self.formats = get_package_formats()
-        self.is_git_available = is_git_available()
-        self.username = get_username()
-        self.email = get_email()
-        self.fullname = get_fullname()
-
-        n, v, a = get_distribution()
-        self.dist = B.Bunch()
-        self.dist.name = n
-        self.dist.version = v
-        self.dist.arch = a
-        self.dist.label = "-".join((n, v, a))
-
-        self.compressor = get_compressor()
-        self.compressor.triple = (
-            self.compressor.command,
-            self.compressor.extension,
-            self.compressor.am_option,
-        )
         self.compressors = COMPRESSING_TOOLS
 
         self.workdir = os.path.join(os.getcwd(), "workdir")
 
         # modules
         self.json = json
-        self.yaml = yaml
 
         for k, v in kwargs.iteritems():
             if k not in self:
                 self[k] = v
 
+    def __missing__(self, key):
+        """
+        Compute lazy attributes on the first access.
+        """
+        fn = self._lazy_attrs.get(key)
+        if fn is None:
+            raise KeyError(key)
+
+        val = self[key] = fn(self)
+        return val
+
 
 # vim:sw=4:ts=4:et:
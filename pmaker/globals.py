@@ -43,6 +43,14 @@ BACKENDS = dict()
 
 TEMPLATE_SEARCH_PATHS = ["/usr/share/pmaker/templates", "."]
 
+# Top dir to save persistent caches shared among pmaker processes:
+PMAKER_CACHEDIR = os.path.join(
+    os.environ.get("HOME", os.curdir), ".cache", PMAKER_NAME
+)
+
+# Likewise but shared among users and filled at install time:
+PMAKER_SYSTEM_CACHEDIR = os.path.join("/var/cache", PMAKER_NAME)
+
 COMPRESSING_TOOLS = [
     B.Bunch(
         command="xz",
@@ -0,0 +1,184 @@
+#
+# Journal of build steps to resume them where they were interrupted.
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# A journal is a file of records appended as items of a step, e.g. files
+# staged into srcdir, are done. Each record is a line of a JSON list [key,
+# value] and the last record of a key wins. A line partially written when the
+# process was killed is ignored on loading.
+#
+# Records are synced to the disk after files they vouch for, e.g. files copied
+# into srcdir, are synced. Records may reach the disk before these files if the
+# host stopped before the sync, so that sizes of files are also recorded and
+# checked on resume to find files lost or truncated.
+#
+import hashlib
+import json
+import logging
+import os
+import os.path
+import stat
+import threading
+
+
+# Records are synced to the disk every this number of records and on close.
+SYNC_INTERVAL = 1000
+
+
+class Journal(object):
+
+    def __init__(self, path, sync_interval=SYNC_INTERVAL):
+        """
+        :param path: Journal file path
+        :param sync_interval: Sync records every this number of records
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.records = self.load(path)
+        self.lock = threading.Lock()
+        self.unsynced = 0
+        self.unsynced_paths = []
+        self.out = None
+
+    @staticmethod
+    def load(path):
+        """
+        :return: A dict of records {key: value} in the journal file
+        """
+        records = dict()
+
+        if not os.path.exists(path):
+            return records
+
+        for line in open(path):
+            try:
+                (key, value) = json.loads(line)
+                records[key] = value
+            except ValueError:
+                logging.debug("Ignored broken record: " + line)
+
+        return records
+
+    def get(self, key, default=None):
+        return self.records.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def done(self, key, value):
+        """
+        :return: True if the item of key was done with value
+        """
+        return key in self.records and self.records[key] == value
+
+    def record(self, key, value, path=None):
+        """
+        Record that the item of key was done with value.
+
+        :param path: Path of the regular file made by the item, synced to the
+            disk before the record is synced
+        """
+        line = json.dumps([key, value]) + "\n"
+
+        with self.lock:
+            if self.out is None:
+                self.out = open(self.path, "a")
+
+            self.out.write(line)
+            self.out.flush()
+            self.records[key] = value
+
+            if path is not None:
+                self.unsynced_paths.append(path)
+
+            self.unsynced += 1
+            if self.unsynced >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        for path in self.unsynced_paths:
+            fsync(path)
+
+        os.fsync(self.out.fileno())
+        self.unsynced = 0
+        self.unsynced_paths = []
+
+    def close(self):
+        with self.lock:
+            if self.out is not None:
+                self._sync()
+                self.out.close()
+                self.out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def fsync(path):
+    """
+    Sync the data of the regular file to the disk.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError, e:  # It will be found by its size on resume if lost.
+        logging.warn("Could not sync %s: %s" % (path, e))
+
+
+def file_size(path):
+    """
+    :return: Size of the regular file or None if path is not a regular file
+        or does not exist
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+
+    return st.st_size if stat.S_ISREG(st.st_mode) else None
+
+
+def signature(fileobj):
+    """
+    Make the signature of a file to stage, changes when the content or
+    metadata of the file to stage changes.
+
+    :param fileobj: FileObject instance
+    :return: A string of the signature
+    """
+    content = fileobj.get("content")
+    if content:
+        if isinstance(content, unicode):
+            content = content.encode("utf-8")
+        content = hashlib.sha1(content).hexdigest()
+
+    return "%s %s %s %s %s %s %s" % (fileobj.checksum, fileobj.mode,
+                                     fileobj.uid, fileobj.gid, fileobj.src,
+                                     fileobj.get("linkto") or "",
+                                     content or "")
+
+
+# vim:sw=4:ts=4:et:
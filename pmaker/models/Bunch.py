@@ -36,7 +36,7 @@ class Bunch(dict):
     __getstate__ = dict.copy
 
     def __setstate__(self, dic):
-        self.__dict__ = dic
+        dict.update(self, dic)
 
     def __str__(self):
         """
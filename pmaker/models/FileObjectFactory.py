@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
+import pmaker.checksumcache as CC
 import pmaker.globals as G
 import pmaker.models.Bunch as B
 import pmaker.models.FileObjects as FO
@@ -28,6 +29,21 @@ import pwd
 import stat
 
 
+# aliases:
+SYSCALLS = FO.SYSCALLS
+
+
+def _lstat(path):
+    """
+    :return: lstat result of the path or None if it does not exist
+    """
+    SYSCALLS.incr("lstat")
+    try:
+        return os.lstat(path)
+    except OSError:
+        return None
+
+
 def rpm_lstat(path):
     """Stat with using RPM database instead of lstat().
 
@@ -35,7 +51,7 @@ def rpm_lstat(path):
     any packages.
     """
     try:
-        fi = R.info_by_path(path)
+        fi = R.index().info(path)
         if fi:
             uid = pwd.getpwnam(fi["uid"]).pw_uid   # uid: name -> id
             gid = grp.getgrnam(fi["gid"]).gr_gid   # gid: name -> id
@@ -45,32 +61,35 @@ def rpm_lstat(path):
         return None
 
 
-def lstat(path, use_rpmdb=False):
+def lstat(path, use_rpmdb=False, st=None):
     """
     stat the path to get file metadata.
 
     :param path:  Object's path (relative or absolute) :: str
     :param use_rpmdb:  Whether to use rpm database or not :: bool
+    :param st:  lstat result of the path if available
     :return:  A tuple of (mode, uid, gid) or (None, None, None)
               if OSError was raised.
     """
     if use_rpmdb:
         if R.is_rpmdb_available():
-            st = rpm_lstat(path)
-            if st is None:
+            rst = rpm_lstat(path)
+            if rst is None:
                 logging.info("Not in rpm db. Looks no rpms own " + path)
             else:
-                return st
+                return rst
         else:
             logging.warn(
                 "use_rpmdb is set but rpm database looks not available."
             )
-    try:
-        st = os.lstat(path)
+    if st is None:
+        SYSCALLS.incr("lstat")
+        try:
+            st = os.lstat(path)
 
-    except OSError, e:
-        logging.warn(e)
-        return None
+        except OSError, e:
+            logging.warn(e)
+            return None
 
     return (st.st_mode, st.st_uid, st.st_gid)
 
@@ -99,29 +118,31 @@ def guess_filetype(st_mode):
     return ft
 
 
-def create_from_real_object(fo, use_rpmdb=False):
+def create_from_real_object(fo, use_rpmdb=False, lst=None):
     """
     Creates and returns an appropriate type of FileObjects' instance from a
     Bunch object of which path exists actually.
 
     :param fo:  A Bunch object
+    :param lst:  lstat result of fo.path if available
     """
-    if not os.path.islink(fo.path):
-        assert os.path.exists(fo.path)
+    if lst is None:
+        lst = _lstat(fo.path)
+        assert lst is not None
 
     basic_attr_names = ("mode", "uid", "gid")
-    st = lstat(fo.path, use_rpmdb)
+    st = lstat(fo.path, use_rpmdb, lst)
 
     if st is None:
         return FO.UnknownObject(**fo)
 
     attrs = dict(zip(basic_attr_names, st))
-    attrs["mode"] = U.st_mode_to_mode(attrs["mode"])
+    attrs["mode"] = stat.S_IMODE(attrs["mode"]) & 0777
 
     filetype = guess_filetype(st[0])
 
     if filetype == G.TYPE_FILE:
-        fo.checksum = U.checksum(fo.path)
+        fo.checksum = CC.checksum(fo.path, lst)
     else:
         fo.checksum = U.checksum()
 
@@ -130,6 +151,7 @@ def create_from_real_object(fo, use_rpmdb=False):
 
         elif filetype == G.TYPE_SYMLINK:
             if "linkto" not in fo:
+                SYSCALLS.incr("realpath")
                 fo.linkto = os.path.realpath(fo.path)
 
     # override with real (stat-ed) values if not specified.
@@ -140,7 +162,10 @@ def create_from_real_object(fo, use_rpmdb=False):
     cls = FO.FILEOBJECTS.get(filetype, None)
     assert cls is not None
 
-    return cls(**fo)
+    xo = cls(**fo)
+    xo.set_lstat(lst)
+
+    return xo
 
 
 def to_be_created(fo):
@@ -148,12 +173,17 @@ def to_be_created(fo):
         ("src" in fo and fo.src != fo.path)
 
 
-def create(path, use_rpmdb=False, **attrs):
+def create(path, use_rpmdb=False, lst=None, **attrs):
     """
     A kind of factory method to create an appropriate type of FileObjects'
     instance from path.
 
     :param path:  Path of target object.
+    :param use_rpmdb:  Whether to use rpm database or not :: bool
+    :param lst:  lstat result of the path if available, e.g. got while
+                 walking dir trees. The path is not stat-ed again if given.
+                 Otherwise the path is lstat-ed only once here and the result
+                 is kept in the object created, see XObject.lstat.
     :param attrs: A dict holding metadata other than path such as mode, gid,
                   uid, checksum, create, filetype, src, linkto, etc.
     """
@@ -165,8 +195,11 @@ def create(path, use_rpmdb=False, **attrs):
     else:
         # $path exists or not exist but it's a symlink, link to
         # non-existent-obj to be linked.
-        if os.path.exists(path) or os.path.islink(path):
-            return create_from_real_object(fo, use_rpmdb)
+        if lst is None:
+            lst = _lstat(path)
+
+        if lst is not None:
+            return create_from_real_object(fo, use_rpmdb, lst)
         else:
             fo.create = True if to_be_created(fo) else False
 
@@ -16,12 +16,15 @@
 #
 from pmaker.shell import run
 
+import pmaker.copier as C
+import pmaker.utils as U
+
+import errno
 import logging
 import os
 import os.path
 import re
 import shutil
-import urllib2
 
 try:
     all
@@ -29,6 +32,10 @@ except NameError:
     from pmaker.utils import all
 
 
+# Used only when copying files from remote.
+urllib2 = U.LazyModule("urllib2")
+
+
 def same(lhs, rhs):
     """
     lhs and rhs are identical, that is, these contents and metadata (except
@@ -120,7 +127,7 @@ class FileOps(object):
         open(dest, "w").write(content)
 
     @classmethod
-    def copy_impl(cls, fileobj, dest):
+    def copy_impl(cls, fileobj, dest, link=False):
         """
         Copy the file of fileobj to dest.
 
@@ -129,16 +136,55 @@ class FileOps(object):
         1. Copy itself and its some metadata (owner, mode, etc.)
         2. Copy extra metadata not copyable with the above.
 
-        "cp -a" (cp in GNU coreutils) does the above operations at once and
-        might be suited for most cases, I think.
+        pmaker.copier.copy does the above operations at once in process as
+        "cp -a" (cp in GNU coreutils) does, w/o forking a process per file.
 
         @fileobj    FileObjects instance
         @dest  str  Destination path to copy to
+        @link  bool Hardlink the file to dest instead of copying if possible
+        """
+        st = fileobj.lstat() if fileobj.src == fileobj.path else None
+
+        if link:
+            C.link(fileobj.src, dest, st)
+        else:
+            C.copy(fileobj.src, dest, st)
+
+    @classmethod
+    def prepare_destdir(cls, fileobj, destdir):
+        """
+        Create the dir to copy fileobj into if it does not exist, copy the
+        stat of the dir of fileobj to it and ensure user can write in it.
+
+        Call this for dirs of files once in advance before copying files in
+        parallel, as the dir may not be writable for a while after its stat
+        was copied, e.g. the mode of /usr/bin is 0555.
+
+        @fileobj     FileObjects instance
+        @destdir str The dir to copy fileobj into
         """
-        run("cp -a %s %s" % (fileobj.src, dest))
+        if not os.path.exists(destdir):
+            try:
+                os.makedirs(destdir)
+            except OSError, e:  # Created by another thread.
+                if e.errno != errno.EEXIST:
+                    raise
+
+        if not fileobj.create:
+            try:
+                srcdir = os.path.dirname(fileobj.path)
+                shutil.copystat(srcdir, destdir)
+            except OSError:
+                logging.warn("Could not copy the stat: " + srcdir)
+
+        # ensure user can write in this dir.
+        try:
+            os.chmod(destdir, os.lstat(destdir).st_mode | int(0700))
+        except OSError:
+            logging.warn("Could not set write permission on " + destdir)
 
     @classmethod
-    def copy(cls, fileobj, dest, force=False):
+    def copy(cls, fileobj, dest, force=False, link=False):
         """
         Copy fileobj to $dest. "Copy" action varys depends on actual filetype
         so that inherited class should overrride this and/or related methods.
@@ -146,6 +192,7 @@ class FileOps(object):
         @fileobj     FileObjects instance
         @dest  str   The destination path to copy to
         @force bool  When True, it will force overwrite $dest even if it exists
+        @link  bool  When True, files are hardlinked to $dest if possible
         """
         create_instead_of_copy = fileobj.create
 
@@ -168,28 +215,15 @@ class FileOps(object):
         else:
             destdir = os.path.dirname(dest)
 
-            if not os.path.exists(destdir):
-                os.makedirs(destdir)
-
-            if not create_instead_of_copy:
-                try:
-                    srcdir = os.path.dirname(fileobj.path)
-                    shutil.copystat(srcdir, destdir)
-                except OSError:
-                    logging.warn("Could not copy the stat: " + srcdir)
-
-            # ensure user can write in this dir.
-            try:
-                os.chmod(destdir, os.lstat(destdir).st_mode | int(0700))
-            except OSError:
-                logging.warn("Could not set write permission on " + destdir)
+            if not os.path.exists(destdir):  # Not prepared in advance.
+                cls.prepare_destdir(fileobj, destdir)
 
         if create_instead_of_copy:
             logging.debug("Creating: " + dest)
             cls.create(fileobj, dest)
         else:
             logging.debug("Copying: from=%s, to=%s" % (fileobj.path, dest))
-            cls.copy_impl(fileobj, dest)
+            cls.copy_impl(fileobj, dest, link)
 
         return True
 
@@ -204,7 +238,7 @@ class DirOps(FileOps):
     @classmethod
     def create(cls, fileobj, dest):
         try:
-            mode = int(fileobj.permission(), 8)  # in octal, e.g. 0755
+            mode = fileobj.perm  # in octal, e.g. 0755
             os.makedirs(dest, mode)
 
         except OSError, e:   # It may be OK, ex. !root user cannot set perms.
@@ -227,7 +261,7 @@ class DirOps(FileOps):
             logging.debug("Chown is not permitted so do nothing.")
 
     @classmethod
-    def copy_impl(cls, fileobj, dest):
+    def copy_impl(cls, fileobj, dest, link=False):
         cls.create(fileobj, dest)
 
         try:
@@ -245,11 +279,11 @@ class SymlinkOps(FileOps):
         os.symlink(fileobj.linkto, dest)
 
     @classmethod
-    def copy_impl(cls, fileobj, dest):
+    def copy_impl(cls, fileobj, dest, link=False):
         if cls.link_instead_of_copy:
             cls.create(fileobj, dest)
         else:
-            run("cp -a %s %s" % (fileobj.path, dest))
+            C.copy(fileobj.path, dest, fileobj.lstat())
 
 
 # vim:sw=4:ts=4:et:
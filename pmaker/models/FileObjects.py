@@ -23,6 +23,14 @@ import pmaker.utils as U
 
 import copy
 import os.path
+import types
+
+
+MemberDescriptor = types.MemberDescriptorType
+
+
+# Counts of syscalls to get metadata of files.
+SYSCALLS = U.Counter()
 
 
 class InvalidFileTypeError(RuntimeError):
@@ -49,15 +57,74 @@ def typestr_to_type(s):
     return filetype
 
 
-class XObject(B.Bunch):
+def split_path(path):
+    """
+    Split path into the dir part shared among objects and the rest.
+
+    The dir part is interned so that it's shared among objects while any of
+    them is alive, and freed after all of them were freed unlike in a table
+    kept for the process, e.g. a worker building many packages.
+
+    >>> split_path("/etc/hosts")
+    ('/etc/', 'hosts')
+    >>> split_path("/etc")
+    ('/', 'etc')
+    >>> split_path("a")
+    ('', 'a')
+    """
+    i = path.rfind("/") + 1
+    (dirname, basename) = (path[:i], path[i:])
+
+    if isinstance(dirname, str):  # unicode objects cannot be interned.
+        dirname = intern(dirname)
+
+    return (dirname, basename)
+
+
+def to_mode(mode):
+    """
+    :param mode: File mode in octal string, e.g. "0644", or int
+    :return: File mode in int
+
+    >>> to_mode("0644") == 0644, to_mode(0755) == 0755
+    (True, True)
+    """
+    return int(mode, 8) if isinstance(mode, basestring) else int(mode)
+
+
+def mode_to_str(mode):
+    """
+    >>> mode_to_str(0644), mode_to_str(0), mode_to_str(01755)
+    ('0644', '0000', '1755')
+    """
+    return "%04o" % mode
+
+
+class XObject(object):
     """
     This class represents regular files, dirs, symlinks and other objects on
     filesystem.
 
     This class is for regular file and the super class for other types at the
     same time.
+
+    A lot of instances of this class are created for large packages so that
+    attributes are kept in slots instead of a dict; file mode is kept in int,
+    the dir part of path is shared among objects, and src, target and
+    install_path are not kept if these are same as path. Other attributes
+    given are kept in __dict__ made only when needed.
     """
 
+    __slots__ = ("_dir", "_name", "_mode", "uid", "gid", "checksum",
+                 "create", "content", "_src", "_target", "_install_path",
+                 "_lstat", "linkto", "rpm_attr", "conflicts", "__dict__")
+
+    # Attributes other than path saved and compared:
+    _keys = ("mode", "uid", "gid", "checksum", "create", "content", "src",
+             "target", "install_path", "linkto", "rpm_attr", "conflicts")
+
+    __hash__ = None  # Not hashable as mutable like dicts.
+
     defaults = B.Bunch(mode="0644", uid=0, gid=0, checksum=U.checksum())
 
     def __init__(self, path=None, mode=None, uid=None, gid=None,
@@ -65,7 +132,7 @@ class XObject(B.Bunch):
             **kwargs):
         """
         :param path: Target object's path :: str
-        :param mode: File mode, e.g. "0644", "1755" :: str
+        :param mode: File mode, e.g. "0644", "1755" :: str or int
         :param uid:  User ID of the object's owner :: int
         :param gid:  Group ID of the object's owner :: int
         :param checksum:  Checksum of this file object
@@ -83,13 +150,108 @@ class XObject(B.Bunch):
         self.checksum = self.defaults.checksum if checksum is None else checksum
         self.create = bool(create)
         self.content = content
-        self.src = path if src is None else src
-
-        self.target = self.install_path = path
+        self.src = src
+        self._target = self._install_path = self._lstat = None
 
         for k, v in kwargs.iteritems():
+            # Class attributes like filetype were shadowed and never used
+            # when objects were dicts. Keep it so.
+            attr = getattr(type(self), k, None)
+            if attr is None or isinstance(attr, (property, MemberDescriptor)):
+                setattr(self, k, v)
+
+    def _get_path(self):
+        return self._dir + self._name
+
+    def _set_path(self, path):
+        (self._dir, self._name) = split_path(path)
+
+    path = property(_get_path, _set_path)
+
+    def _get_mode(self):
+        return mode_to_str(self._mode)
+
+    def _set_mode(self, mode):
+        self._mode = to_mode(mode)
+
+    mode = property(_get_mode, _set_mode,
+                    doc="File mode in octal string, e.g. '0644'")
+
+    @property
+    def perm(self):
+        """File mode in int, e.g. 0644"""
+        return self._mode
+
+    def _alias(name):
+        """
+        Make a property of which value is same as path unless set.
+        """
+        def get(self):
+            val = getattr(self, name)
+            return self.path if val is None else val
+
+        def set_(self, val):
+            setattr(self, name, None if val == self.path else val)
+
+        return property(get, set_)
+
+    src = _alias("_src")
+    target = _alias("_target")
+    install_path = _alias("_install_path")
+
+    del _alias
+
+    def set_lstat(self, st):
+        """
+        Keep the lstat result of self.path got when this object was created
+        so that it's not stat-ed again later. It's not saved with other
+        attributes.
+        """
+        self._lstat = st
+
+    def lstat(self):
+        """
+        :return: lstat result of self.path kept or None
+        """
+        return self._lstat
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self):
+        """
+        :return: A dict of attributes, e.g. to save in JSON files
+        """
+        ret = dict((k, getattr(self, k)) for k in self._keys if k in self)
+        ret["path"] = self.path
+
+        extra = self.__dict__
+        if extra:
+            ret.update(extra)
+        else:
+            del self.__dict__  # Drop the empty dict made by the access above.
+
+        return ret
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self.path = state.pop("path")
+        self._src = self._target = self._install_path = self._lstat = None
+
+        for k, v in state.iteritems():
             setattr(self, k, v)
 
+    def __repr__(self):
+        return "<%s %r>" % (type(self).__name__, self.to_dict())
+
+    __str__ = __repr__
+
     def equals(self, other):
         ckeys = ("path",
                  "mode",
@@ -109,6 +271,8 @@ class FileObject(XObject):
     """File object
     """
 
+    __slots__ = ()
+
     ops = F.FileOps
     filetype = G.TYPE_FILE
     is_copyable = True
@@ -135,17 +299,22 @@ class FileObject(XObject):
         return self.mode
 
     def need_to_chmod(self):
-        return self.mode != self.defaults.mode
+        return self._mode != to_mode(self.defaults.mode)
 
     def need_to_chown(self):
         return self.uid != 0 or self.gid != 0  # 0 == root
 
-    def copy(self, dest, force=False):
-        return self.ops.copy(self, dest, force)
+    def copy(self, dest, force=False, link=False):
+        return self.ops.copy(self, dest, force, link)
+
+    def prepare_destdir(self, destdir):
+        return self.ops.prepare_destdir(self, destdir)
 
 
 class DirObject(FileObject):
 
+    __slots__ = ()
+
     ops = F.DirOps
     filetype = G.TYPE_DIR
 
@@ -155,6 +324,8 @@ class DirObject(FileObject):
 
 class SymlinkObject(FileObject):
 
+    __slots__ = ()
+
     ops = F.SymlinkOps
     filetype = G.TYPE_SYMLINK
 
@@ -174,6 +345,8 @@ class OtherObject(FileObject):
     May be a socket, FIFO (named pipe), Character Dev or Block Dev, etc.
     """
 
+    __slots__ = ()
+
     filetype = G.TYPE_OTHER
     is_copyable = False
 
@@ -183,6 +356,8 @@ class UnknownObject(FileObject):
     Special case that lstat() failed and cannot stat $path.
     """
 
+    __slots__ = ()
+
     filetype = G.TYPE_UNKNOWN
     is_copyable = False
 
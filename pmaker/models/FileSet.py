@@ -0,0 +1,163 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.models.Bunch as B
+
+import logging
+import os.path
+
+
+class FileSet(object):
+    """
+    Collection of FileObjects keeps the order of them added and indexes them
+    by path and install_path, to look up, partition and group them w/o
+    scanning or comparing all of them.
+
+    Each path appears only once in a set: FileObjects of the path already in
+    the set are not added.
+    """
+
+    def __init__(self, files=()):
+        """
+        :param files: Iterable of FileObjects
+        """
+        self._files = []
+        self._paths = dict()  # {path: fileobj}
+        self._install_paths = dict()  # {install_path: fileobj}
+
+        for f in files:
+            self.add(f)
+
+    def add(self, fileobj):
+        """
+        :return: True if fileobj was added or False if the path of it is
+            already in this set
+        """
+        other = self._paths.get(fileobj.path)
+
+        if other is not None:
+            if other is not fileobj and other != fileobj:
+                logging.warn("Ignored the path appeared twice w/ different "
+                             "attributes: " + fileobj.path)
+            return False
+
+        self._files.append(fileobj)
+        self._paths[fileobj.path] = fileobj
+        self._install_paths.setdefault(fileobj.install_path, fileobj)
+
+        return True
+
+    def get(self, path, default=None):
+        """
+        :return: FileObject of the path or default
+        """
+        return self._paths.get(path, default)
+
+    def get_by_install_path(self, install_path, default=None):
+        return self._install_paths.get(install_path, default)
+
+    def __contains__(self, x):
+        """
+        :param x: FileObject or path
+        """
+        if isinstance(x, basestring):
+            return x in self._paths
+
+        other = self._paths.get(x.path)
+        return other is not None and (other is x or other == x)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __getitem__(self, idx):
+        return self._files[idx]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<FileSet of %d files>" % len(self)
+
+    def partition(self, pred):
+        """
+        Split files into the ones satisfy pred and the rest, with keeping the
+        order of them.
+
+        :param pred: Predicate function takes a FileObject
+        :return: A tuple of (FileSet of files pred(f) is True, FileSet of the
+            rest)
+        """
+        (yes, no) = (FileSet(), FileSet())
+
+        for f in self._files:
+            (yes if pred(f) else no)._append(f)
+
+        return (yes, no)
+
+    def _append(self, fileobj):
+        """
+        Add fileobj known not in this set.
+        """
+        self._files.append(fileobj)
+        self._paths[fileobj.path] = fileobj
+        self._install_paths.setdefault(fileobj.install_path, fileobj)
+
+    def group_by_dir(self, pred=None, key="install_path"):
+        """
+        Group paths of files by dirs in the order of dirs appeared first.
+
+        :param pred: Predicate function to select files or None (all files)
+        :param key: Attribute name of paths to group
+        :return: List of Bunch objects, e.g.
+            [{"dir": "/etc", "files": ["/etc/resolv.conf"], "id": "0"},
+             {"dir": "/etc/sysconfig", "files": ["/etc/sysconfig/iptables"],
+              "id": "1"}]
+        """
+        groups = dict()
+        ret = []
+
+        for f in self._files:
+            if pred is not None and not pred(f):
+                continue
+
+            path = getattr(f, key)
+            d = os.path.dirname(path)
+            group = groups.get(d)
+
+            if group is None:
+                group = groups[d] = B.Bunch(id=str(len(ret)), dir=d, files=[])
+                ret.append(group)
+
+            group.files.append(path)
+
+        return ret
+
+    def to_list(self):
+        """
+        :return: List of FileObjects, e.g. to save in JSON files
+        """
+        return list(self._files)
+
+
+# vim:sw=4:ts=4:et:
@@ -260,5 +260,26 @@ class Test__create(unittest.TestCase):
         self.assertEquals(fo.checksum, fo.defaults.checksum)
         self.assertEquals(fo.path, self.path)
 
+    def test__create_real_object__lstat_once(self):
+        path = os.path.join(self.workdir, "file.txt")
+        open(path, "w").write("This is a file")
+
+        Factory.SYSCALLS.reset()
+        fo = Factory.create(path)
+
+        self.assertEquals(fo.lstat(), os.lstat(path))
+        self.assertEquals(Factory.SYSCALLS.items(), [("lstat", 1)])
+
+        # The lstat result given is used and not stat-ed again.
+        Factory.SYSCALLS.reset()
+        fo2 = Factory.create(path, False, os.lstat(path))
+
+        self.assertEquals(fo2, fo)
+        self.assertEquals(Factory.SYSCALLS.total(), 0)
+
+    def test__create_not_exist__no_lstat_kept(self):
+        fo = Factory.create(os.path.join(self.workdir, "not_exist"))
+        self.assertTrue(fo.lstat() is None)
+
 
 # vim:sw=4:ts=4:et:
@@ -108,5 +108,23 @@ class Test_01_FileOps__with_side_effects(unittest.TestCase):
 
         self.assertTrue(FileOps.copy(fo, dest))
 
+    def test_prepare_destdir(self):
+        srcdir = os.path.join(self.workdir, "ro")
+        os.mkdir(srcdir)
+        open(os.path.join(srcdir, "a.txt"), "w").write("a\n")
+        os.chmod(srcdir, 0555)
+
+        fo = Factory.create(os.path.join(srcdir, "a.txt"))
+        destdir = os.path.join(self.workdir, "t", "ro")
+
+        fo.prepare_destdir(destdir)
+        self.assertEquals(stat.S_IMODE(os.stat(destdir).st_mode), 0755)
+
+        # The stat of the dir prepared is not copied again on copy.
+        os.chmod(destdir, 0700)
+
+        self.assertTrue(FileOps.copy(fo, os.path.join(destdir, "a.txt")))
+        self.assertEquals(stat.S_IMODE(os.stat(destdir).st_mode), 0700)
+
 
 # vim:sw=4:ts=4:et:
@@ -19,6 +19,8 @@ from pmaker.tests.common import setup_workdir, cleanup_workdir
 
 import pmaker.models.FileObjects as FO
 
+import cPickle as pickle
+import copy
 import os
 import random
 import tempfile
@@ -61,6 +63,57 @@ class TestFileObject(unittest.TestCase):
         self.assertTrue(isinstance(fo, FO.FileObject))
         self.assertEquals(fo.src, src)
 
+    def test__mode_and_perm(self):
+        fo = FO.FileObject(self.path, 0600)
+        self.assertEquals(fo.mode, "0600")
+        self.assertEquals(fo.perm, 0600)
+        self.assertTrue(fo.need_to_chmod())
+
+        fo.mode = "0644"
+        self.assertEquals(fo.perm, 0644)
+        self.assertFalse(fo.need_to_chmod())
+
+    def test__path_and_aliases(self):
+        fo = FO.FileObject(self.path)
+        fo2 = FO.FileObject(os.path.join(os.path.dirname(self.path), "x"))
+
+        self.assertTrue(fo._dir is fo2._dir)
+        self.assertTrue(fo._dir is
+                        FO.split_path(os.path.dirname(self.path) + "/y")[0])
+        self.assertEquals(fo.src, self.path)
+        self.assertEquals(fo.install_path, self.path)
+
+        fo.install_path = "/a/b"
+        self.assertEquals(fo.install_path, "/a/b")
+        self.assertEquals(fo.target, self.path)
+
+    def test__extra_attrs(self):
+        fo = FO.FileObject(self.path, save_path="/a/b", filetype="d")
+
+        self.assertEquals(fo.save_path, "/a/b")
+        self.assertEquals(fo.filetype, FO.FileObject.filetype)
+        self.assertTrue("save_path" in fo)
+        self.assertFalse("conflicts" in fo)
+        self.assertEquals(fo.get("conflicts", 1), 1)
+
+    def test__compact(self):
+        fo = FO.FileObject(self.path, rpm_attr="", conflicts={})
+        fo.to_dict()
+
+        # These should be kept in slots, not in the dict.
+        self.assertFalse("__dict__" in dir(fo) and fo.__dict__)
+
+    def test__pickle_and_copy(self):
+        fo = FO.FileObject(self.path, "0600", uid=1, save_path="/a/b")
+        fo.install_path = "/a/c"
+
+        for fo2 in (pickle.loads(pickle.dumps(fo, 0)),
+                    pickle.loads(pickle.dumps(fo, 2)), copy.copy(fo)):
+            self.assertTrue(isinstance(fo2, FO.FileObject))
+            self.assertEquals(fo2, fo)
+            self.assertEquals(fo2.to_dict(), fo.to_dict())
+            self.assertEquals(fo2.save_path, "/a/b")
+
 
 class TestDirObject(unittest.TestCase):
 
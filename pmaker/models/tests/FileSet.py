@@ -0,0 +1,81 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.models.FileObjects as FO
+import pmaker.models.FileSet as FS
+
+import cPickle as pickle
+import unittest
+
+
+def _files():
+    return [FO.FileObject("/etc/hosts", "0644"),
+            FO.DirObject("/etc/sysconfig", "0755"),
+            FO.FileObject("/etc/resolv.conf", "0644", conflicts=dict(a=1)),
+            FO.FileObject("/etc/sysconfig/network", "0644",
+                          install_path="/etc/sysconfig/network.new")]
+
+
+class TestFileSet(unittest.TestCase):
+
+    def setUp(self):
+        self.files = _files()
+        self.fs = FS.FileSet(self.files)
+
+    def test_00_add__dedupe(self):
+        self.assertEquals(len(self.fs), 4)
+        self.assertFalse(self.fs.add(FO.FileObject("/etc/hosts", "0644")))
+        self.assertFalse(self.fs.add(FO.FileObject("/etc/hosts", "0600")))
+        self.assertTrue(self.fs.add(FO.FileObject("/etc/fstab", "0644")))
+
+        self.assertEquals(len(self.fs), 5)
+        self.assertEquals(self.fs.get("/etc/hosts").mode, "0644")
+
+    def test_10___contains__(self):
+        self.assertTrue("/etc/hosts" in self.fs)
+        self.assertTrue(self.files[0] in self.fs)
+        self.assertTrue(FO.FileObject("/etc/hosts", "0644") in self.fs)
+        self.assertFalse(FO.FileObject("/etc/hosts", "0600") in self.fs)
+        self.assertFalse("/etc/fstab" in self.fs)
+
+    def test_20_get_by_install_path(self):
+        f = self.fs.get_by_install_path("/etc/sysconfig/network.new")
+        self.assertTrue(f is self.files[3])
+        self.assertTrue(self.fs.get_by_install_path("/etc/fstab") is None)
+
+    def test_30_partition(self):
+        (yes, no) = self.fs.partition(lambda f: f.get("conflicts"))
+
+        self.assertEquals(yes, [self.files[2]])
+        self.assertEquals(no, [self.files[0], self.files[1], self.files[3]])
+        self.assertTrue("/etc/resolv.conf" not in no)
+
+    def test_40_group_by_dir(self):
+        groups = self.fs.group_by_dir(lambda f: f.isfile())
+
+        self.assertEquals([(g.id, g.dir, g.files) for g in groups],
+                          [("0", "/etc", ["/etc/hosts", "/etc/resolv.conf"]),
+                           ("1", "/etc/sysconfig",
+                            ["/etc/sysconfig/network.new"])])
+
+    def test_50_pickle(self):
+        fs = pickle.loads(pickle.dumps(self.fs, pickle.HIGHEST_PROTOCOL))
+
+        self.assertEquals(fs, self.fs)
+        self.assertTrue("/etc/hosts" in fs)
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,143 @@
+#
+# Build packages in multiple formats from files collected and copied once.
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Files are copied into <workdir>/src once, and packages of each driver are
+# built in <workdir>/<driver>/ where files are hardlinked from <workdir>/src.
+#
+from pmaker.globals import PACKAGING_STEPS, STEP_SETUP
+
+import pmaker.backend.base as Base
+import pmaker.backend.registry as Backends
+import pmaker.models.Bunch as B
+import pmaker.rpmutils as R
+
+import copy
+import logging
+import multiprocessing
+import os.path
+import time
+import traceback
+
+
+# Backends of drivers, made in the parent process and inherited by workers.
+_BACKENDS = []
+
+
+class Stager(Base.Base):
+    """
+    Backend only copies files into the shared srcdir.
+    """
+
+    _steps = [step for step in PACKAGING_STEPS if step.name == STEP_SETUP]
+
+    def __init__(self, pkgdata, **kwargs):
+        super(Stager, self).__init__(pkgdata, **kwargs)
+        self.artifact_cache = None
+
+
+def pkgdata_for_driver(pkgdata, driver):
+    """
+    :param pkgdata: PkgData object of which srcdir is shared among drivers
+    :param driver: Packaging driver, e.g. "autotools.single.rpm"
+    :return: A copy of pkgdata to build packages with the driver
+    """
+    pd = copy.copy(pkgdata)
+
+    pd.driver = driver
+    pd.workdir = os.path.join(pkgdata.workdir, driver)
+    pd.srcdir = os.path.join(pd.workdir, "src")
+    pd.shared_srcdir = pkgdata.srcdir
+
+    return pd
+
+
+def _build(idx):
+    """
+    Build packages with the idx-th backend in _BACKENDS.
+
+    :return: Bunch object holds driver, rc, error (traceback), workdir and
+        elapsed time
+    """
+    backend = _BACKENDS[idx]
+    ret = B.Bunch(driver=backend.pkgdata.driver, rc=1, error=None,
+                  workdir=backend.workdir)
+    start = time.time()
+
+    try:
+        rc = backend.run()
+        ret.rc = 0 if rc is None else rc
+    except Exception:
+        ret.error = traceback.format_exc()
+        logging.error("Failed to build with %s:\n%s" % (ret.driver,
+                                                        ret.error))
+
+    ret.elapsed = time.time() - start
+    return ret
+
+
+def run(pkgdata, drivers, procs=None):
+    """
+    Copy files once and build packages with drivers in parallel.
+
+    :param pkgdata: PkgData object
+    :param drivers: List of packaging drivers
+    :param procs: Number of worker processes; the number of drivers if None
+    :return: List of results of _build() in the order of drivers
+    """
+    global _BACKENDS
+
+    Stager(copy.copy(pkgdata)).run()
+
+    bmap = Backends.map()
+    _BACKENDS = [bmap[d](pkgdata_for_driver(pkgdata, d)) for d in drivers]
+
+    if procs is None:
+        procs = len(drivers)
+
+    try:
+        if procs < 2 or len(drivers) < 2:
+            return [_build(i) for i in range(len(drivers))]
+
+        pool = multiprocessing.Pool(min(procs, len(drivers)),
+                                    R.reset_connections)
+        try:
+            results = pool.map(_build, range(len(drivers)), chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+        return results
+
+    finally:
+        _BACKENDS = []
+
+
+def summary(results):
+    """
+    :param results: List of results of _build()
+    :return: A string summarizes results
+    """
+    return "\n".join("%-24s %-6s %9.2fs  %s" %
+                     (r.driver, "ok" if r.rc == 0 else "FAIL", r.elapsed,
+                      r.workdir) for r in results)
+
+
+# vim:sw=4:ts=4:et:
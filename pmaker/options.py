@@ -21,6 +21,7 @@ import pmaker.collectors.FilelistCollectors as Collectors
 import pmaker.backend.registry as Backends
 import pmaker.environ as E
 import pmaker.parser as P
+import pmaker.utils as U
 
 import logging
 import optparse
@@ -89,8 +90,11 @@ on package format to use.
 
 def setup_template_path_option():
     def cb(option, opt_str, value, parser):
-        if value not in parser.values.template_paths:
-            parser.values.template_paths.insert(0, value)
+        # Make a new list not to modify the default list shared among
+        # parsers, e.g. in batch mode.
+        tpaths = parser.values.template_paths
+        if value not in tpaths:
+            parser.values.template_paths = [value] + tpaths
 
     return dict(action="callback", callback=cb, type="string",
                 dest="template_paths", default=G.TEMPLATE_SEARCH_PATHS,
@@ -127,11 +131,13 @@ def set_workdir(workdir, name, pversion):
 
 class Options(B.Bunch):
 
-    def __init__(self, **kwargs):
+    def __init__(self, env=None, **kwargs):
         """
+        :param env: Env object shared among Options objects, e.g. in batch
+            mode, or None to make it
         """
-        self.env = E.Env()
-        self.config = C.Config()
+        self.env = E.Env() if env is None else env
+        self.config = C.Config(env=self.env)
         self.oparser = optparse.OptionParser(HELP_HEADER,
                                              version=VERSION_STRING,
                                              )
@@ -172,7 +178,8 @@ class Options(B.Bunch):
                    help="Do not load default configuration files")
         add_option("", "--force", action="store_true",
                    help="Force going steps even if the steps looks done "
-                        "already")
+                        "already, and copy files and generate files from "
+                        "templates again even if these are not changed")
         add_option("-v", "--verbose", action="count", dest="verbosity",
                    help="Verbose mode")
         add_option("", "--debug", action="store_const", dest="verbosity",
@@ -200,6 +207,14 @@ class Options(B.Bunch):
         choices = collectors.keys()
         help = "Input type: %s [%%default]" % ", ".join(choices)
         add_option("-I", "--input-type", choices=choices, help=help)
+        add_option("", "--include", action="append", dest="includes",
+                   help="Glob pattern of files and dirs to collect from "
+                        "dirs with the input type 'dir'. Can be specified "
+                        "multiple times [all]")
+        add_option("", "--exclude", action="append", dest="excludes",
+                   help="Glob pattern of files and dirs not to collect and "
+                        "not to walk into with the input type 'dir'. Can be "
+                        "specified multiple times")
 
         drivers = Backends.map()  # {backend_type: backend_class}
         choices = drivers.keys()
@@ -207,7 +222,47 @@ class Options(B.Bunch):
         add_option("", "--driver", choices=choices, help=help)
         add_option("", "--backend", dest="driver", choices=choices,
                    help="Same as --driver option")
-
+        add_option("", "--drivers",
+                   help="Comma separated list of packaging drivers to build "
+                        "packages in multiple formats in parallel from files "
+                        "collected and copied once, e.g. "
+                        "'native.tgz,native.deb'. If this is given, this "
+                        "is used instead of --driver also to collect files, "
+                        "e.g. rpm metadata and conflicts of files are "
+                        "collected if any of these is an rpm driver")
+
+        add_option("-j", "--jobs", type="int",
+                   help="Number of worker threads to collect metadata of "
+                        "files in parallel [%default]")
+        add_option("", "--sort-buffer-size", type="int",
+                   help="Max number of files sorted in memory at once. "
+                        "Larger inputs are sorted in runs saved in temporary "
+                        "files and merged [%default]")
+        add_option("", "--cachedir",
+                   help="Dir to save persistent caches [%default]")
+        add_option("", "--no-checksum-cache", action="store_false",
+                   dest="checksum_cache",
+                   help="Do not use the persistent cache of checksums of "
+                        "files")
+        add_option("", "--no-rpmdb-cache", action="store_false",
+                   dest="rpmdb_cache",
+                   help="Do not use the persistent index of files in rpmdb")
+        add_option("", "--no-template-cache", action="store_false",
+                   dest="template_cache",
+                   help="Do not use the persistent cache of compiled "
+                        "templates")
+        add_option("", "--artifact-cache",
+                   help="Dir to cache packages built and get them from "
+                        "instead of building again if their inputs are same. "
+                        "It can be shared among hosts over NFS [not used]")
+        add_option("", "--artifact-cache-size", type="int",
+                   help="Max total size of packages in the artifact cache in "
+                        "MB [%default]")
+        add_option("", "--link-files", action="store_true",
+                   help="Hardlink files into the src dir instead of copying "
+                        "them if possible")
+        add_option("", "--stats", action="store_true",
+                   help="Print the summary of resource usage of each step")
         add_option("", "--destdir", help=DESTDIR_OPTION_HELP)
         add_option("-P", "--template-path", **setup_template_path_option())
 
@@ -327,6 +382,15 @@ class Options(B.Bunch):
             options.workdir, options.name, options.pversion
         )
 
+        if options.drivers:
+            if isinstance(options.drivers, basestring):
+                options.drivers = U.parse_list_str(options.drivers)
+
+            drivers = Backends.map()
+            for d in options.drivers:
+                if d not in drivers:
+                    self.oparser.error("Unknown driver: " + d)
+
         return (options, args)
 
 
@@ -16,6 +16,7 @@
 #
 import pmaker.globals as G
 import pmaker.models.Bunch as B
+import pmaker.models.FileSet as FS
 import pmaker.utils as U
 
 import datetime
@@ -67,7 +68,9 @@ class PkgData(B.Bunch):
                 "destdir", "name", "group", "license", "url", "summary",
                 "arch", "relations", "packager", "email", "pversion",
                 "release", "changelog", "dist", "template_paths", "hostname",
-                "no_mock", "trigger", "trace")
+                "no_mock", "trigger", "trace", "jobs", "link_files", "stats",
+                "cachedir", "template_cache", "artifact_cache",
+                "artifact_cache_size")
 
         for key in keys:
             val = getattr(data, key, None)
@@ -81,22 +84,21 @@ class PkgData(B.Bunch):
         self.setup_files(files)
 
     def setup_files(self, files):
+        if not isinstance(files, FS.FileSet):
+            files = FS.FileSet(files)
+
         self.files = files
 
         (savedir, newdir) = U.conflicts_dirs(self.name)
-
-        self.conflicts = B.Bunch(
-            savedir=savedir, newdir=newdir,
-            files=[f for f in files if "conflicts" in f and f.conflicts],
+        (conflicts, others) = files.partition(
+            lambda f: "conflicts" in f and f.conflicts
         )
 
-        self.not_conflicts = B.Bunch(
-            files=[f for f in files if f not in self.conflicts.files],
-        )
+        self.conflicts = B.Bunch(savedir=savedir, newdir=newdir,
+                                 files=conflicts)
+        self.not_conflicts = B.Bunch(files=others)
 
-        self.distdata = U.sort_out_paths_by_dir(
-            f.install_path for f in files if f.isfile()
-        )
+        self.distdata = files.group_by_dir(lambda f: f.isfile())
 
 
 # vim:sw=4:ts=4:et:
@@ -19,7 +19,6 @@ import pmaker.globals as G
 import pmaker.models.Bunch as B
 import pmaker.utils as U
 
-import cPickle as pickle
 import datetime
 import grp
 import locale
@@ -27,8 +26,8 @@ import logging
 import os
 import os.path
 import pwd
-import rpm
 import subprocess
+import threading
 
 
 try:
@@ -36,10 +35,25 @@ try:
 except ImportError:
     pass
 
+try:
+    import sqlite3
+except ImportError:
+    logging.warn("sqlite3 module is not available. Disabled rpmdb cache.")
+    sqlite3 = None
 
-RPM_FILELIST_CACHE = os.path.join(
-    os.environ.get("HOME", "."), ".cache", "pmaker.rpm.filelist.pkl"
-)
+
+# rpm python bindings take some time to load and are not needed to make
+# packages other than rpm. Load it on the first use.
+rpm = U.LazyModule("rpm")
+
+# rpm (and yum) python bindings are not thread-safe. Serialize accesses to
+# rpmdb with this when collecting files in parallel.
+RPMDB_LOCK = threading.RLock()
+
+RPMDB_CACHE = os.path.join(G.PMAKER_CACHEDIR, "rpmdb.db")
+
+# Files in rpmdb dir of which changes mean rpmdb was updated:
+RPMDB_FILES = ("Packages", "Packages.db", "rpmdb.sqlite", "rpmdb.sqlite-wal")
 
 # RpmFi (FileInfo) keys:
 RPM_FI_KEYS = (
@@ -175,6 +189,7 @@ def info_by_path(path, fi_keys=RPM_FI_KEYS, rpmdb_path=None):
     """
     apath = os.path.abspath(path)
 
+    RPMDB_LOCK.acquire()
     try:
         fis = [h.fiFromHeader() for h in
                ts(rpmdb_path).dbMatch("basenames", apath)]
@@ -184,59 +199,351 @@ def info_by_path(path, fi_keys=RPM_FI_KEYS, rpmdb_path=None):
                 return dict(zip(fi_keys, xs[0]))
     except:  # FIXME: Careful excpetion handling
         pass
+    finally:
+        RPMDB_LOCK.release()
 
     return dict()
 
 
-@U.memoize
-def filelist(cache=True, expires=1, pkl_proto=pickle.HIGHEST_PROTOCOL,
-             rpmdb_path=None, cache_file=RPM_FILELIST_CACHE):
+class RpmDbIndex(object):
     """
-    TODO: It should be a heavy and time-consuming task. How to shorten this
-    time? - caching, utilize yum's file list database or whatever.
+    Index of files in rpmdb built at once: path -> (metadata of the file, the
+    package owns it).
+
+    Looking up rpmdb per file with opening transaction set and matching
+    basenames index every time is very slow if there are many files to look
+    up, so that this index is built by scanning all packages' headers only once
+    and consulted instead.
     """
-    data = None
-    cachedir = os.path.dirname(cache_file)
 
-    if not os.path.exists(cachedir):
-        os.makedirs(cachedir, 0755)
+    # Indices of RPM_FI_KEYS to keep in the index:
+    _fi_idxs = [RPM_FI_KEYS.index(k) for k in
+                ("mode", "uid", "gid", "checksum")]
+
+    def __init__(self, rpmdb_path=None):
+        """
+        :param rpmdb_path: Path to rpmdb dir or None (system default)
+        """
+        self.rpmdb_path = rpmdb_path
+        self.files = dict()  # {path: (mode, uid, gid, checksum, owner_idx)}
+        self.owners = []  # [nvrae]
+
+        self._build()
+
+    def _build(self):
+        logging.info("Building the index of rpmdb...")
+
+        for h in ts(self.rpmdb_path).dbMatch():
+            idx = len(self.owners)
+            self.owners.append(rpmh2nvrae(h))
+
+            for fi in h.fiFromHeader():
+                if fi and fi[0] not in self.files:  # First owner wins.
+                    self.files[fi[0]] = \
+                        tuple(fi[i] for i in self._fi_idxs) + (idx, )
+
+        logging.info("Indexed %d files in %d packages" %
+                     (len(self.files), len(self.owners)))
+
+    def _lookup(self, path):
+        apath = os.path.abspath(path)
+        x = self.files.get(apath)
+
+        if x is None:
+            # e.g. /bin/bash -> /usr/bin/bash if /bin -> /usr/bin.
+            (d, b) = os.path.split(apath)
+            x = self.files.get(os.path.join(os.path.realpath(d), b))
+
+        return x
+
+    def info(self, path):
+        """
+        :param path: Path of the file or directory (relative or absolute)
+        :return: A dict has keys of path, mode, uid, gid and checksum or empty
+            dict if no packages own the path
+        """
+        x = self._lookup(path)
+
+        if x is None:
+            return dict()
+
+        return dict(zip(("mode", "uid", "gid", "checksum"), x[:-1]),
+                    path=os.path.abspath(path))
 
-    if cache and not U.cache_needs_updates_p(cache_file, expires):
+    def owner(self, path):
+        """
+        :param path: Path of the file or directory (relative or absolute)
+        :return: nvrae of the package owns path or empty Bunch
+        """
+        x = self._lookup(path)
+        return B.Bunch() if x is None else self.owners[x[-1]]
+
+    def get(self, path, default=None):
+        """
+        Mapping like interface: path -> nvrae of the package owns path.
+        """
+        return self.owner(path) or default
+
+
+def rpmdb_stamp(rpmdb_path=None):
+    """
+    Make a stamp string changes when rpmdb is updated from the size and mtime
+    of its database files.
+
+    :param rpmdb_path: Path to rpmdb dir or None (system default)
+    :return: Stamp string or None if it's not available
+    """
+    if rpmdb_path is None:
+        rpmdb_path = rpm.expandMacro("%{_dbpath}")
+
+    stamps = []
+
+    for f in RPMDB_FILES:
         try:
-            data = pickle.load(open(cache_file, "rb"))
-            logging.debug("Could load the cache: %s" % cache_file)
-        except:
-            logging.warn("Could not load the cache: %s" % cache_file)
-            date = None
+            st = os.stat(os.path.join(rpmdb_path, f))
+            stamps.append("%s:%d:%f" % (f, st.st_size, st.st_mtime))
+        except OSError:
+            continue
+
+    return ";".join(stamps) if stamps else None
 
-    if data is None:
-        data = dict(concat(((f, rpmh2nvrae(h)) for f in h["filenames"])
-                           for h in ts(rpmdb_path).dbMatch()))
 
+def header_id(h):
+    """
+    :param h: rpm header object
+    :return: ID string identifies the installed package
+    """
+    try:
+        hid = h["sha1header"]
+    except (KeyError, ValueError):
+        hid = None
+
+    if not hid:
+        hid = "%(name)s-%(epoch)s:%(version)s-%(release)s.%(arch)s" % \
+            rpmh2nvrae(h) + "@" + str(h["installtime"])
+
+    return hid
+
+
+CACHE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS packages (
+        id INTEGER PRIMARY KEY,
+        hdrid TEXT UNIQUE NOT NULL,
+        name TEXT, version TEXT, release TEXT, arch TEXT, epoch TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS files (
+        path TEXT NOT NULL,
+        pkg INTEGER NOT NULL,
+        mode INTEGER, uid TEXT, gid TEXT, checksum TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS files_path ON files (path)",
+    "CREATE INDEX IF NOT EXISTS files_pkg ON files (pkg)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+class PersistentRpmDbIndex(RpmDbIndex):
+    """
+    Index of files in rpmdb saved in a sqlite database and shared among
+    processes.
+
+    Files are looked up by path without loading the whole index. The index is
+    updated only if rpmdb was changed since the last update, and only for
+    packages installed or removed since then.
+    """
+
+    def __init__(self, rpmdb_path=None, cache_file=RPMDB_CACHE, timeout=60):
+        """
+        :param rpmdb_path: Path to rpmdb dir or None (system default)
+        :param cache_file: Path to the database file
+        :param timeout: Seconds to wait for the lock held by other processes
+        """
+        self.cache_file = cache_file
+        self.timeout = timeout
+        self._local = threading.local()
+
+        cachedir = os.path.dirname(cache_file)
+        if not os.path.exists(cachedir):
+            os.makedirs(cachedir, 0700)
+
+        conn = self._conn()
+        for sql in CACHE_SCHEMA:
+            conn.execute(sql)
+        conn.commit()
+
+        super(PersistentRpmDbIndex, self).__init__(rpmdb_path)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.cache_file, timeout=self.timeout,
+                                   isolation_level=None)
+            conn.text_factory = str
+            self._local.conn = conn
+
+        return conn
+
+    def _stamp(self, conn):
+        r = conn.execute("SELECT value FROM meta WHERE key = 'stamp'")
+        r = r.fetchone()
+        return None if r is None else r[0]
+
+    def _build(self):
+        """
+        Update the index incrementally if rpmdb was changed.
+        """
+        stamp = rpmdb_stamp(self.rpmdb_path)
+        conn = self._conn()
+
+        if stamp is not None and stamp == self._stamp(conn):
+            logging.debug("rpmdb cache is up to date: " + self.cache_file)
+            return
+
+        conn.execute("BEGIN IMMEDIATE")  # Block other writers.
         try:
-            # TODO: How to detect errors during/after pickle.dump.
-            pickle.dump(data, open(cache_file, "wb"), pkl_proto)
-            logging.debug("Could save the cache: %s" % cache_file)
+            # Check again as another process may have updated it.
+            if stamp is None or stamp != self._stamp(conn):
+                self._update(conn)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES "
+                             "('stamp', ?)", (stamp, ))
+            conn.execute("COMMIT")
         except:
-            logging.warn("Could not save the cache: %s" % cache_file)
+            conn.execute("ROLLBACK")
+            raise
 
-    return data
+    def _update(self, conn):
+        known = dict(conn.execute("SELECT hdrid, id FROM packages"))
+        seen = set()
+        (nadded, nremoved) = (0, 0)
 
+        for h in ts(self.rpmdb_path).dbMatch():
+            hid = header_id(h)
+            seen.add(hid)
 
-try:
-    from yum import rpmsack
-    rpmdb = rpmsack.RPMDBPackageSack()
+            if hid in known:
+                continue
 
-    @U.memoize
-    def rpm_search_provides_by_path(path):
-        rs = rpmdb.searchProvides(path)
-        return rpmh2nvrae(rs[0]) if rs else B.Bunch()
+            p = rpmh2nvrae(h)
+            cur = conn.execute(
+                "INSERT INTO packages (hdrid, name, version, release, arch, "
+                "epoch) VALUES (?, ?, ?, ?, ?, ?)",
+                (hid, p.name, p.version, p.release, p.arch, p.epoch)
+            )
+            pid = cur.lastrowid
 
-except ImportError:
-    @U.memoize
-    def rpm_search_provides_by_path(path, rpmdb_path=None):
-        database = filelist(rpmdb_path=rpmdb_path)
-        return B.Bunch(**database.get(path, dict()))
+            conn.executemany(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                ((fi[0], pid) + tuple(fi[i] for i in self._fi_idxs)
+                 for fi in h.fiFromHeader() if fi)
+            )
+            nadded += 1
+
+        for hid, pid in known.iteritems():
+            if hid not in seen:
+                conn.execute("DELETE FROM files WHERE pkg = ?", (pid, ))
+                conn.execute("DELETE FROM packages WHERE id = ?", (pid, ))
+                nremoved += 1
+
+        logging.info("Updated rpmdb cache: %d added, %d removed" %
+                     (nadded, nremoved))
+
+    def _select(self, path):
+        return self._conn().execute(
+            "SELECT f.mode, f.uid, f.gid, f.checksum, p.name, p.version, "
+            "p.release, p.arch, p.epoch FROM files f, packages p WHERE "
+            "f.path = ? AND f.pkg = p.id ORDER BY f.pkg LIMIT 1", (path, )
+        ).fetchone()
+
+    def _lookup(self, path):
+        apath = os.path.abspath(path)
+        r = self._select(apath)
+
+        if r is None:
+            (d, b) = os.path.split(apath)
+            r = self._select(os.path.join(os.path.realpath(d), b))
+
+        if r is None:
+            return None
+
+        owner = B.Bunch(zip(("name", "version", "release", "arch", "epoch"),
+                            r[4:]))
+        return tuple(r[:4]) + (owner, )
+
+    def owner(self, path):
+        x = self._lookup(path)
+        return B.Bunch() if x is None else x[-1]
+
+
+_INDICES = dict()
+_INDEX_CACHE_FILE = RPMDB_CACHE if sqlite3 is not None else None
+
+
+def set_index_cache(cache_file):
+    """
+    Set the path to the database file to save the index of rpmdb, or None to
+    build the index on memory every time.
+    """
+    global _INDEX_CACHE_FILE
+
+    if sqlite3 is None:
+        cache_file = None
+
+    _INDEX_CACHE_FILE = cache_file
+
+
+def index(rpmdb_path=None):
+    """
+    Returns the index of rpmdb built (or loaded) only once per process.
+    """
+    RPMDB_LOCK.acquire()
+    try:
+        idx = _INDICES.get(rpmdb_path)
+
+        if idx is None:
+            if _INDEX_CACHE_FILE is None:
+                idx = RpmDbIndex(rpmdb_path)
+            else:
+                try:
+                    idx = PersistentRpmDbIndex(rpmdb_path, _INDEX_CACHE_FILE)
+                except (OSError, sqlite3.Error), e:
+                    logging.warn("Could not use rpmdb cache: " + str(e))
+                    idx = RpmDbIndex(rpmdb_path)
+
+            _INDICES[rpmdb_path] = idx
+
+        return idx
+    finally:
+        RPMDB_LOCK.release()
+
+
+def reset_connections():
+    """
+    Drop connections to the index databases inherited from the parent process,
+    e.g. in worker processes forked, as sqlite connections cannot be shared
+    among processes. Indices loaded in memory are kept.
+    """
+    for idx in _INDICES.values():
+        if isinstance(idx, PersistentRpmDbIndex):
+            idx._local = threading.local()
+
+
+def filelist(rpmdb_path=None):
+    """
+    Returns the index of rpmdb which maps path to nvrae of the package owns
+    it: filelist().get(path) -> nvrae or None.
+    """
+    return index(rpmdb_path)
+
+
+def rpm_search_provides_by_path(path, rpmdb_path=None):
+    """
+    Find the package owns given path.
+
+    :param path: Path of the file or directory
+    :return: nvrae of the package owns path or empty Bunch
+    """
+    return index(rpmdb_path).owner(path)
 
 
 def __rpm_attr(fo):
@@ -15,6 +15,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
+import pmaker.utils as U
+
 import logging
 import os
 import subprocess
@@ -24,6 +26,9 @@ import threading
 
 CURDIR = os.getcwd()
 
+# Counts of processes run.
+PROCESSES = U.Counter()
+
 
 def shell(cmd, workdir=CURDIR, dryrun=False, stop_on_error=True):
     """
@@ -56,6 +61,7 @@ def shell(cmd, workdir=CURDIR, dryrun=False, stop_on_error=True):
         pass
 
     try:
+        PROCESSES.incr("processes")
         proc = subprocess.Popen(cmd, shell=True, cwd=workdir)
         proc.wait()
         rc = proc.returncode
@@ -122,6 +128,7 @@ class ThreadedCommand(object):
 
             logging.info("Run: " + self.cmd_str)
 
+            PROCESSES.incr("processes")
             self.process = subprocess.Popen(self.cmd,
                                             bufsize=4096,
                                             shell=True,
@@ -0,0 +1,171 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.anycfg as A
+import pmaker.copier as C
+import pmaker.models.Bunch as B
+import pmaker.shell as S
+import pmaker.utils as U
+
+import logging
+import os
+import os.path
+import resource
+import time
+
+
+# Keys of the resource usage of each step and the format to print them:
+FIELDS = (("wall", "wall(s)", "%9.2f"),
+          ("cpu", "cpu(s)", "%9.2f"),
+          ("cpu_children", "cpu-ch(s)", "%9.2f"),
+          ("maxrss", "rss(MB)", "%8.1f"),
+          ("maxrss_children", "rss-ch(MB)", "%10.1f"),
+          ("processes", "procs", "%6d"),
+          ("files", "files", "%8d"),
+          ("bytes", "MB", "%9.1f"))
+
+_MB = 1024.0 * 1024.0
+
+
+def _maxrss(who=resource.RUSAGE_SELF):
+    """
+    :return: Peak RSS in bytes (ru_maxrss is in KB on Linux)
+    """
+    return resource.getrusage(who).ru_maxrss * 1024
+
+
+def snapshot():
+    """
+    Take a snapshot of counters to measure resource usage from now.
+    """
+    t = os.times()
+
+    return B.Bunch(wall=time.time(), cpu=t[0] + t[1],
+                   cpu_children=t[2] + t[3],
+                   processes=S.PROCESSES.get("processes"),
+                   files=C.STATS.get("files"), bytes=C.STATS.get("bytes"),
+                   linked=C.STATS.get("hardlink"))
+
+
+def measure(name, start):
+    """
+    Measure resource usage since the snapshot start was taken.
+
+    Peak RSS is not the peak during the step but the peak of the process
+    (and its children) since it started, i.e. it's the peak during the step
+    only if it increased in the step.
+
+    :param name: Step name
+    :param start: A snapshot taken with snapshot() above
+    :return: A Bunch object holds resource usage of the step
+    """
+    end = snapshot()
+    st = B.Bunch((k, end[k] - start[k]) for k in start.keys())
+
+    st.step = name
+    st.maxrss = _maxrss()
+    st.maxrss_children = _maxrss(resource.RUSAGE_CHILDREN)
+
+    return st
+
+
+def load(path):
+    """
+    Load resource usage of steps saved previously.
+
+    :return: A list of Bunch objects or [] if not saved
+    """
+    if not os.path.exists(path):
+        return []
+
+    try:
+        return A.JsonConfigPaser().load(path).get("steps", [])
+    except (IOError, ValueError), e:
+        logging.warn("Could not load stats: %s: %s" % (path, e))
+        return []
+
+
+def save(stats, path):
+    """
+    Save resource usage of steps and statistics of caches of memoized
+    functions in this process.
+    """
+    A.JsonConfigPaser.dump(B.Bunch(steps=stats, caches=U.memo_stats()), path)
+
+
+def update(stats, st):
+    """
+    Replace the resource usage of the same step in stats with st or append st
+    if not found.
+    """
+    return [x for x in stats if x["step"] != st.step] + [st]
+
+
+def _row(st):
+    return [fmt % (st.get(k, 0) / (_MB if "rss" in k or k == "bytes" else 1))
+            for k, _h, fmt in FIELDS]
+
+
+def summary(stats):
+    """
+    Make a summary table of resource usage of steps.
+
+    :param stats: A list of Bunch objects made by measure()
+    :return: A string of the table
+    """
+    width = max([len(st["step"]) for st in stats] + [len("total")])
+    header = ["%-*s" % (width, "step")] + \
+        ["%*s" % (len(fmt % 0), h) for _k, h, fmt in FIELDS]
+    lines = [" ".join(header)]
+
+    for st in stats:
+        lines.append(" ".join(["%-*s" % (width, st["step"])] + _row(st)))
+
+    total = B.Bunch((k, sum(st.get(k, 0) for st in stats)) for k, _h, _f in
+                    FIELDS)
+    for k in ("maxrss", "maxrss_children"):
+        total[k] = max([st.get(k, 0) for st in stats] + [0])
+
+    lines.append(" ".join(["%-*s" % (width, "total")] + _row(total)))
+
+    return "\n".join(lines)
+
+
+def caches_summary(caches):
+    """
+    Make a summary table of statistics of caches.
+
+    :param caches: A list of Bunch objects made by pmaker.utils.memo_stats()
+    :return: A string of the table
+
+    >>> print caches_summary([B.Bunch(name="f", hits=3, misses=1,
+    ...                               evictions=0, size=1)])
+    cache     hits   misses  evictions   size
+    f            3        1          0      1
+    """
+    width = max([len(c["name"]) for c in caches] + [len("cache")])
+    lines = ["%-*s %8s %8s %10s %6s" % (width, "cache", "hits", "misses",
+                                        "evictions", "size")]
+
+    for c in caches:
+        lines.append("%-*s %8d %8d %10d %6d" %
+                     (width, c["name"], c["hits"], c["misses"],
+                      c["evictions"], c["size"]))
+
+    return "\n".join(lines)
+
+
+# vim:sw=4:ts=4:et:
@@ -17,9 +17,17 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 import pmaker.imported.tenjin as tenjin
+import pmaker.globals as G
+
+import filecmp
+import hashlib
+import imp
 import logging
+import marshal
+import optparse
 import os.path
 import os
+import sys
 
 
 # dirty hack for highly customized and looks a bit overkill (IMHO) module
@@ -41,10 +49,99 @@ to_str = tenjin.helpers.to_str
 unquote = tenjin.helpers.unquote
 
 
+# Dirs under G.PMAKER_CACHEDIR (per user) and G.PMAKER_SYSTEM_CACHEDIR
+# (shared, precompiled at install time) to save compiled templates:
+CACHE_SUBDIR = "templates"
+CACHE_DIR = os.path.join(G.PMAKER_CACHEDIR, CACHE_SUBDIR)
+SYSTEM_CACHE_DIR = os.path.join(G.PMAKER_SYSTEM_CACHEDIR, CACHE_SUBDIR)
+
+
+class CompiledTemplateCache(tenjin.MarshalCacheStorage):
+    """
+    Persistent cache of compiled templates shared among pmaker processes.
+
+    Python code converted from templates and its bytecode are saved in
+    $cachedir/<hash>.cache where <hash> is made from the path of the template,
+    the version of pmaker and the magic number of python bytecode, and they
+    are discarded by the engine if the mtime of the template is changed. Cache
+    files are replaced atomically so that concurrent processes never see
+    partially written ones.
+
+    Dirs in fallbacks, e.g. the system cache dir precompiled at install time,
+    are only looked up and never written.
+    """
+
+    def __init__(self, cachedir=CACHE_DIR, fallbacks=()):
+        tenjin.MarshalCacheStorage.__init__(self)
+        self.cachedir = cachedir
+        self.fallbacks = [d for d in fallbacks if d != cachedir]
+
+    def cache_file(self, cachepath, cachedir=None):
+        """
+        :param cachepath: Cache path of the template given by the engine,
+            that is, "<absolute path of the template>.cache"
+        """
+        key = "\0".join((cachepath, G.PMAKER_VERSION, imp.get_magic()))
+        return os.path.join(cachedir or self.cachedir,
+                            hashlib.sha1(key).hexdigest() + ".cache")
+
+    def _load(self, cachepath):
+        for cachedir in [self.cachedir] + self.fallbacks:
+            cache_file = self.cache_file(cachepath, cachedir)
+            if not os.path.isfile(cache_file):
+                continue
+
+            try:
+                return self._restore(tenjin._read_binary_file(cache_file))
+            except (IOError, EOFError, ValueError, TypeError), e:
+                logging.debug("Broken template cache: %s: %s" %
+                              (cache_file, e))
+        return None
+
+    def _store(self, cachepath, dct):
+        try:
+            if not os.path.exists(self.cachedir):
+                os.makedirs(self.cachedir, 0700)
+
+            tenjin._write_binary_file(self.cache_file(cachepath),
+                                      self._dump(dct))
+        except (IOError, OSError), e:
+            logging.debug("Could not save template cache: %s: %s" %
+                          (cachepath, e))
+
+    def _delete(self, cachepath):
+        try:
+            os.remove(self.cache_file(cachepath))
+        except OSError:
+            pass
+
+
 # http://www.kuwata-lab.com/tenjin/pytenjin-users-guide.html#templace-cache
 _ENGINE = tenjin.Engine(cache=tenjin.MemoryCacheStorage())
 
 
+def enable_cache(cachedir=CACHE_DIR, fallbacks=(SYSTEM_CACHE_DIR, ),
+                 engine=_ENGINE):
+    """
+    Make the engine save compiled templates in cachedir and look them up from
+    cachedir and fallbacks.
+    """
+    cache = engine.cache
+    if not isinstance(cache, CompiledTemplateCache) or \
+            cache.cachedir != cachedir:
+        engine.cache = CompiledTemplateCache(cachedir, fallbacks)
+
+    return engine.cache
+
+
+def disable_cache(engine=_ENGINE):
+    """
+    Make the engine keep compiled templates only in memory.
+    """
+    if not isinstance(engine.cache, tenjin.MemoryCacheStorage):
+        engine.cache = tenjin.MemoryCacheStorage()
+
+
 class TemplateNotFoundError(Exception):
     pass
 
@@ -117,4 +214,127 @@ def compile(template, context={}, tpaths=[], ask=True, engine=_ENGINE):
     return engine.render(tmpl, context)
 
 
+class StreamBuffer(object):
+    """
+    Buffer passed to templates as '_buf' to write chunks of the output into
+    the file object as rendered instead of keeping all of them in memory.
+    """
+
+    def __init__(self, out):
+        self.out = out
+
+    def extend(self, chunks):
+        self.out.writelines(chunks)
+
+    def append(self, chunk):
+        self.out.write(chunk)
+
+
+def render_to(template, output, context={}, tpaths=[], ask=True,
+              engine=_ENGINE):
+    """
+    Render template and write the result into output file in chunks so that
+    memory usage is kept flat regardless of the size of the result. Templates
+    using layout are not supported.
+
+    The result is written into a temporary file and renamed to output after
+    rendering finished so that output is never left partially written. Output
+    is kept as it is (and its mtime is not changed) if the result is same as
+    its content.
+
+    :param template: Template file path or filename
+    :param output: Output file path
+    :param context: Context dict to instantiate given template
+    :param tpaths: Template file search path
+    :param ask: Ask user about the path to template file if it's missing
+        and this value is True
+    :param engine: Template compiling engine
+    :return: True if output was written or False if it was kept as it is
+    """
+    tmpl = find_template(template, tpaths, ask=ask)
+
+    engine.hook_context(context)
+    template = engine.get_template(tmpl, context, globals())
+
+    tmp = output + ".tmp"
+    out = open(tmp, "w")
+    try:
+        try:
+            template.render(context, globals(), _buf=StreamBuffer(out))
+        finally:
+            out.close()
+
+        if os.path.exists(output) and filecmp.cmp(tmp, output, False):
+            os.remove(tmp)
+            return False
+
+        os.rename(tmp, output)
+        return True
+    except:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def precompile(tpaths, cachedir=CACHE_DIR, engine=None):
+    """
+    Compile all templates under given dirs and save them in cachedir.
+
+    :param tpaths: Template dirs or files
+    :param cachedir: Dir to save compiled templates
+    :param engine: Engine to keep compiled templates also in memory, e.g.
+        _ENGINE to share them with processes forked later
+    :return: List of paths of templates compiled
+    """
+    if engine is None:
+        engine = tenjin.Engine(cache=CompiledTemplateCache(cachedir))
+    else:
+        enable_cache(cachedir, (), engine)
+
+    compiled = []
+
+    for tpath in tpaths:
+        if os.path.isdir(tpath):
+            tmpls = sorted(os.path.join(d, f) for d, _ds, fs in
+                           os.walk(tpath) for f in fs)
+        else:
+            tmpls = [tpath]
+
+        for tmpl in tmpls:
+            try:
+                engine.get_template(os.path.abspath(tmpl))
+                compiled.append(tmpl)
+            except Exception, e:
+                logging.warn("Could not compile template: %s: %s" %
+                             (tmpl, e))
+
+    return compiled
+
+
+def main(argv=sys.argv):
+    """
+    Precompile templates, e.g. at install time:
+
+      python -m pmaker.tenjinwrapper -C /var/cache/pmaker/templates \\
+          /usr/share/pmaker/templates
+    """
+    p = optparse.OptionParser("%prog [OPTION ...] [TEMPLATE_DIR ...]")
+    p.set_defaults(cachedir=CACHE_DIR)
+    p.add_option("-C", "--cachedir",
+                 help="Dir to save compiled templates [%default]")
+
+    (options, args) = p.parse_args(argv[1:])
+    tpaths = args or [G.TEMPLATE_SEARCH_PATHS[0]]
+
+    compiled = precompile(tpaths, options.cachedir)
+    logging.info("Compiled %d templates into %s" %
+                 (len(compiled), options.cachedir))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
 # vim:sw=4:ts=4:et:
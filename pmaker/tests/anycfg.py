@@ -197,7 +197,7 @@ if A.json is not None:
             config = parser.load(cfgpath)
 
 
-if A.yaml is not None:
+if A._yaml() is not None:
 
     class Test_05_YamlConfigParser(unittest.TestCase):
 
@@ -285,7 +285,7 @@ class Test_07_AnyConfigParser(unittest.TestCase):
             config = parser.load(path)
             self.assertEquals(config, config_ref)
 
-        if A.yaml:
+        if A._yaml():
             path = dump_conf(self.workdir, YAML_CONFIG_CONTENT, ".yaml")
             config_ref = B.Bunch(
                 defaults=B.Bunch(a="aaa", b="bbb"),
@@ -312,7 +312,7 @@ class Test_07_AnyConfigParser(unittest.TestCase):
             config_ref["array0"] = [1, 2, 3]
             paths.append(path)
 
-        if A.yaml:
+        if A._yaml():
             content = """\
 profile0:
     b: zzz
@@ -341,7 +341,7 @@ profile0:
     def test_04_load__init__w_type__yaml(self):
         parser = A.AnyConfigParser(A.CTYPE_YAML)
 
-        if A.yaml:
+        if A._yaml():
             path = dump_conf(self.workdir, YAML_CONFIG_CONTENT, ".conf")
             config_ref = B.Bunch(
                 defaults=B.Bunch(a="aaa", b="bbb"),
@@ -367,7 +367,7 @@ profile0:
     def test_06_load__w_type_yaml(self):
         parser = A.AnyConfigParser()
 
-        if A.yaml:
+        if A._yaml():
             path = dump_conf(self.workdir, YAML_CONFIG_CONTENT, ".conf")
             config_ref = B.Bunch(
                 defaults=B.Bunch(a="aaa", b="bbb"),
@@ -21,10 +21,27 @@ import pmaker.app as A
 
 import os
 import os.path
+import subprocess
 import sys
 import unittest
 
 
+# Modules take time to load and must be loaded only when needed:
+HEAVY_MODULES = ("rpm", "yum", "yaml", "lxml", "lxml.etree", "urllib2",
+                 "pmaker.imported.tenjin", "pmaker.tenjinwrapper")
+
+# Max time [sec] to import pmaker.app, i.e. the start up time of pmaker CLI.
+IMPORT_TIME_BUDGET = 1.0
+
+IMPORT_SCRIPT = """\
+import sys, time
+start = time.time()
+import pmaker.app
+print time.time() - start
+print " ".join(m for m in %r if sys.modules.get(m) is not None)
+""" % (HEAVY_MODULES, )
+
+
 class Test_00_main(unittest.TestCase):
 
     def setUp(self):
@@ -64,4 +81,16 @@ class Test_00_main(unittest.TestCase):
         self.helper("config_example_01.yaml")
 
 
+class Test_10_import(unittest.TestCase):
+
+    def test_00_import_time(self):
+        env = dict(os.environ, PYTHONPATH=TOPDIR)
+        out = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT],
+                                      env=env, cwd=TOPDIR)
+        (elapsed, loaded) = (out.splitlines() + [""])[:2]
+
+        self.assertEquals(loaded, "")
+        self.assertTrue(float(elapsed) < IMPORT_TIME_BUDGET, elapsed)
+
+
 # vim:sw=4:ts=4:et:
@@ -0,0 +1,105 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.archive as A
+
+import distutils.spawn
+import os
+import os.path
+import subprocess
+import tarfile
+import unittest
+
+
+class Test_00_TarWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.topdir = os.path.join(self.workdir, "top")
+
+        os.makedirs(os.path.join(self.topdir, "a", "b"))
+        open(os.path.join(self.topdir, "a", "b", "c"), "w").write("c\n")
+        os.symlink("b/c", os.path.join(self.topdir, "a", "c.link"))
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def make_archive(self, ext, cmd=None):
+        path = os.path.join(self.workdir, "top.tar." + ext)
+
+        with A.TarWriter(path, ext, cmd) as tar:
+            tar.add_dir(self.topdir, "top")
+
+            for rel in ("a/b/c", "a/c.link"):
+                tar.add_parents(self.topdir, rel, "top")
+                tar.add(os.path.join(self.topdir, rel),
+                        os.path.join("top", rel))
+
+        return path
+
+    def assertArchived(self, names, tar):
+        self.assertEquals(names, ["top", "top/a", "top/a/b", "top/a/b/c",
+                                  "top/a/c.link"])
+        self.assertEquals(tar.getmember("top/a/c.link").linkname, "b/c")
+        self.assertEquals(tar.extractfile("top/a/b/c").read(), "c\n")
+
+    def test_00_gz(self):
+        tar = tarfile.open(self.make_archive("gz"))
+        self.assertArchived(tar.getnames(), tar)
+
+    def test_01_bz2(self):
+        tar = tarfile.open(self.make_archive("bz2"))
+        self.assertArchived(tar.getnames(), tar)
+
+    def test_02_xz(self):
+        if not distutils.spawn.find_executable("xz"):
+            return
+
+        path = self.make_archive("xz")
+        out = os.path.join(self.workdir, "top.tar")
+        subprocess.check_call("xz -dc %s > %s" % (path, out), shell=True)
+
+        tar = tarfile.open(out)
+        self.assertArchived(tar.getnames(), tar)
+
+    def test_03_dist_modes(self):
+        path = os.path.join(self.workdir, "top.tar.gz")
+        c = os.path.join(self.topdir, "a", "b", "c")
+        os.chmod(c, 0600)
+        os.chmod(os.path.join(self.topdir, "a"), 0700)
+
+        with A.TarWriter(path, dist_modes=True) as tar:
+            tar.add_parents(self.topdir, "a/b/c", "top")
+            tar.add(c, "top/a/b/c")
+
+        tar = tarfile.open(path)
+        self.assertEquals(tar.getmember("top/a").mode, 0755)
+        self.assertEquals(tar.getmember("top/a/b/c").mode, 0644)
+
+    def test_10_error(self):
+        path = os.path.join(self.workdir, "top.tar.gz")
+
+        def f():
+            with A.TarWriter(path) as tar:
+                tar.add(os.path.join(self.topdir, "not_exist"), "x")
+
+        self.assertRaises(OSError, f)
+        self.assertFalse(os.path.exists(path))
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,157 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.artifactcache as AC
+
+import errno
+import os
+import os.path
+import shutil
+import unittest
+
+
+class Test_00_LinkLock(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.path = os.path.join(self.workdir, "lock")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_acquire_and_release(self):
+        with AC.LinkLock(self.path):
+            self.assertTrue(os.path.exists(self.path))
+            self.assertRaises(AC.LockTimeoutError,
+                              AC.LinkLock(self.path, timeout=0.2).acquire)
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEquals(os.listdir(self.workdir), [])
+
+    def test_10_acquire__stale(self):
+        open(self.path, "w").close()
+        os.utime(self.path, (0, 0))
+
+        with AC.LinkLock(self.path, timeout=1):
+            self.assertNotEquals(os.stat(self.path).st_mtime, 0)
+
+    def test_20_break_if_stale__acquired_by_others(self):
+        lock = AC.LinkLock(self.path)
+        open(self.path, "w").close()
+
+        # Simulate that the lock looked stale but it was broken and acquired
+        # by others just after that.
+        checked = []
+
+        def is_stale(path):
+            checked.append(path)
+            return len(checked) == 1
+
+        lock._is_stale = is_stale
+        lock._break_if_stale(self.path + ".tmp")
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEquals(os.listdir(self.workdir), ["lock"])
+
+
+class Test_10_ArtifactCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.cache = AC.ArtifactCache(os.path.join(self.workdir, "cache"))
+
+        self.builddir = os.path.join(self.workdir, "build", "foo-0.1")
+        os.makedirs(self.builddir)
+
+        self.paths = [os.path.join(self.builddir, "foo-0.1.tar.gz"),
+                      os.path.join(self.workdir, "build", "foo_0.1.dsc")]
+        for p in self.paths:
+            open(p, "w").write(os.path.basename(p) * 10)
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_get__not_found(self):
+        self.assertTrue(self.cache.get("abc", self.builddir) is None)
+
+    def test_10_put_and_get(self):
+        self.assertTrue(self.cache.put("abc", self.builddir, self.paths))
+        self.assertFalse(self.cache.put("abc", self.builddir, self.paths))
+
+        builddir = os.path.join(self.workdir, "build2", "foo-0.1")
+        paths = self.cache.get("abc", builddir)
+
+        self.assertEquals(paths,
+                          [os.path.join(builddir, "foo-0.1.tar.gz"),
+                           os.path.join(self.workdir, "build2",
+                                        "foo_0.1.dsc")])
+        for p, q in zip(paths, self.paths):
+            self.assertEquals(open(p).read(), open(q).read())
+
+        self.assertEquals(os.listdir(self.cache.tmpdir), [])
+
+    def test_20_evict(self):
+        size = sum(os.path.getsize(p) for p in self.paths)
+        self.cache.maxsize = size * 2
+
+        self.cache.put("a0", self.builddir, self.paths)
+        self.cache.put("b0", self.builddir, self.paths)
+
+        for key in ("a0", "b0"):
+            os.utime(os.path.join(self.cache.entry_dir(key), AC.MANIFEST),
+                     (0, 0))
+
+        # "a0" is used recently than "b0", so that "b0" should be evicted.
+        self.assertTrue(self.cache.get("a0", self.builddir))
+        self.cache.put("c0", self.builddir, self.paths)
+
+        self.assertEquals(sorted(os.path.basename(e) for _m, _s, e in
+                                 self.cache.entries()), ["a0", "c0"])
+        self.assertEquals(os.listdir(self.cache.tmpdir), [])
+
+    def test_21_evict__evicted_by_others(self):
+        self.cache.put("a0", self.builddir, self.paths)
+
+        entry = self.cache.entry_dir("b0")
+        self.cache.entries = lambda: [(0, self.cache.maxsize + 1, entry)]
+
+        self.cache.evict()  # It should not raise any errors.
+        self.assertEquals(os.listdir(self.cache.tmpdir), [])
+
+    def test_30_put__error(self):
+        shutil.rmtree(self.cache.tmpdir)
+        self.assertFalse(self.cache.put("abc", self.builddir, self.paths))
+
+    def test_40_get__read_only(self):
+        self.cache.put("abc", self.builddir, self.paths)
+
+        orig = os.utime
+
+        def utime(path, *args):
+            if path.startswith(self.cache.topdir):
+                raise OSError(errno.EROFS, "Read-only file system")
+            return orig(path, *args)
+
+        os.utime = utime
+        try:
+            self.assertTrue(self.cache.get("abc", self.builddir))
+        finally:
+            os.utime = orig
+
+
+# vim:sw=4:ts=4:et:
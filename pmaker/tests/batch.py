@@ -0,0 +1,122 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir, TOPDIR
+
+import pmaker.batch as B
+
+import json
+import os.path
+import unittest
+
+
+class Test_00_functions(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_to_argv__no_files(self):
+        self.assertRaises(ValueError, B.to_argv, dict(name="foo"))
+
+    def test_10_load_manifest(self):
+        manifest = os.path.join(self.workdir, "manifest.json")
+        data = dict(defaults=dict(pversion="0.1", no_mock=True),
+                    packages=[dict(name="foo", files="foo.list"),
+                              dict(name="bar", files="/a/bar.list",
+                                   pversion="0.2")])
+        json.dump(data, open(manifest, "w"))
+
+        self.assertEquals(B.load_manifest(manifest),
+                          [("foo", ["--name", "foo", "--no-mock",
+                                    "--pversion", "0.1",
+                                    os.path.join(self.workdir, "foo.list")]),
+                           ("bar", ["--name", "bar", "--no-mock",
+                                    "--pversion", "0.2", "/a/bar.list"])])
+
+
+class Test_10_run(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+        listfile = os.path.join(self.workdir, "files.list")
+        open(listfile, "w").write("/etc/hosts\n/etc/resolv.conf\n")
+
+        self.manifest = os.path.join(self.workdir, "manifest.json")
+        defaults = dict(norc=True, stepto="setup", files="files.list",
+                        template_path=os.path.join(TOPDIR, "templates"),
+                        cachedir=os.path.join(self.workdir, "cache"))
+        pkgs = [dict(name=n, workdir=os.path.join(self.workdir, n)) for n in
+                ("foo", "bar", "baz")]
+
+        # It should fail as the list of files is empty:
+        pkgs.append(dict(name="empty", files="/dev/null"))
+
+        json.dump(dict(defaults=defaults, packages=pkgs),
+                  open(self.manifest, "w"))
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_run(self):
+        results = B.run(B.load_manifest(self.manifest), 2)
+
+        self.assertEquals([r.name for r in results],
+                          ["foo", "bar", "baz", "empty"])
+        self.assertEquals([r.rc for r in results], [0, 0, 0, 1])
+
+        for r in results[:-1]:
+            self.assertEquals(r.workdir, os.path.join(self.workdir, r.name,
+                                                      r.name + "-0.0.1"))
+            self.assertTrue(os.path.exists(os.path.join(r.workdir, "src",
+                                                        "etc", "hosts")))
+
+        self.assertTrue("Failed to collect files" in results[-1].error)
+        self.assertTrue("3 succeeded, 1 failed" in B.summary(results))
+
+    def test_10_run__mixed_drivers(self):
+        manifest = os.path.join(self.workdir, "manifest2.json")
+        defaults = dict(norc=True, stepto="preconfigure", no_rpmdb=True,
+                        files="files.list",
+                        template_path=os.path.join(TOPDIR, "templates"),
+                        cachedir=os.path.join(self.workdir, "cache"))
+        pkgs = [dict(name=n, driver=d, workdir=os.path.join(self.workdir, n))
+                for n, d in (("foo", "autotools.single.rpm"),
+                             ("bar", "autotools.single.rpm"),
+                             ("baz", "native.tgz"))]
+
+        json.dump(dict(defaults=defaults, packages=pkgs),
+                  open(manifest, "w"))
+
+        # Build all in this process as a worker does.
+        results = B.run(B.load_manifest(manifest), 1)
+
+        self.assertEquals([r.rc for r in results], [0, 0, 0])
+
+        ls = dict((r.name, os.listdir(r.workdir)) for r in results)
+
+        self.assertTrue("foo.spec" in ls["foo"])
+        self.assertTrue("bar.spec" in ls["bar"])
+        self.assertFalse("foo.spec" in ls["bar"])
+
+        for f in ("rpm.mk", "foo.spec", "bar.spec", "baz.spec"):
+            self.assertFalse(f in ls["baz"])
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,131 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.checksumcache as CC
+import pmaker.utils as U
+
+import os
+import os.path
+import time
+import unittest
+
+
+def make_old_file(path, content):
+    open(path, "w").write(content)
+
+    t = time.time() - CC.RACY_PERIOD * 10
+    os.utime(path, (t, t))
+
+
+class Test_00_functions(unittest.TestCase):
+
+    def test_00_stat_key(self):
+        st = os.stat(__file__)
+        (dev, ino, size, mtime_ns) = CC.stat_key(st)
+
+        self.assertEquals(dev, st.st_dev)
+        self.assertEquals(ino, st.st_ino)
+        self.assertEquals(size, st.st_size)
+        self.assertEquals(mtime_ns // 1000000000, int(st.st_mtime))
+
+
+class Test_01_ChecksumCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.cache_file = os.path.join(self.workdir, "cache", "checksums.db")
+
+    def tearDown(self):
+        CC.disable()
+        cleanup_workdir(self.workdir)
+
+    def test_00_checksum__miss_and_hit(self):
+        path = os.path.join(self.workdir, "a.txt")
+        make_old_file(path, "aaa\n")
+
+        cache = CC.ChecksumCache(self.cache_file)
+        self.assertEquals(cache.checksum(path), U.checksum(path))
+        self.assertEquals(cache.misses, 1)
+        cache.flush()
+
+        # Another instance (process) shares the cache:
+        cache2 = CC.ChecksumCache(self.cache_file)
+        self.assertEquals(cache2.checksum(path), U.checksum(path))
+        self.assertEquals(cache2.hits, 1)
+
+    def test_01_checksum__modified(self):
+        path = os.path.join(self.workdir, "a.txt")
+        make_old_file(path, "aaa\n")
+
+        cache = CC.ChecksumCache(self.cache_file)
+        cache.checksum(path)
+        cache.flush()
+
+        make_old_file(path, "bbbbbb\n")
+        key = CC.stat_key(os.stat(path))
+
+        self.assertEquals(cache.get(key), None)
+
+    def test_02_checksum__too_new_file_is_not_cached(self):
+        path = os.path.join(self.workdir, "a.txt")
+        open(path, "w").write("aaa\n")
+
+        cache = CC.ChecksumCache(self.cache_file)
+        cache.checksum(path)
+        cache.flush()
+
+        self.assertEquals(cache.get(CC.stat_key(os.stat(path))), None)
+
+    def test_03_evict(self):
+        cache = CC.ChecksumCache(self.cache_file, max_entries=2)
+        paths = [os.path.join(self.workdir, "%d.txt" % i) for i in range(4)]
+
+        for p in paths:
+            make_old_file(p, p)
+            cache.checksum(p)
+
+        cache.flush()
+
+        keys = [CC.stat_key(os.stat(p)) for p in paths]
+        self.assertEquals(len([k for k in keys if cache.get(k)]), 2)
+
+    def test_04_enable_and_checksum(self):
+        path = os.path.join(self.workdir, "a.txt")
+        make_old_file(path, "aaa\n")
+
+        self.assertFalse(CC.enable(self.cache_file) is None)
+        self.assertEquals(CC.checksum(path), U.checksum(path))
+
+        CC.disable()
+        self.assertEquals(CC.checksum(path), U.checksum(path))
+
+    def test_05_stats(self):
+        path = os.path.join(self.workdir, "a.txt")
+        make_old_file(path, "aaa\n")
+
+        self.assertTrue(CC.stats() is None)
+
+        CC.enable(self.cache_file)
+        CC.checksum(path)
+        CC.flush()
+        CC.checksum(path)
+
+        self.assertEquals(CC.stats(), dict(hits=1, misses=1))
+
+
+# vim:sw=4:ts=4:et:
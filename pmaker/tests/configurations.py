@@ -102,7 +102,7 @@ class Test_02_Config(unittest.TestCase):
         self.assertFalse(cfg.missing_files())
 
     def test_02__norc_and_load_yaml_config(self):
-        if E.yaml is None:
+        if E.Env().yaml is None:
             return True
 
         cfg = C.Config(norc=True)
@@ -0,0 +1,143 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.copier as C
+
+import errno
+import filecmp
+import os
+import os.path
+import stat
+import unittest
+
+
+class TestCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+        self.src = os.path.join(self.workdir, "src.dat")
+        open(self.src, "w").write(os.urandom(3 * 1024 * 1024 + 7))
+        os.chmod(self.src, 0751)
+        os.utime(self.src, (1000000000, 1234567890))
+
+        self.dst = os.path.join(self.workdir, "dst.dat")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def assertCopied(self, src, dst):
+        (st, st_dst) = (os.lstat(src), os.lstat(dst))
+
+        self.assertTrue(filecmp.cmp(src, dst, False))
+        self.assertEquals(st_dst.st_mode, st.st_mode)
+        self.assertEquals(int(st_dst.st_mtime), int(st.st_mtime))
+        self.assertEquals((st_dst.st_uid, st_dst.st_gid),
+                          (st.st_uid, st.st_gid))
+
+    def test_00_copy__file(self):
+        C.STATS.reset()
+        size = C.copy(self.src, self.dst)
+
+        self.assertCopied(self.src, self.dst)
+        self.assertEquals(size, os.path.getsize(self.src))
+        self.assertEquals(C.STATS.get("files"), 1)
+        self.assertEquals(C.STATS.get("bytes"), size)
+
+    def test_01_copy__file__w_lstat(self):
+        C.copy(self.src, self.dst, os.lstat(self.src))
+        self.assertCopied(self.src, self.dst)
+
+    def test_02_copy__empty_file(self):
+        src = os.path.join(self.workdir, "empty")
+        open(src, "w").close()
+
+        self.assertEquals(C.copy(src, self.dst), 0)
+        self.assertCopied(src, self.dst)
+
+    def test_03_copy__symlink(self):
+        src = os.path.join(self.workdir, "src.link")
+        os.symlink("src.dat", src)
+
+        C.copy(src, self.dst)
+
+        self.assertTrue(os.path.islink(self.dst))
+        self.assertEquals(os.readlink(self.dst), "src.dat")
+
+    def test_04_copy__fifo(self):
+        src = os.path.join(self.workdir, "src.fifo")
+        os.mkfifo(src)
+
+        C.copy(src, self.dst)
+        self.assertTrue(stat.S_ISFIFO(os.lstat(self.dst).st_mode))
+
+    def test_05_copy_content__fallbacks(self):
+        saved = (C._copy_file_range, C._sendfile)
+        try:
+            C._copy_file_range = None
+            dst = self.dst + ".sendfile"
+            self.assertTrue(C.copy_content(self.src, dst) in
+                            ("reflink", "sendfile", "rw"))
+            self.assertTrue(filecmp.cmp(self.src, dst, False))
+
+            C._sendfile = None
+            dst = self.dst + ".rw"
+            self.assertTrue(C.copy_content(self.src, dst) in
+                            ("reflink", "rw"))
+            self.assertTrue(filecmp.cmp(self.src, dst, False))
+        finally:
+            (C._copy_file_range, C._sendfile) = saved
+
+    def test_06_copy__dst_exists(self):
+        open(self.dst, "w").write("exists")
+        self.assertRaises(OSError, C.copy, self.src, self.dst)
+
+    def test_10_link__file(self):
+        C.STATS.reset()
+
+        self.assertEquals(C.link(self.src, self.dst), 0)
+        self.assertEquals(os.lstat(self.dst).st_ino, os.lstat(self.src).st_ino)
+        self.assertEquals(C.STATS.get("hardlink"), 1)
+
+    def test_11_link__symlink_is_copied(self):
+        src = os.path.join(self.workdir, "src.link")
+        os.symlink("src.dat", src)
+
+        C.link(src, self.dst)
+
+        self.assertTrue(os.path.islink(self.dst))
+        self.assertNotEquals(os.lstat(self.dst).st_ino, os.lstat(src).st_ino)
+
+    def test_12_link__fallback_to_copy(self):
+        # Simulate failures to link, e.g. EXDEV.
+        saved = os.link
+        try:
+            def link(src, dst):
+                raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+            os.link = link
+            C.link(self.src, self.dst)
+        finally:
+            os.link = saved
+
+        self.assertCopied(self.src, self.dst)
+        self.assertNotEquals(os.lstat(self.dst).st_ino,
+                             os.lstat(self.src).st_ino)
+
+
+# vim:sw=4:ts=4:et:
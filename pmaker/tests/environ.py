@@ -16,8 +16,11 @@
 #
 from pmaker.environ import *
 from pmaker.globals import PKG_FORMATS, COMPRESSING_TOOLS
+from pmaker.tests.common import setup_workdir, cleanup_workdir
 
 import pmaker.models.Bunch as B
+import pmaker.utils as U
+import os.path
 import unittest
 
 
@@ -66,8 +69,80 @@ class TestEnv(unittest.TestCase):
         if json is not None:
             self.assertFalse(env.json is None)
 
-        if yaml is not None:
+        if U.try_import("yaml") is not None:
             self.assertFalse(env.yaml is None)
 
+    def test__lazy_attrs(self):
+        env = Env()
+        env.pop("hostname", None)
+
+        self.assertFalse("hostname" in env)
+        self.assertEquals(env.hostname, hostname())
+        self.assertTrue("hostname" in env)
+        self.assertTrue(env.compressor in COMPRESSING_TOOLS)
+
+        with self.assertRaises(KeyError):
+            env.not_exist
+
+
+class TestProbeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.cache_file = os.path.join(self.workdir, "cache", "probes.json")
+        self.dep = os.path.join(self.workdir, "dep")
+        self.calls = []
+
+        open(self.dep, "w").write("\n")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def probe(self):
+        self.calls.append(1)
+        return "value"
+
+    def test_00_get__cached(self):
+        cache = ProbeCache(self.cache_file)
+
+        self.assertEquals(cache.get("a", self.probe, [self.dep]), "value")
+        self.assertEquals(cache.get("a", self.probe, [self.dep]), "value")
+        self.assertTrue(os.path.exists(self.cache_file))
+
+        # Another process loads it from the file.
+        cache = ProbeCache(self.cache_file)
+        self.assertEquals(cache.get("a", self.probe, [self.dep]), "value")
+        self.assertEquals(len(self.calls), 1)
+
+    def test_10_get__dep_modified(self):
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        os.utime(self.dep, (1, 1))
+
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        self.assertEquals(len(self.calls), 2)
+
+    def test_20_get__dep_removed(self):
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        os.remove(self.dep)
+
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        self.assertEquals(len(self.calls), 2)
+
+    def test_30_get__broken_cache_file(self):
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        open(self.cache_file, "w").write("broken")
+
+        ProbeCache(self.cache_file).get("a", self.probe, [self.dep])
+        self.assertEquals(len(self.calls), 2)
+
+    def test_40_probed__no_cache(self):
+        try:
+            set_probe_cache(None)
+            probed("a", self.probe)
+            probed("a", self.probe)
+            self.assertEquals(len(self.calls), 2)
+        finally:
+            set_probe_cache(PROBE_CACHE_FILE)
+
 
 # vim:sw=4:ts=4:et:
@@ -0,0 +1,144 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.backend.tests.common import BackendTester
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.journal as J
+import pmaker.models.FileObjects as FO
+
+import os
+import os.path
+import unittest
+
+
+class Test_00_Journal(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.path = os.path.join(self.workdir, "a.journal")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_record_and_load(self):
+        with J.Journal(self.path) as journal:
+            journal.record("/a", "x")
+            journal.record("/b", "y")
+            journal.record("/a", "z")
+
+            self.assertTrue(journal.done("/a", "z"))
+
+        journal = J.Journal(self.path)
+
+        self.assertEquals(len(journal), 2)
+        self.assertTrue(journal.done("/a", "z"))
+        self.assertFalse(journal.done("/b", "x"))
+        self.assertFalse(journal.done("/c", None))
+
+    def test_10_load__broken_record(self):
+        open(self.path, "w").write('["/a", "x"]\n["/b", "y')
+
+        self.assertEquals(J.Journal.load(self.path), {"/a": "x"})
+
+    def test_20_signature(self):
+        fo = FO.FileObject("/etc/hosts", "0644", checksum="abc")
+        sig = J.signature(fo)
+
+        self.assertEquals(sig, J.signature(FO.FileObject("/etc/hosts", "0644",
+                                                         checksum="abc")))
+        fo.mode = "0600"
+        self.assertNotEquals(sig, J.signature(fo))
+
+    def test_30_file_size(self):
+        open(self.path, "w").write("abc")
+
+        self.assertEquals(J.file_size(self.path), 3)
+        self.assertTrue(J.file_size(self.workdir) is None)
+        self.assertTrue(J.file_size(self.path + ".not_exist") is None)
+
+
+class Test_10_resume_setup(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+        self.listfile = os.path.join(self.workdir, "files.list")
+        open(self.listfile, "w").write("/etc/hosts\n/etc/resolv.conf\n")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_resume(self):
+        tester = BackendTester(self.workdir, self.listfile, "setup")
+        self.assertTrue(tester.try_run())
+
+        backend = tester.backend
+        hosts = os.path.join(backend.srcdir, "etc", "hosts")
+        resolv = os.path.join(backend.srcdir, "etc", "resolv.conf")
+
+        # Simulate setup interrupted after /etc/hosts was copied and
+        # /etc/resolv.conf was partially copied.
+        os.remove(backend.marker_path({"name": "setup"}))
+        lines = open(backend.journal_path("setup")).readlines()
+        open(backend.journal_path("setup"), "w").writelines(
+            l for l in lines if "resolv.conf" not in l
+        )
+        os.utime(hosts, (0, 0))
+        os.chmod(resolv, 0600)
+        open(resolv, "w").write("partial")
+
+        tester = BackendTester(self.workdir, self.listfile, "setup")
+        self.assertTrue(tester.try_run())
+
+        self.assertEquals(os.stat(hosts).st_mtime, 0)  # Not copied again.
+        self.assertEquals(open(resolv).read(), open("/etc/resolv.conf").read())
+
+    def test_10_resume__truncated(self):
+        tester = BackendTester(self.workdir, self.listfile, "setup")
+        self.assertTrue(tester.try_run())
+
+        backend = tester.backend
+        hosts = os.path.join(backend.srcdir, "etc", "hosts")
+
+        # Simulate the host stopped before /etc/hosts copied was synced
+        # although the record of it was synced.
+        os.remove(backend.marker_path({"name": "setup"}))
+        os.chmod(hosts, 0600)
+        open(hosts, "w").close()
+
+        tester = BackendTester(self.workdir, self.listfile, "setup")
+        self.assertTrue(tester.try_run())
+
+        self.assertEquals(open(hosts).read(), open("/etc/hosts").read())
+
+    def test_20_record__synced(self):
+        synced = []
+        orig = J.fsync
+        J.fsync = synced.append
+        try:
+            with J.Journal(os.path.join(self.workdir, "a.journal"),
+                           2) as journal:
+                journal.record("/a", "x", "/a")
+                self.assertEquals(synced, [])
+
+                journal.record("/b", "y")
+                self.assertEquals(synced, ["/a"])
+        finally:
+            J.fsync = orig
+
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,97 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir, TOPDIR
+
+import pmaker.collectors.FilelistCollectors as Collectors
+import pmaker.multiformat as M
+import pmaker.options as O
+import pmaker.pkgdata as P
+
+import glob
+import os
+import os.path
+import unittest
+
+
+class Test_00_run(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+        self.listfile = os.path.join(self.workdir, "files.list")
+        open(self.listfile, "w").write("/etc/hosts\n/etc/resolv.conf\n")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_run(self):
+        argv = ["-n", "foo", "-w", self.workdir, "--template-path",
+                os.path.join(TOPDIR, "templates"), "--drivers",
+                "native.tgz,native.deb", self.listfile]
+        (opts, args) = O.Options().parse_args(argv)
+
+        self.assertEquals(opts.drivers, ["native.tgz", "native.deb"])
+
+        fs = Collectors.map().get(opts.input_type)(args[0], opts).collect()
+        pkgdata = P.PkgData(opts, fs)
+
+        results = M.run(pkgdata, opts.drivers)
+
+        self.assertEquals([(r.driver, r.rc) for r in results],
+                          [("native.tgz", 0), ("native.deb", 0)])
+
+        srcfile = os.path.join(pkgdata.srcdir, "etc", "hosts")
+        for r in results:
+            self.assertEquals(r.workdir,
+                              os.path.join(pkgdata.workdir, r.driver))
+
+            # Files are copied once and hardlinked into srcdir of drivers.
+            f = os.path.join(r.workdir, "src", "etc", "hosts")
+            self.assertEquals(os.stat(f).st_ino, os.stat(srcfile).st_ino)
+
+        self.assertTrue(glob.glob(os.path.join(results[0].workdir,
+                                               "foo-*.tar.*")))
+        self.assertTrue(glob.glob(os.path.join(results[1].workdir,
+                                               "foo_*.deb")))
+
+    def test_10_run__rpm_and_others(self):
+        argv = ["-n", "foo", "-w", self.workdir, "--template-path",
+                os.path.join(TOPDIR, "templates"), "--driver", "native.tgz",
+                "--drivers", "native.tgz,autotools.single.rpm", "--stepto",
+                "preconfigure", "--no-rpmdb", self.listfile]
+        (opts, args) = O.Options().parse_args(argv)
+
+        fs = Collectors.map().get(opts.input_type)(args[0], opts).collect()
+
+        # Files are collected for the rpm driver although --driver is not.
+        self.assertTrue(all("rpm_attr" in f for f in fs))
+
+        pkgdata = P.PkgData(opts, fs)
+        results = M.run(pkgdata, opts.drivers)
+
+        self.assertEquals([(r.driver, r.rc) for r in results],
+                          [("native.tgz", 0), ("autotools.single.rpm", 0)])
+
+        (tgz, rpm) = [os.listdir(r.workdir) for r in results]
+
+        self.assertTrue("foo.spec" in rpm)
+        self.assertTrue("rpm.mk" in rpm)
+        self.assertFalse("foo.spec" in tgz)
+        self.assertFalse("rpm.mk" in tgz)
+
+
+# vim:sw=4:ts=4:et:
@@ -17,6 +17,7 @@
 from pmaker.rpmutils import *
 from pmaker.utils import checksum
 from pmaker.models.FileObjects import FileObject, DirObject
+from pmaker.tests.common import setup_workdir, cleanup_workdir
 
 import os
 import os.path
@@ -131,6 +132,45 @@ class TestFunctions(unittest.TestCase):
         d = rpm_search_provides_by_path("/bin/bash")
         self.assertNotEquals(d, NULL_DICT)
 
+    def test_index(self):
+        bash = "/usr/bin/bash" if os.path.islink("/bin") else "/bin/bash"
+        idx = index()
+
+        self.assertTrue(idx is index())  # Built only once.
+
+        d = idx.info(bash)
+        self.assertNotEquals(d, NULL_DICT)
+
+        for key in ("path", "mode", "uid", "gid", "checksum"):
+            self.assertTrue(key in d)
+
+        d_ref = info_by_path(bash)
+        self.assertEquals(sorted(d.items()),
+                          sorted((k, v) for k, v in d_ref.items() if k in d))
+        self.assertEquals(idx.owner("/bin/bash")["name"], "bash")
+
+    def test_index__not_owned(self):
+        self.assertEquals(index().info("/a/b/c/not_exist"), NULL_DICT)
+        self.assertEquals(index().owner("/a/b/c/not_exist"), NULL_DICT)
+
+    def test_persistent_index(self):
+        bash = "/usr/bin/bash" if os.path.islink("/bin") else "/bin/bash"
+        workdir = setup_workdir()
+        try:
+            cache_file = os.path.join(workdir, "cache", "rpmdb.db")
+            idx = PersistentRpmDbIndex(cache_file=cache_file)
+
+            self.assertTrue(os.path.exists(cache_file))
+            self.assertEquals(idx.info(bash), index().info(bash))
+            self.assertEquals(idx.owner(bash)["name"], "bash")
+            self.assertEquals(idx.owner("/a/b/c/not_exist"), NULL_DICT)
+
+            # Loaded from the cache as rpmdb is not changed.
+            idx2 = PersistentRpmDbIndex(cache_file=cache_file)
+            self.assertEquals(idx2.owner(bash), idx.owner(bash))
+        finally:
+            cleanup_workdir(workdir)
+
     def test_rpm_attr(self):
         fi = FileObject("/dummy/path", "0664")
         self.assertEquals(rpm_attr(fi), "%attr(0664, -, -) ")
@@ -0,0 +1,75 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.copier as C
+import pmaker.shell as S
+import pmaker.stats as ST
+
+import os.path
+import unittest
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_measure(self):
+        src = os.path.join(self.workdir, "src.txt")
+        open(src, "w").write("0123456789")
+
+        start = ST.snapshot()
+
+        S.run("true", self.workdir)
+        C.copy(src, os.path.join(self.workdir, "dst.txt"))
+
+        st = ST.measure("setup", start)
+
+        self.assertEquals(st.step, "setup")
+        self.assertEquals(st.processes, 1)
+        self.assertEquals(st.files, 1)
+        self.assertEquals(st.bytes, 10)
+        self.assertTrue(st.wall >= 0)
+        self.assertTrue(st.maxrss > 0)
+
+    def test_10_save_and_load(self):
+        path = os.path.join(self.workdir, "pmaker-stats.json")
+        self.assertEquals(ST.load(path), [])
+
+        stats = ST.update([], ST.measure("setup", ST.snapshot()))
+        stats = ST.update(stats, ST.measure("build", ST.snapshot()))
+        stats = ST.update(stats, ST.measure("setup", ST.snapshot()))
+
+        self.assertEquals([st.step for st in stats], ["build", "setup"])
+
+        ST.save(stats, path)
+        self.assertEquals(ST.load(path), stats)
+
+    def test_20_summary(self):
+        stats = [ST.measure(s, ST.snapshot()) for s in ("setup", "build")]
+        lines = ST.summary(stats).splitlines()
+
+        self.assertEquals(len(lines), 4)
+        self.assertEquals([l.split()[0] for l in lines],
+                          ["step", "setup", "build", "total"])
+
+
+# vim:sw=4:ts=4:et:
@@ -58,4 +58,141 @@ class Test_10(unittest.TestCase):
         tmpl = TT.find_template(tmplname, [self.workdir])
         self.assertTrue(tmpl is not None)
 
+
+class Test_20_CompiledTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.cachedir = os.path.join(self.workdir, "cache")
+        self.template = os.path.join(self.workdir, "a.tmpl")
+
+        open(self.template, "w").write("#{a}\n")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def engine(self, cachedir=None, fallbacks=()):
+        cache = TT.CompiledTemplateCache(cachedir or self.cachedir, fallbacks)
+        return TT.tenjin.Engine(cache=cache)
+
+    def cache_files(self, cachedir=None):
+        return os.listdir(cachedir or self.cachedir)
+
+    def test_00_compile__saved_and_reused(self):
+        self.assertEquals(TT.compile(self.template, {"a": 1},
+                                     engine=self.engine()), "1\n")
+        self.assertEquals(len(self.cache_files()), 1)
+
+        # Another engine, i.e. another process, loads it from the cache.
+        engine = self.engine()
+        dct = engine.cache._load(self.template + ".cache")
+
+        self.assertTrue(dct["bytecode"] is not None)
+        self.assertEquals(dct["timestamp"], os.path.getmtime(self.template))
+        self.assertEquals(TT.compile(self.template, {"a": 2}, engine=engine),
+                          "2\n")
+
+    def test_10_compile__template_modified(self):
+        TT.compile(self.template, {"a": 1}, engine=self.engine())
+
+        open(self.template, "w").write("#{a}#{a}\n")
+        os.utime(self.template, (1, 1))
+
+        self.assertEquals(TT.compile(self.template, {"a": 1},
+                                     engine=self.engine()), "11\n")
+
+    def test_20_compile__broken_cache(self):
+        TT.compile(self.template, {"a": 1}, engine=self.engine())
+
+        for f in self.cache_files():
+            open(os.path.join(self.cachedir, f), "w").write("broken")
+
+        self.assertEquals(TT.compile(self.template, {"a": 1},
+                                     engine=self.engine()), "1\n")
+
+    def test_30_precompile__fallbacks(self):
+        syscachedir = os.path.join(self.workdir, "syscache")
+
+        self.assertEquals(TT.precompile([self.workdir], syscachedir),
+                          [self.template])
+
+        engine = self.engine(fallbacks=[syscachedir])
+        cache_file = engine.cache.cache_file(self.template + ".cache",
+                                             syscachedir)
+        self.assertTrue(engine.cache._load(self.template + ".cache"))
+        self.assertTrue(os.path.exists(cache_file))
+
+        self.assertEquals(TT.compile(self.template, {"a": 1}, engine=engine),
+                          "1\n")
+        self.assertFalse(os.path.exists(self.cachedir))
+
+    def test_40_enable_cache(self):
+        engine = TT.tenjin.Engine(cache=TT.tenjin.MemoryCacheStorage())
+
+        cache = TT.enable_cache(self.cachedir, engine=engine)
+        self.assertTrue(isinstance(engine.cache, TT.CompiledTemplateCache))
+        self.assertTrue(TT.enable_cache(self.cachedir, engine=engine) is cache)
+
+        TT.disable_cache(engine)
+        self.assertTrue(isinstance(engine.cache,
+                                   TT.tenjin.MemoryCacheStorage))
+
+
+class Test_30_render_to(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+        self.template = os.path.join(self.workdir, "a.tmpl")
+        self.output = os.path.join(self.workdir, "a.out")
+
+        open(self.template, "w").write("""\
+<?py for x in xs: ?>
+#{x}
+<?py #endfor ?>
+""")
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def test_00_render_to(self):
+        context = {"xs": range(3)}
+        TT.render_to(self.template, self.output, context)
+
+        self.assertEquals(open(self.output).read(), "0\n1\n2\n")
+        self.assertEquals(open(self.output).read(),
+                          TT.compile(self.template, context))
+
+    def test_10_render_to__written_in_chunks(self):
+        chunks = []
+
+        class Out(object):
+            def writelines(self, xs):
+                chunks.append(list(xs))
+
+        TT.StreamBuffer(Out()).extend(("a", "b"))
+        TT.render_to(self.template, self.output, {"xs": range(100)})
+
+        self.assertEquals(chunks, [["a", "b"]])
+        self.assertEquals(len(open(self.output).readlines()), 100)
+
+    def test_15_render_to__unchanged(self):
+        context = {"xs": range(3)}
+        self.assertTrue(TT.render_to(self.template, self.output, context))
+
+        os.utime(self.output, (0, 0))
+        self.assertFalse(TT.render_to(self.template, self.output, context))
+        self.assertEquals(os.stat(self.output).st_mtime, 0)
+        self.assertEquals(sorted(os.listdir(self.workdir)),
+                          ["a.out", "a.tmpl"])
+
+    def test_20_render_to__error(self):
+        open(self.output, "w").write("old\n")
+
+        self.assertRaises(NameError, TT.render_to, self.template,
+                          self.output, {})
+        self.assertEquals(open(self.output).read(), "old\n")
+        self.assertEquals(sorted(os.listdir(self.workdir)),
+                          ["a.out", "a.tmpl"])
+
+
 # vim:sw=4:ts=4:et:
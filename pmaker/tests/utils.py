@@ -58,9 +58,67 @@ class Test_singleton(unittest.TestCase):
 
 class TestMemoized(unittest.TestCase):
 
-    def test_memoized(self):
-        """test_memoized: FIXME: implement this"""
-        pass
+    def test_memoized__unhashable_args(self):
+        calls = []
+
+        @memoized
+        def f(xs):
+            calls.append(xs)
+            return len(xs)
+
+        self.assertEquals(f([1, 2]), 2)
+        self.assertEquals(f([1, 2]), 2)
+        self.assertEquals(len(calls), 2)
+        self.assertEquals(len(f.cache), 0)
+
+    def test_memoized__kwargs_and_invalidate(self):
+        calls = []
+
+        @memoized
+        def f(x, y=0):
+            calls.append((x, y))
+            return x + y
+
+        self.assertEquals(f(1, y=2), 3)
+        self.assertEquals(f(1, y=2), 3)
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(f.cache.stats(),
+                          dict(hits=1, misses=1, evictions=0, size=1))
+
+        f.invalidate(1, y=2)
+        f(1, y=2)
+        self.assertEquals(len(calls), 2)
+
+        f.cache_clear()
+        self.assertEquals(len(f.cache), 0)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_maxsize(self):
+        c = LRUCache(maxsize=3)
+
+        for i in range(10):
+            c.put(i, str(i))
+
+        self.assertEquals(list(c.entries.keys()), [7, 8, 9])
+        self.assertEquals(c.evictions, 7)
+
+    def test_maxbytes(self):
+        c = LRUCache(maxsize=None, maxbytes=10, sizeof=len)
+
+        c.put("a", "x" * 4)
+        c.put("b", "x" * 4)
+        c.get("a")
+        c.put("c", "x" * 4)  # "b" should be evicted.
+
+        self.assertTrue("a" in c)
+        self.assertFalse("b" in c)
+        self.assertEquals(c.nbytes, 8)
+
+        c.put("d", "x" * 20)  # Too large to keep with any others.
+        self.assertEquals(len(c), 0)
+        self.assertEquals(c.nbytes, 0)
 
 
 class TestChecksum(unittest.TestCase):
@@ -175,6 +233,59 @@ class TestUnique(unittest.TestCase):
                              ["a", "b", "c", "d", "e", "f", "g"])
 
 
+class TestIUnique(unittest.TestCase):
+
+    def test_iunique_empty(self):
+        self.assertListEqual(list(iunique([])), [])
+
+    def test_iunique_in_memory(self):
+        xs = [random.randint(0, 100) for _ in range(1000)]
+        self.assertListEqual(list(iunique(xs)), unique(xs))
+
+    def test_iunique_merge_runs(self):
+        xs = [random.randint(0, 100) for _ in range(1000)]
+        self.assertListEqual(list(iunique(iter(xs), bufsize=7)), unique(xs))
+
+    def test_iunique_merge_runs__stable(self):
+        xs = [(random.randint(0, 10), i) for i in range(100)]
+        key = lambda x: x[0]
+
+        self.assertListEqual(list(iunique(xs, key, 9)), sorted(xs, key=key))
+
+
+class Test_pmap(unittest.TestCase):
+
+    def test_pmap__serial(self):
+        self.assertListEqual(list(pmap(lambda x: x * 2, range(10))),
+                             [x * 2 for x in range(10)])
+
+    def test_pmap__parallel_keeps_order(self):
+        xs = [random.random() for _ in range(1000)]
+        self.assertListEqual(list(pmap(str, (x for x in xs), 4, 16)),
+                             [str(x) for x in xs])
+
+    def test_pmap__parallel_raise(self):
+        def f(x):
+            if x == 10:
+                raise ValueError("x=%d" % x)
+            return x
+
+        self.assertRaises(ValueError, list, pmap(f, range(100), 4))
+
+    def test_pmap__parallel_w_pool(self):
+        from multiprocessing.pool import ThreadPool
+
+        pool = ThreadPool(4)
+        try:
+            # The pool is not closed after calls and can be used again.
+            for _i in range(3):
+                self.assertListEqual(list(pmap(str, range(100), 4, 8, pool)),
+                                     [str(x) for x in range(100)])
+        finally:
+            pool.terminate()
+            pool.join()
+
+
 NULL_DICT = dict()
 
 
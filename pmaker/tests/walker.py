@@ -0,0 +1,105 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from pmaker.tests.common import setup_workdir, cleanup_workdir
+
+import pmaker.walker as W
+
+import os
+import os.path
+import unittest
+
+
+class TestWalker(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = setup_workdir()
+
+        for d in ("a/b/c", "a/d", "e"):
+            os.makedirs(os.path.join(self.workdir, d))
+
+        for f in ("a/f.txt", "a/b/c/g.txt", "a/d/h.log", "e/i.txt"):
+            open(os.path.join(self.workdir, f), "w").write(f + "\n")
+
+        os.symlink("a", os.path.join(self.workdir, "j"))
+
+    def tearDown(self):
+        cleanup_workdir(self.workdir)
+
+    def _paths(self, rs):
+        return [os.path.relpath(p, self.workdir) for p, st in rs]
+
+    def _key(self, rs):
+        # st_atime of dirs may be updated by reading them.
+        return [(p, st.st_ino, st.st_mode, st.st_mtime) for p, st in rs]
+
+    def test_00_walk(self):
+        rs = list(W.walk(self.workdir))
+        paths_ref = sorted(os.path.relpath(os.path.join(d, f), self.workdir)
+                           for d, ds, fs in os.walk(self.workdir)
+                           for f in ds + fs)
+
+        self.assertEquals(sorted(self._paths(rs)), ["."] + paths_ref)
+
+        self.assertEquals(self._key(rs),
+                          self._key((p, os.lstat(p)) for p, _st in rs))
+
+    def test_01_walk__parallel(self):
+        self.assertEquals(self._key(W.walk(self.workdir, jobs=4)),
+                          self._key(W.walk(self.workdir)))
+
+    def test_01_walk__parallel__one_pool(self):
+        (pools, orig) = ([], W.ThreadPool)
+
+        class Pool(orig):
+            def __init__(self, *args, **kwargs):
+                orig.__init__(self, *args, **kwargs)
+                pools.append(self)
+
+        W.ThreadPool = Pool
+        try:
+            rs = list(W.walk(self.workdir, jobs=4))
+        finally:
+            W.ThreadPool = orig
+
+        self.assertEquals(len(rs), len(list(W.walk(self.workdir))))
+        self.assertEquals(len(pools), 1)
+
+    def test_02_walk__not_follow_symlinks(self):
+        paths = self._paths(W.walk(self.workdir))
+
+        self.assertTrue("j" in paths)
+        self.assertFalse(any(p.startswith("j/") for p in paths))
+
+    def test_03_walk__includes(self):
+        rs = W.walk(self.workdir, includes=["*.txt"])
+        self.assertEquals(self._paths(rs), ["a/f.txt", "e/i.txt",
+                                            "a/b/c/g.txt"])
+
+    def test_04_walk__excludes(self):
+        excludes = ["*.log", os.path.join(self.workdir, "a/b")]
+        paths = self._paths(W.walk(self.workdir, excludes=excludes))
+
+        self.assertEquals(sorted(paths),
+                          [".", "a", "a/d", "a/f.txt", "e", "e/i.txt", "j"])
+
+    def test_05_walk__file(self):
+        path = os.path.join(self.workdir, "a/f.txt")
+        self.assertEquals(self._key(W.walk(path)),
+                          self._key([(path, os.lstat(path))]))
+
+
+# vim:sw=4:ts=4:et:
@@ -18,9 +18,13 @@
 import pmaker.globals as G
 import pmaker.models.Bunch as B
 
+import cPickle as pickle
+import collections
 import copy
 import datetime
 import glob
+import heapq
+import importlib
 import itertools
 import locale
 import logging
@@ -28,7 +32,9 @@ import operator
 import os
 import re
 import stat
-import urllib2
+import sys
+import tempfile
+import threading
 
 
 try:
@@ -125,59 +131,195 @@ def dicts_comp(lhs, rhs, keys=None, strict=False):
         return lhs == rhs
 
 
-def memoize(fn):
-    """memoization decorator.
+# Default max number of results of a function memoize() keeps:
+MEMOIZE_MAXSIZE = 128
+
+# Caches of functions decorated with memoize(): [(name, LRUCache)]
+_MEMO_CACHES = []
+
+
+class LRUCache(object):
     """
-    cache = {}
+    Mapping bounded in the number of entries and optionally the total size of
+    values, evicts least recently used entries to keep them in the bounds.
 
-    def wrapped(*args, **kwargs):
-        key = repr(args) + repr(kwargs)
-        if key not in cache:
-            cache[key] = fn(*args, **kwargs)
+    >>> c = LRUCache(2)
+    >>> c.put("a", 1); c.put("b", 2); c.get("a")
+    1
+    >>> c.put("c", 3); c.get("b") is None  # "b" was least recently used.
+    True
+    >>> sorted(c.stats().items())
+    [('evictions', 1), ('hits', 1), ('misses', 1), ('size', 2)]
+    """
 
-        return cache[key]
+    def __init__(self, maxsize=MEMOIZE_MAXSIZE, maxbytes=None,
+                 sizeof=sys.getsizeof):
+        """
+        :param maxsize: Max number of entries or None (unbounded)
+        :param maxbytes: Max total size of values in bytes or None
+        :param sizeof: Function to estimate the size of values
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.entries = collections.OrderedDict()  # {key: (value, size)}
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                entry = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.entries[key] = entry  # Make it the most recently used.
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+            self.entries[key] = (value, size)
+            self.nbytes += size
+
+            while self.entries and (
+                (self.maxsize is not None and
+                 len(self.entries) > self.maxsize) or
+                (self.maxbytes is not None and self.nbytes > self.maxbytes)
+            ):
+                (_key, (_value, size)) = self.entries.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Remove the entry of key if it exists.
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
 
-    return wrapped
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, size=len(self.entries))
 
 
-class memoized(object):
-    """Decorator that caches a function's return value each time it is called.
-    If called later with the same arguments, the cached value is returned, and
-    not re-evaluated.
+_KWARGS_MARK = object()
 
-    Originally came from
-    http://wiki.python.org/moin/PythonDecoratorLibrary#Memoize.
+
+def _memo_key(args, kwargs):
+    """
+    :return: Hashable key made from arguments or None if any of them is not
+        hashable
     """
-    def __init__(self, func):
-        self.func = func
-        self.cache = {}
+    key = args + (_KWARGS_MARK, ) + tuple(sorted(kwargs.items())) \
+        if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        return None
 
-    def __call__(self, *args):
-        try:
-            return self.cache[args]
+    return key
 
-        except KeyError:
-            value = self.func(*args)
-            self.cache[args] = value
-            return value
 
-        except TypeError:
-            # uncachable -- for instance, passing a list as an argument.
-            # Better to not cache than to blow up entirely.
-            return self.func(*args)
+def memoize(fn=None, maxsize=MEMOIZE_MAXSIZE, maxbytes=None):
+    """memoization decorator keeps results in a LRUCache.
 
-    def __repr__(self):
-        """Return the function's docstring.
-        """
-        return self.func.__doc__
+    Results are looked up with arguments as is, so that results of calls with
+    unhashable arguments, e.g. lists, are not cached at all.
 
-    def __get__(self, obj, objtype):
-        """Support instance methods.
-        """
-        return curry(self.__call__, obj)
+    The decorated function has some attributes to control the cache:
+
+        * cache: LRUCache object keeps results
+        * invalidate(*args, **kwargs): Forget the result of the call
+        * cache_clear(): Forget all results
+
+    >>> @memoize
+    ... def f(x):
+    ...     return [x]
+    >>> f(1) is f(1)
+    True
+    >>> f.invalidate(1)
+    >>> f.cache.stats()["size"]
+    0
+    >>> @memoize(maxsize=1)
+    ... def g(x):
+    ...     return [x]
+    >>> (a, b) = (g(1), g(2))
+    >>> g(1) is a
+    False
+    """
+    if fn is None:
+        return lambda f: memoize(f, maxsize, maxbytes)
+
+    cache = LRUCache(maxsize, maxbytes)
+    missing = object()
+
+    def wrapped(*args, **kwargs):
+        key = _memo_key(args, kwargs)
+        if key is None:
+            return fn(*args, **kwargs)
+
+        ret = cache.get(key, missing)
+        if ret is missing:
+            ret = fn(*args, **kwargs)
+            cache.put(key, ret)
+
+        return ret
+
+    wrapped.cache = cache
+    wrapped.invalidate = \
+        lambda *args, **kwargs: cache.invalidate(_memo_key(args, kwargs))
+    wrapped.cache_clear = cache.clear
+    wrapped.__name__ = fn.__name__
+    wrapped.__doc__ = fn.__doc__
+    wrapped.__module__ = fn.__module__
+
+    _MEMO_CACHES.append(("%s.%s" % (fn.__module__, fn.__name__), cache))
+
+    return wrapped
+
+
+# Kept for backward compatibility.
+memoized = memoize
+
+
+def memo_stats():
+    """
+    :return: List of Bunch objects hold statistics of caches of memoized
+        functions called at least once
+    """
+    return [B.Bunch(name=name, **cache.stats()) for name, cache in
+            _MEMO_CACHES if cache.hits or cache.misses]
+
+
+def clear_memo_caches():
+    """
+    Forget results of all memoized functions.
+    """
+    for _name, cache in _MEMO_CACHES:
+        cache.clear()
 
 
-@memoize
 def checksum(filepath="", algo=sha1, buffsize=8192):
     """compute and check md5 or sha1 message digest of given file path.
 
@@ -238,7 +380,6 @@ def listplus(list_lhs, foldable_rhs):
     return list_lhs + list(foldable_rhs)
 
 
-@memoize
 def flatten(xss):
     """
     >>> flatten([])
@@ -259,7 +400,7 @@ def flatten(xss):
     [0, 0, 1, 2, 2, 4, 3, 6, 4, 8]
     """
     if is_foldable(xss):
-        return foldl(operator.add, (flatten(xs) for xs in xss), [])
+        return concat(flatten(xs) for xs in xss)
     else:
         return [xss]
 
@@ -283,10 +424,19 @@ def concat(xss):
     """
     assert is_foldable(xss)
 
-    return foldl(listplus, (xs for xs in xss), [])
+    return list(iconcat(xss))
+
+
+def iconcat(xss):
+    """
+    Lazy version of concat.
+
+    >>> list(iconcat([[1,2,3],[4,5]]))
+    [1, 2, 3, 4, 5]
+    """
+    return itertools.chain.from_iterable(xss)
 
 
-@memoize
 def unique(xs, cmp=cmp, key=None):
     """Returns new sorted list of no duplicated items.
 
@@ -313,10 +463,240 @@ def unique(xs, cmp=cmp, key=None):
     return ret
 
 
+def _save_run(ys, proto=pickle.HIGHEST_PROTOCOL):
+    """
+    Save sorted items to a temporary file and returns it.
+    """
+    f = tempfile.TemporaryFile(prefix="pmaker-run-")
+
+    for y in ys:
+        pickle.dump(y, f, proto)
+
+    f.seek(0)
+    return f
+
+
+def _load_run(f):
+    try:
+        while True:
+            yield pickle.load(f)
+    except EOFError:
+        f.close()
+
+
+def _uniq_sorted(ys):
+    ys = iter(ys)
+    try:
+        prev = ys.next()
+    except StopIteration:
+        return
+
+    yield prev
+
+    for y in ys:
+        if y == prev:
+            continue
+
+        prev = y
+        yield y
+
+
+def iunique(xs, key=None, bufsize=100000):
+    """
+    Streaming version of unique: Yield sorted items of xs w/o duplicates.
+
+    At most $bufsize items are kept in memory. If xs has more items than that,
+    items are sorted in runs saved in temporary files and these are merged.
+    Items must be picklable in that case.
+
+    :param xs: Foldable (list, tuple, generator, etc.) of items
+    :param key: Key function to sort items
+    :param bufsize: Max number of items to sort in memory
+
+    >>> list(iunique([]))
+    []
+    >>> list(iunique([0, 3, 1, 2, 1, 0, 4, 5], bufsize=3))
+    [0, 1, 2, 3, 4, 5]
+    >>> list(iunique((c for c in "dagcbfefagb"), bufsize=2))
+    ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+    """
+    if key is None:
+        key = lambda x: x
+
+    xs = iter(xs)
+    runs = []
+
+    while True:
+        chunk = list(itertools.islice(xs, bufsize))
+
+        if not chunk:
+            break
+
+        chunk.sort(key=key)
+
+        if not runs and len(chunk) < bufsize:  # All items fit in memory.
+            for y in _uniq_sorted(chunk):
+                yield y
+            return
+
+        runs.append(_save_run(chunk))
+
+    # Tie-breakers (index of runs and items) keep the sort stable.
+    def decorate(i, f):
+        return ((key(y), i, j, y) for j, y in enumerate(_load_run(f)))
+
+    decorated = [decorate(i, f) for i, f in enumerate(runs)]
+
+    for y in _uniq_sorted(t[-1] for t in heapq.merge(*decorated)):
+        yield y
+
+
+def pmap(fn, xs, jobs=1, chunksize=64, pool=None):
+    """
+    Parallel version of itertools.imap: Apply fn to each item of xs with using
+    a pool of $jobs worker threads and yield results in the order of xs.
+
+    Items of xs are consumed in chunks so that memory usage is kept bounded
+    even if xs is a huge generator.
+
+    :param fn: Function to apply, must be thread-safe
+    :param xs: Foldable (list, tuple, generator, etc.) of inputs
+    :param jobs: Number of worker threads. Run serially if jobs < 2.
+    :param chunksize: Number of items passed to each worker at once
+    :param pool: Pool of $jobs worker threads to use instead of making one in
+        each call, e.g. to call this many times. It's not closed after the
+        call and the caller must close it
+
+    >>> list(pmap(lambda x: x * 2, range(5)))
+    [0, 2, 4, 6, 8]
+    >>> list(pmap(lambda x: x * 2, (x for x in range(200)), 4, 8))[-3:]
+    [394, 396, 398]
+    """
+    if jobs < 2:
+        for x in xs:
+            yield fn(x)
+        return
+
+    own_pool = pool is None
+    if own_pool:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(jobs)
+
+    xs = iter(xs)
+
+    try:
+        while True:
+            chunk = list(itertools.islice(xs, jobs * chunksize))
+            if not chunk:
+                break
+
+            for y in pool.map(fn, chunk, chunksize):
+                yield y
+    finally:
+        if own_pool:
+            pool.terminate()
+            pool.join()
+
+
+def get_attr(obj, name, default=None):
+    """
+    getattr() works with Bunch objects raise KeyError for missing attributes.
+
+    >>> get_attr(B.Bunch(a=1), "a")
+    1
+    >>> get_attr(B.Bunch(), "a", 2)
+    2
+    """
+    try:
+        return getattr(obj, name, default)
+    except KeyError:
+        return default
+
+
+class Counter(object):
+    """
+    Thread-safe counters of events.
+
+    >>> c = Counter()
+    >>> c.incr("a"); c.incr("a"); c.incr("b", 3)
+    >>> (c.get("a"), c.get("b"), c.get("c"), c.total())
+    (2, 3, 0, 5)
+    >>> c.reset(); c.total()
+    0
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict()
+
+    def incr(self, name, n=1):
+        self._lock.acquire()
+        try:
+            self._counts[name] = self._counts.get(name, 0) + n
+        finally:
+            self._lock.release()
+
+    def get(self, name):
+        return self._counts.get(name, 0)
+
+    def total(self):
+        return sum(self._counts.values())
+
+    def items(self):
+        return sorted(self._counts.items())
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._counts = dict()
+        finally:
+            self._lock.release()
+
+
 def true(x):
     return True
 
 
+class LazyModule(object):
+    """
+    Proxy of the module imported on the first access to its attributes, to
+    defer loading heavy modules until these are actually needed.
+
+    >>> sh = LazyModule("shlex")
+    >>> sh.split("a b")
+    ['a', 'b']
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attr):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+
+        return getattr(self.__module, attr)
+
+
+@memoize
+def try_import(*names):
+    """
+    :param names: Names of modules to try importing in order
+    :return: The module imported first or None if none of them are available
+
+    >>> try_import("not_existing_module_xyz", "shlex").__name__
+    'shlex'
+    >>> try_import("not_existing_module_xyz")
+    """
+    for name in names:
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            pass
+
+    return None
+
+
 def singleton(cls):
     instances = dict()
 
@@ -497,6 +877,10 @@ def conflicts_dirs(pname):
     return (G.CONFLICTS_SAVEDIR % p, G.CONFLICTS_NEWDIR % p)
 
 
+# Used only when fetching files from remote.
+urllib2 = LazyModule("urllib2")
+
+
 def urlread(url, data=None, headers={}):
     """
     Open given url and returns its contents or None.
@@ -0,0 +1,195 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pmaker.utils as U
+
+import fnmatch
+import logging
+import os
+import os.path
+import stat
+
+from multiprocessing.pool import ThreadPool
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        logging.info("scandir module is not available. Use os.listdir.")
+        scandir = None
+
+
+# Type of dir entries not known from readdir(3) (d_type):
+DT_UNKNOWN = None
+
+
+def match(path, patterns):
+    """
+    :param path: File path
+    :param patterns: A list of glob patterns to match with the path or the
+        basename of the path
+
+    >>> match("/a/b/c.pyc", ["*.pyc"])
+    True
+    >>> match("/a/b/c.pyc", ["/a/b/*"])
+    True
+    >>> match("/a/b/c.py", ["*.pyc", "/a/c/*"])
+    False
+    """
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(path, p)
+               for p in patterns)
+
+
+def _entries(dirpath):
+    """
+    List entries in given dir.
+
+    :return: A list of (path, is_dir, entry) where is_dir is a bool or
+        DT_UNKNOWN and entry is a DirEntry object caches the stat result or
+        None if scandir is not available
+    """
+    if scandir is None:
+        return [(os.path.join(dirpath, x), DT_UNKNOWN, None) for x in
+                sorted(os.listdir(dirpath))]
+
+    entries = []
+    for e in scandir(dirpath):
+        try:
+            # d_type is used if available and it does not stat the entry.
+            is_dir = e.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = DT_UNKNOWN
+
+        entries.append((e.path, is_dir, e))
+
+    return sorted(entries)
+
+
+def _lstat(path, entry=None):
+    try:
+        if entry is None:
+            return os.lstat(path)
+        else:
+            return entry.stat(follow_symlinks=False)  # Cached in entry.
+    except OSError, e:
+        logging.warn(e)
+        return None
+
+
+class Walker(object):
+    """
+    Walk dir trees and list files and dirs in them with their stat results.
+
+    Dirs at the same depth are read in parallel with worker threads. Entries
+    excluded are never stat-ed and excluded dirs are not walked into. Dirs
+    are walked into w/o stat-ing them if the types of entries are known from
+    d_type and they are not collected.
+    """
+
+    def __init__(self, includes=[], excludes=[], jobs=1):
+        """
+        :param includes: Glob patterns of files and dirs to collect. All are
+            collected if empty
+        :param excludes: Glob patterns of files and dirs not to collect and
+            not to walk into
+        :param jobs: Number of worker threads to read dirs
+        """
+        self.includes = includes
+        self.excludes = excludes
+        self.jobs = jobs
+
+    def _is_included(self, path):
+        return not self.includes or match(path, self.includes)
+
+    def _read(self, dirpath):
+        """
+        :return: A tuple of ([(path, st)], [subdir])
+        """
+        (results, subdirs) = ([], [])
+
+        try:
+            entries = _entries(dirpath)
+        except OSError, e:
+            logging.warn(e)
+            return (results, subdirs)
+
+        for path, is_dir, entry in entries:
+            if self.excludes and match(path, self.excludes):
+                continue
+
+            if is_dir is DT_UNKNOWN or self._is_included(path):
+                st = _lstat(path, entry)
+                if st is None:
+                    continue
+
+                is_dir = stat.S_ISDIR(st.st_mode)
+
+                if self._is_included(path):
+                    results.append((path, st))
+
+            if is_dir:
+                subdirs.append(path)
+
+        return (results, subdirs)
+
+    def walk(self, top):
+        """
+        Walk the dir tree from top and yield (path, stat result) of files and
+        dirs in it. Paths are yielded in order of depth and then path.
+
+        :param top: Top dir of the tree
+        """
+        top = os.path.normpath(top)
+        st = _lstat(top)
+
+        if st is None:
+            return
+
+        if self._is_included(top):
+            yield (top, st)
+
+        if not os.path.isdir(top):
+            return
+
+        # Worker threads are started once and used for all depths.
+        pool = ThreadPool(self.jobs) if self.jobs > 1 else None
+        try:
+            dirs = [top]
+            while dirs:
+                rs = U.pmap(self._read, dirs, self.jobs, 1, pool)
+                dirs = []
+
+                for results, subdirs in rs:
+                    for r in results:
+                        yield r
+                    dirs += subdirs
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+
+def walk(top, includes=[], excludes=[], jobs=1):
+    """
+    Walk the dir tree from top. See Walker.walk.
+    """
+    return Walker(includes, excludes, jobs).walk(top)
+
+
+# vim:sw=4:ts=4:et:
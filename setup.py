@@ -48,6 +48,7 @@ data_files = [
                               "templates/1/autotools/debian",
                               "templates/1/autotools.single",
                               "templates/1/buildrpm",
+                              "templates/1/native/debian",
                              )
 ]
 
@@ -147,6 +148,8 @@ setup(name=PACKAGE,
         "pmaker.backend.autotools.single.tests",
         "pmaker.backend.buildrpm",
         "pmaker.backend.buildrpm.tests",
+        "pmaker.backend.native",
+        "pmaker.backend.native.tests",
         "pmaker.backend.tests",
         "pmaker.collectors",
         "pmaker.collectors.tests",
@@ -157,7 +160,7 @@ setup(name=PACKAGE,
     ],
     scripts=[
         "tools/pmaker",
-        "tools/pmaker"
+        "tools/pmaker-batch",
     ],
     data_files=data_files,
     cmdclass={
@@ -0,0 +1,231 @@
+#
+# Benchmark pmaker with synthetic trees of files.
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Usage: PYTHONPATH=. python tests/bench/run.py [OPTION ...]
+#
+import tests.bench.tree as T
+
+import pmaker.backend.registry as Backends
+import pmaker.checksumcache as CC
+import pmaker.collectors.FilelistCollectors as Collectors
+import pmaker.globals as G
+import pmaker.options as O
+import pmaker.pkgdata as P
+import pmaker.stats as ST
+import pmaker.tests.common as C
+import pmaker.utils as U
+
+import datetime
+import json
+import logging
+import multiprocessing
+import optparse
+import os
+import os.path
+import platform
+import sys
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_SIZES = "1000,10000"
+
+# Packaging steps run to build packages:
+BUILD_STEPS = ("configure", "sbuild", "build")
+
+
+def measure(name, fn, results, size):
+    """
+    Run fn and append its resource usage to results.
+    """
+    start = ST.snapshot()
+    ret = fn()
+
+    st = ST.measure(name, start)
+    st.size = size
+    results.append(st)
+
+    logging.info("%s: %d files: %.2f sec" % (name, size, st.wall))
+    return ret
+
+
+def collect(name, listfile, opts, results, size):
+    """
+    Collect files and append resource usage and hits and misses of the
+    checksum cache to results.
+    """
+    fn = lambda: Collectors.FilelistCollector(listfile, opts).collect()
+    fs = measure(name, fn, results, size)
+
+    st = CC.stats()
+    if st:
+        results[-1].checksum_hits = st["hits"]
+        results[-1].checksum_misses = st["misses"]
+
+        logging.info("%s: checksum cache: hits=%d, misses=%d" %
+                     (name, st["hits"], st["misses"]))
+    return fs
+
+
+def options_for(listfile, workdir, options):
+    args = ["--norc", "-n", "bench", "--pversion", "0.0.1", "-w", workdir,
+            "-P", os.path.join(C.TOPDIR, "templates"),
+            "--driver", options.driver, "--no-mock",
+            "--jobs", str(options.jobs),
+            "--cachedir", os.path.join(workdir, "cache"), listfile]
+
+    (opts, _args) = O.Options().parse_args(args)
+    return opts
+
+
+def bench(size, workdir, options):
+    """
+    Generate a synthetic tree of $size files and measure collecting files in
+    it, constructing PkgData, setting up srcdir, rendering templates and
+    building packages.
+
+    :return: A list of Bunch objects hold resource usage of each phase
+    """
+    results = []
+
+    topdir = os.path.join(workdir, "tree")
+    listfile = os.path.join(workdir, "files.list")
+
+    paths = measure("generate", lambda: T.generate(topdir, size),
+                    results, size)
+    T.write_filelist(paths, listfile)
+
+    # Files just generated are too new to cache their checksums.
+    T.backdate(paths)
+    del paths
+
+    opts = options_for(listfile, os.path.join(workdir, "pmaker"), options)
+
+    fs = collect("collect", listfile, opts, results, size)
+
+    # Collect again to see the effect of caches, e.g. checksum cache.
+    fs = collect("collect.warm", listfile, opts, results, size)
+
+    if not results[-1].get("checksum_hits"):
+        logging.warn("No hits of the checksum cache in the warm run")
+
+    pkgdata = measure("pkgdata", lambda: P.PkgData(opts, fs), results, size)
+    backend = Backends.map()[options.driver](pkgdata)
+
+    measure("setup", backend.setup, results, size)
+    measure("preconfigure", backend.preconfigure, results, size)
+
+    if not options.skip_build:
+        for step in BUILD_STEPS:
+            measure(step, getattr(backend, step), results, size)
+
+    return results
+
+
+def parse_sizes(s):
+    """
+    >>> parse_sizes("1000,10000")
+    [1000, 10000]
+    >>> parse_sizes("1k,100K,1M")
+    [1000, 100000, 1000000]
+    """
+    units = dict(k=1000, m=1000000)
+    sizes = []
+
+    for x in s.lower().split(","):
+        if x and x[-1] in units:
+            sizes.append(int(x[:-1]) * units[x[-1]])
+        elif x:
+            sizes.append(int(x))
+
+    return sizes
+
+
+def option_parser():
+    defaults = dict(sizes=DEFAULT_SIZES, workdir=None, output=None, jobs=1,
+                    driver="autotools.single.tgz", skip_build=False,
+                    keep=False, verbose=False)
+
+    p = optparse.OptionParser("%prog [OPTION ...]")
+    p.set_defaults(**defaults)
+
+    p.add_option("-s", "--sizes",
+                 help="Comma separated numbers of files in synthetic trees, "
+                      "e.g. %s [%%default]" % ",".join(str(s) for s in SIZES))
+    p.add_option("-w", "--workdir",
+                 help="Working dir [a temporary dir under /tmp]")
+    p.add_option("-o", "--output", help="Output JSON file [stdout]")
+    p.add_option("-j", "--jobs", type="int",
+                 help="Number of worker threads passed to pmaker [%default]")
+    p.add_option("-D", "--driver", choices=Backends.map().keys(),
+                 help="Packaging driver [%default]")
+    p.add_option("", "--skip-build", action="store_true",
+                 help="Do not run %s steps" % ", ".join(BUILD_STEPS))
+    p.add_option("", "--keep", action="store_true",
+                 help="Keep generated trees and workdirs")
+    p.add_option("-v", "--verbose", action="store_true", help="Verbose mode")
+
+    return p
+
+
+def main(argv=sys.argv):
+    p = option_parser()
+    (options, args) = p.parse_args(argv[1:])
+
+    logging.basicConfig(format="%(asctime)s %(levelname)-7s %(message)s",
+                        level=(logging.INFO if options.verbose else
+                               logging.WARN))
+
+    topdir = options.workdir or C.setup_workdir()
+    results = []
+
+    try:
+        for size in parse_sizes(options.sizes):
+            workdir = os.path.join(topdir, str(size))
+            results += bench(size, workdir, options)
+
+            if not options.keep:
+                U.rm_rf(workdir)
+    finally:
+        if not options.keep and not options.workdir:
+            U.rm_rf(topdir)
+
+    data = dict(pmaker=G.PMAKER_VERSION,
+                python=platform.python_version(),
+                platform=platform.platform(),
+                cpus=multiprocessing.cpu_count(),
+                date=datetime.datetime.now().isoformat(),
+                options=dict(jobs=options.jobs, driver=options.driver),
+                results=results)
+
+    out = open(options.output, "w") if options.output else sys.stdout
+    json.dump(data, out, indent=2)
+    out.write("\n")
+
+    for size in parse_sizes(options.sizes):
+        print >> sys.stderr, "\n# %d files:" % size
+        print >> sys.stderr, ST.summary([r for r in results
+                                         if r.size == size])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim:sw=4:ts=4:et:
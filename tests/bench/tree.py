@@ -0,0 +1,150 @@
+#
+# Copyright (C) 2013 Satoru SATOH <ssato @ redhat.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+import os.path
+import random
+import time
+
+
+# Max number of files and dirs in a dir of the synthetic tree.
+FANOUT = 100
+
+# Ratio of each type of objects in the tree: (type, ratio)
+MIX = (("small", 0.80),  # small regular files (< 4k)
+       ("symlink", 0.10),  # symlinks to files in the tree
+       ("dangling", 0.01),  # symlinks to non-existent files
+       ("large", 0.001),  # large regular files (LARGE_FILE_SIZE)
+       ("empty", 0.03),  # empty files
+       ("dir", 0.05))  # empty dirs
+
+LARGE_FILE_SIZE = 4 * 1024 * 1024
+MAX_LARGE_FILES = 32
+
+# Ratio of paths listed twice in the file list (duplicates, i.e. conflicts
+# in the list to be resolved by collectors).
+DUP_RATIO = 0.02
+
+# Files generated are backdated by this period (in seconds), longer than
+# pmaker.checksumcache.RACY_PERIOD, so that their checksums can be cached.
+BACKDATE = 60
+
+
+def _dirs(topdir, n, fanout=FANOUT):
+    """
+    Make dir paths to put n objects in so that each dir has at most fanout
+    objects.
+    """
+    ndirs = max(n / fanout, 1)
+    return [os.path.join(topdir, "d%03d" % (i / fanout), "s%03d" % i)
+            for i in range(ndirs)]
+
+
+def _kinds(n, rand):
+    kinds = []
+    for kind, ratio in MIX:
+        m = int(n * ratio)
+        if kind == "large":
+            m = min(max(m, 1), MAX_LARGE_FILES)
+
+        kinds += [kind] * m
+
+    kinds += ["small"] * (n - len(kinds))
+    rand.shuffle(kinds)
+
+    return kinds
+
+
+def generate(topdir, n, seed=0, large_file_size=LARGE_FILE_SIZE):
+    """
+    Generate a synthetic tree of n objects (files, dirs and symlinks) of mixed
+    types under topdir. The same tree is generated for the same n and seed.
+
+    :param topdir: Top dir of the tree to generate, must not exist
+    :param n: Number of objects to generate
+    :param seed: Random seed
+    :param large_file_size: Size of large files
+    :return: A list of paths of objects generated
+    """
+    rand = random.Random(seed)
+    dirs = _dirs(topdir, n)
+    large = "\0" * large_file_size
+
+    for d in dirs:
+        os.makedirs(d)
+
+    (paths, files) = ([], [])
+
+    for i, kind in enumerate(_kinds(n, rand)):
+        d = dirs[i % len(dirs)]
+        path = os.path.join(d, "%s%07d" % (kind[0], i))
+
+        if kind == "small":
+            open(path, "w").write("%d\n" % i * rand.randint(1, 512))
+            files.append(path)
+
+        elif kind == "large":
+            open(path, "w").write(large)
+            files.append(path)
+
+        elif kind == "empty":
+            open(path, "w").close()
+            files.append(path)
+
+        elif kind == "dir":
+            os.mkdir(path)
+
+        elif kind == "symlink":
+            target = rand.choice(files) if files else "/etc/hosts"
+            os.symlink(os.path.relpath(target, d), path)
+
+        else:  # dangling
+            os.symlink("not_exist_%d" % i, path)
+
+        paths.append(path)
+
+    return paths
+
+
+def backdate(paths, period=BACKDATE):
+    """
+    Set mtimes of regular files in paths to period seconds ago.
+    """
+    mtime = time.time() - period
+
+    for path in paths:
+        if os.path.isfile(path) and not os.path.islink(path):
+            os.utime(path, (mtime, mtime))
+
+
+def write_filelist(paths, listfile, seed=0, dup_ratio=DUP_RATIO):
+    """
+    Write a file list of given paths with some duplicates and attributes.
+    """
+    rand = random.Random(seed)
+    dups = rand.sample(paths, int(len(paths) * dup_ratio))
+
+    out = open(listfile, "w")
+    for path in paths + dups:
+        if path.endswith("0"):
+            out.write("%s,mode=0600\n" % path)  # with attributes.
+        else:
+            out.write(path + "\n")
+
+    out.close()
+
+
+# vim:sw=4:ts=4:et: